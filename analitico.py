@@ -0,0 +1,327 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from dados import MatrizDensa, matriz_da_aba
+from ativos import ids_dos_nomes
+from calendario import codigo_mes
+
+# Núcleo analítico em formato largo. Cada aba vira um painel: datas em ordem crescente x ativos,
+# com o ID de cada ativo no cadastro (ativos.py) e os atributos pedidos em arrays alinhados às colunas.
+# "Ativos X entre d0 e d1" é uma fatia do painel (ver janela); o formato longo (Data, Ativo, valor)
+# só é montado na hora de plotar (ver para_longo)
+Painel = namedtuple('Painel', ['datas', 'ativos', 'valores', 'atributos', 'ids', 'cadastro'])
+
+# Monta o painel a partir da matriz densa da aba (Retorno/Risco, em memmap, sem cópia) ou do
+# DataFrame largo. Os atributos vêm da tabela do cadastro pelo ID de cada coluna; os de texto
+# (categoria, tipo) ficam como Categorical
+def montar_painel(origem, cadastro=None, atributos=()):
+    matriz = origem if isinstance(origem, MatrizDensa) else matriz_da_aba(origem)
+    datas, valores = matriz.datas, matriz.valores
+    if len(datas) > 1 and (datas[1:] < datas[:-1]).any():
+        # Abas em ordem decrescente (Duration) são reordenadas uma vez aqui
+        ordem = np.argsort(datas, kind='stable')
+        datas, valores = datas[ordem], np.asfortranarray(valores[ordem])
+    ativos = np.asarray(matriz.ativos, dtype=object)
+    ids = ids_dos_nomes(cadastro, ativos) if cadastro is not None else np.full(len(ativos), -1)
+    return Painel(datas, ativos, valores, {nome: atributo_do_cadastro(cadastro, nome, ids) for nome in atributos},
+                  ids, cadastro)
+
+def atributo_do_cadastro(cadastro, nome, ids):
+    coluna = cadastro.tabela[nome].reindex(ids)
+    return coluna.array if isinstance(coluna.dtype, pd.CategoricalDtype) else coluna.to_numpy()
+
+# Posições das colunas cujos atributos batem com os filtros (lista = qualquer um dos valores).
+# Cada valor é buscado nos arrays de IDs pré-calculados do cadastro
+def selecionar(painel, **filtros):
+    mascara = np.ones(len(painel.ativos), dtype=bool)
+    for atributo, valor in filtros.items():
+        membros = painel.cadastro.membros[atributo]
+        valores = valor if isinstance(valor, (list, tuple)) else [valor]
+        ids = [membros[v] for v in valores if v in membros]
+        mascara &= np.isin(painel.ids, np.concatenate(ids) if ids else [])
+    return np.flatnonzero(mascara)
+
+# Posição em `ids_destino` de cada ID de `ids_origem` (-1 quando não está lá), por busca binária;
+# junta colunas de painéis de abas diferentes pelo ativo, qualquer que seja a grafia
+def alinhar_ids(ids_origem, ids_destino):
+    ids_origem, ids_destino = np.asarray(ids_origem), np.asarray(ids_destino)
+    if not len(ids_destino):
+        return np.full(len(ids_origem), -1)
+    ordem = np.argsort(ids_destino, kind='stable')
+    posicao = ordem[np.minimum(np.searchsorted(ids_destino[ordem], ids_origem), len(ordem) - 1)]
+    return np.where((ids_origem >= 0) & (ids_destino[posicao] == ids_origem), posicao, -1)
+
+def posicao_data(datas, data, lado='left'):
+    return int(np.searchsorted(datas, pd.Timestamp(data).to_datetime64(), side=lado))
+
+# Posições [i0, i1) das datas entre `inicio` e `fim` (inclusive); None = sem limite
+def posicoes_janela(datas, inicio=None, fim=None):
+    i0 = 0 if inicio is None else posicao_data(datas, inicio)
+    i1 = len(datas) if fim is None else posicao_data(datas, fim, 'right')
+    return i0, max(i0, i1)
+
+# Fatia do painel entre `inicio` e `fim` (inclusive), opcionalmente só nas colunas dadas.
+# As datas viram posições por busca binária e a fatia de datas é uma view dos valores;
+# a de colunas também, quando as colunas escolhidas são contíguas. `posicoes` = (i0, i1) já
+# calculadas (ver calendario.posicoes_meses), no lugar de `inicio` e `fim`
+def janela(painel, inicio=None, fim=None, colunas=None, posicoes=None):
+    i0, i1 = posicoes if posicoes is not None else posicoes_janela(painel.datas, inicio, fim)
+    ativos, valores, atributos, ids = painel.ativos, painel.valores[i0:i1], painel.atributos, painel.ids
+    if colunas is not None:
+        colunas = np.asarray(colunas, dtype=int)
+        if len(colunas) and (np.diff(colunas) == 1).all():
+            colunas = slice(colunas[0], colunas[-1] + 1)
+        ativos, valores, ids = ativos[colunas], valores[:, colunas], ids[colunas]
+        atributos = {nome: valores_atributo[colunas] for nome, valores_atributo in atributos.items()}
+    return Painel(painel.datas[i0:i1], ativos, valores, atributos, ids, painel.cadastro)
+
+def vazio(painel):
+    return painel.valores.size == 0
+
+# Formato longo do painel, na mesma ordem do DataFrame.melt (ativo por ativo, datas em ordem).
+# Com `ordenar`, os ativos saem em ordem alfabética, como em sort_values(['Ativo', 'Data']).
+# A coluna do ativo é Categorical (código inteiro por linha + nomes), com as categorias na ordem
+# em que aparecem, para que o groupby/px mantenham a mesma ordem do texto
+def para_longo(painel, nome_valor, nome_ativo='Ativo', ordenar=False):
+    ativos, valores = painel.ativos, painel.valores
+    if ordenar:
+        ordem = np.argsort(ativos, kind='stable')
+        ativos, valores = ativos[ordem], valores[:, ordem]
+    codigos = np.repeat(np.arange(len(ativos)), len(painel.datas))
+    return pd.DataFrame({
+        'Data': np.tile(painel.datas, len(ativos)),
+        nome_ativo: pd.Categorical.from_codes(codigos, categories=pd.Index(ativos, dtype=object)),
+        nome_valor: np.asarray(valores).ravel(order='F'),
+    })
+
+# Redução das séries longas dos gráficos de linhas: Largest-Triangle-Three-Buckets em todas as
+# colunas de uma vez (as colunas dividem os mesmos baldes de datas). Em cada balde fica o ponto que
+# forma o maior triângulo com o ponto escolhido no balde anterior e com a média do balde seguinte;
+# NaN nunca é escolhido. Devolve a máscara datas x colunas dos pontos mantidos, que inclui sempre o
+# primeiro e o último valor, o mínimo, o máximo e as bordas das lacunas (o primeiro NaN depois de
+# cada trecho fica, para a linha continuar interrompida). `x` = posição numérica das datas
+def pontos_lttb(x, valores, alvo):
+    valores = np.asarray(valores, dtype=float)
+    n, m = valores.shape
+    if n <= max(alvo, 3):
+        return np.ones((n, m), dtype=bool)
+    x = np.asarray(x, dtype=float)
+    validos = ~np.isnan(valores)
+    zerados = np.where(validos, valores, 0.0)
+    colunas = np.arange(m)
+    manter = np.zeros((n, m), dtype=bool)
+
+    # alvo - 2 baldes entre o primeiro e o último ponto e as médias dos baldes seguintes (o último
+    # vai até o fim); `a` = último ponto escolhido de cada coluna
+    limites = np.linspace(1, n - 1, alvo - 1).astype(int)
+    tamanhos = np.diff(np.append(limites[1:], n))
+    medias_x = np.add.reduceat(x, limites[1:]) / tamanhos
+    contagens = np.add.reduceat(validos, limites[1:], axis=0)
+    medias_y = np.add.reduceat(zerados, limites[1:], axis=0) / np.maximum(contagens, 1)
+    a = validos.argmax(axis=0)
+    xa, ya = x[a], valores[a, colunas]
+    for b in range(len(limites) - 1):
+        i0, i1 = limites[b], limites[b + 1]
+        yc = np.where(contagens[b] > 0, medias_y[b], ya)
+        area = np.abs((xa - medias_x[b]) * (valores[i0:i1] - ya) - (xa - x[i0:i1, None]) * (yc - ya))
+        area = np.where(validos[i0:i1], np.nan_to_num(area, nan=0.0), -1.0)
+        escolhido = i0 + area.argmax(axis=0)
+        ok = validos[escolhido, colunas]
+        manter[escolhido[ok], colunas[ok]] = True
+        a = np.where(ok, escolhido, a)
+        xa, ya = x[a], valores[a, colunas]
+
+    com_dados = validos.any(axis=0)
+    manter[np.where(validos, valores, np.inf).argmin(axis=0)[com_dados], colunas[com_dados]] = True
+    manter[np.where(validos, valores, -np.inf).argmax(axis=0)[com_dados], colunas[com_dados]] = True
+    anterior = np.vstack([np.zeros((1, m), dtype=bool), validos[:-1]])
+    proximo = np.vstack([validos[1:], np.zeros((1, m), dtype=bool)])
+    manter |= validos & ~(anterior & proximo)
+    manter |= ~validos & anterior
+    return manter
+
+# Posições dos k maiores (ou menores) valores, já em ordem: argpartition separa os k em O(n) e só
+# eles são ordenados. Valores NaN devem ser retirados antes
+def maiores_k(valores, k):
+    return menores_k(-np.asarray(valores), k)
+
+def menores_k(valores, k):
+    valores = np.asarray(valores)
+    k = min(max(int(k), 0), len(valores))
+    if k == 0:
+        return np.array([], dtype=int)
+    escolhidos = np.argpartition(valores, k - 1)[:k]
+    return escolhidos[np.argsort(valores[escolhidos], kind='stable')]
+
+# Posição da primeira e da última linha com valor em cada coluna e se a coluna tem algum valor
+def extremos_validos(valores):
+    validos = ~np.isnan(valores)
+    tem_valor = validos.any(axis=0)
+    if not len(valores):
+        return np.zeros(valores.shape[1], dtype=int), np.zeros(valores.shape[1], dtype=int), tem_valor
+    primeiro = validos.argmax(axis=0)
+    ultimo = len(valores) - 1 - validos[::-1].argmax(axis=0)
+    return primeiro, ultimo, tem_valor
+
+# Índice de crescimento do painel, montado uma vez por versão da planilha: somas prefixadas de
+# log1p(retorno) por ativo (NaN conta como 0) e do número de observações válidas. A linha k soma
+# as k primeiras datas, então o retorno composto de qualquer janela [i0, i1) de todos os ativos é
+# expm1(log[i1] - log[i0]): duas linhas lidas e uma subtração, independente do tamanho do histórico
+IndiceCrescimento = namedtuple('IndiceCrescimento', ['datas', 'log', 'contagem'])
+
+def indice_crescimento(painel):
+    validos = ~np.isnan(painel.valores)
+    log = np.zeros((len(painel.datas) + 1, len(painel.ativos)))
+    np.cumsum(np.log1p(np.where(validos, painel.valores, 0)), axis=0, out=log[1:])
+    contagem = np.zeros(log.shape, dtype=np.int64)
+    np.cumsum(validos, axis=0, out=contagem[1:])
+    return IndiceCrescimento(painel.datas, log, contagem)
+
+# Retorno composto de cada ativo entre `inicio` e `fim` (inclusive), como prod(1 + r) - 1 na janela:
+# ativo sem observações -> 0; janela sem nenhuma data -> NaN (não há período)
+def composto_no_intervalo(indice, inicio=None, fim=None, colunas=None, posicoes=None):
+    colunas = slice(None) if colunas is None else colunas
+    i0, i1 = posicoes if posicoes is not None else posicoes_janela(indice.datas, inicio, fim)
+    composto = np.expm1(indice.log[i1, colunas] - indice.log[i0, colunas])
+    return composto if i1 > i0 else np.full_like(composto, np.nan)
+
+# Retorno acumulado dia a dia desde `inicio` (matriz datas x ativos da janela);
+# onde não há observação o acumulado fica NaN
+def acumulado_no_intervalo(indice, inicio=None, fim=None, colunas=None, posicoes=None):
+    colunas = slice(None) if colunas is None else colunas
+    i0, i1 = posicoes if posicoes is not None else posicoes_janela(indice.datas, inicio, fim)
+    log, contagem = indice.log[i0:i1 + 1, colunas], indice.contagem[i0:i1 + 1, colunas]
+    acumulado = np.expm1(log[1:] - log[0])
+    acumulado[contagem[1:] == contagem[:-1]] = np.nan
+    return acumulado
+
+# Soma acumulada ao longo das datas com compensação (Kahan-Neumaier), todas as colunas de uma vez;
+# a linha k soma as k primeiras datas. O laço é nas datas, uma vez por versão da planilha
+def soma_compensada(valores):
+    saida = np.zeros((len(valores) + 1, valores.shape[1]))
+    soma, compensacao = np.zeros(valores.shape[1]), np.zeros(valores.shape[1])
+    for i, linha in enumerate(valores):
+        total = soma + linha
+        compensacao += np.where(np.abs(soma) >= np.abs(linha), (soma - total) + linha, (linha - total) + soma)
+        soma = total
+        saida[i + 1] = soma + compensacao
+    return saida
+
+# Índice de momentos do painel: somas prefixadas (compensadas) da contagem, de x e de x² por ativo,
+# com x = retorno - média do ativo no histórico (a referência reduz o cancelamento em Σx² - (Σx)²/n).
+# Soma e desvio padrão amostral de qualquer janela saem de duas linhas de cada prefixo
+IndiceMomentos = namedtuple('IndiceMomentos', ['datas', 'referencia', 'contagem', 'soma', 'soma_quadrados'])
+
+def indice_momentos(painel):
+    valores = np.asarray(painel.valores)
+    validos = ~np.isnan(valores)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        referencia = np.where(validos.any(axis=0), np.nansum(valores, axis=0) / validos.sum(axis=0), 0)
+    centrados = np.where(validos, valores - referencia, 0)
+    contagem = np.zeros((len(valores) + 1, valores.shape[1]), dtype=np.int64)
+    np.cumsum(validos, axis=0, out=contagem[1:])
+    return IndiceMomentos(painel.datas, referencia, contagem, soma_compensada(centrados), soma_compensada(centrados ** 2))
+
+# Posições [i0, i1) de várias janelas que terminam em `fim` (uma por início; None = desde o começo)
+def posicoes_janelas(datas, inicios, fim=None):
+    i1 = len(datas) if fim is None else posicao_data(datas, fim, 'right')
+    i0 = np.array([0 if inicio is None else posicao_data(datas, inicio) for inicio in inicios], dtype=int)
+    return np.minimum(i0, i1), i1
+
+# Contagem, Σx e Σx² (x centrado) de cada janela x ativo; `posicoes` = lista de (i0, i1) já
+# calculadas, no lugar de `inicios` e `fim`
+def momentos_nas_janelas(indice, inicios=(), fim=None, colunas=None, posicoes=None):
+    colunas = slice(None) if colunas is None else colunas
+    if posicoes is not None:
+        i0, i1 = np.array(posicoes, dtype=int).reshape(-1, 2).T
+    else:
+        i0, i1 = posicoes_janelas(indice.datas, inicios, fim)
+        i1 = np.full(len(i0), i1)
+    return tuple(prefixo[i1][:, colunas] - prefixo[i0][:, colunas]
+                 for prefixo in (indice.contagem, indice.soma, indice.soma_quadrados))
+
+# Volatilidade anualizada (desvio amostral x √252) de cada janela [inicio, fim] x ativo, numa chamada;
+# NaN com menos de 2 observações
+def volatilidade_nas_janelas(indice, inicios=(), fim=None, colunas=None, posicoes=None):
+    n, soma, soma_quadrados = momentos_nas_janelas(indice, inicios, fim, colunas, posicoes)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variancia = np.maximum(soma_quadrados - soma * soma / n, 0) / (n - 1)
+    return np.where(n >= 2, np.sqrt(variancia), np.nan) * np.sqrt(252)
+
+# Soma simples dos retornos de cada ativo entre `inicio` e `fim` (janela sem datas -> NaN)
+def soma_no_intervalo(indice, inicio=None, fim=None, colunas=None, posicoes=None):
+    i0, i1 = posicoes if posicoes is not None else posicoes_janela(indice.datas, inicio, fim)
+    n, soma, _ = momentos_nas_janelas(indice, colunas=colunas, posicoes=[(i0, i1)])
+    referencia = indice.referencia[slice(None) if colunas is None else colunas]
+    return soma[0] + n[0] * referencia if i1 > i0 else np.full(len(referencia), np.nan)
+
+# Índice de observações válidas do painel, montado uma vez por versão da planilha: para cada linha k,
+# a última data válida antes de k (anterior, -1 se não há) e a primeira a partir de k (proximo, n se não
+# há), por ativo. A primeira e a última observação de qualquer janela [i0, i1) saem de proximo[i0] e
+# anterior[i1], sem percorrer as datas. Os valores ganham uma linha NaN no fim, lida pelos -1 e n
+IndiceValidos = namedtuple('IndiceValidos', ['datas', 'valores', 'anterior', 'proximo'])
+
+def indice_validos(painel):
+    valores = np.asarray(painel.valores, dtype=float)
+    n = len(valores)
+    linhas = np.arange(n)[:, None]
+    validos = ~np.isnan(valores)
+    anterior = np.full((n + 1, valores.shape[1]), -1, dtype=np.int64)
+    np.maximum.accumulate(np.where(validos, linhas, -1), axis=0, out=anterior[1:])
+    proximo = np.full((n + 1, valores.shape[1]), n, dtype=np.int64)
+    proximo[:-1] = np.minimum.accumulate(np.where(validos, linhas, n)[::-1], axis=0)[::-1]
+    return IndiceValidos(painel.datas, np.vstack([valores, np.full((1, valores.shape[1]), np.nan)]), anterior, proximo)
+
+# Primeiro e último valor válido de cada janela x ativo, numa chamada (NaN se a janela não tem
+# observação do ativo); `posicoes` = lista de (i0, i1), `colunas` = máscara ou posições dos ativos
+def extremos_nas_janelas(indice, posicoes, colunas=None):
+    colunas = np.arange(indice.valores.shape[1])[slice(None) if colunas is None else colunas]
+    i0, i1 = np.array(posicoes, dtype=int).reshape(-1, 2).T
+    primeiro, ultimo = indice.proximo[i0][:, colunas], indice.anterior[i1][:, colunas]
+    tem_valor = primeiro < i1[:, None]
+    return (np.where(tem_valor, indice.valores[primeiro, colunas], np.nan),
+            np.where(tem_valor, indice.valores[ultimo, colunas], np.nan))
+
+# Último valor válido de cada ativo em `data` ou antes (junção "as-of"), todos os ativos numa busca
+# binária: a linha vem de `anterior`; com `desde`, valores anteriores a essa data ficam NaN
+def valores_ate(indice, data, colunas=None, desde=None):
+    colunas = np.arange(indice.valores.shape[1])[slice(None) if colunas is None else colunas]
+    linha = indice.anterior[posicao_data(indice.datas, data, 'right'), colunas]
+    valores = indice.valores[linha, colunas]
+    if desde is not None:
+        valores = np.where(linha >= posicao_data(indice.datas, desde), valores, np.nan)
+    return valores
+
+# Variação (último - primeiro valor válido) de cada janela x ativo
+def variacao_nas_janelas(indice, posicoes, colunas=None):
+    primeiro, ultimo = extremos_nas_janelas(indice, posicoes, colunas)
+    return ultimo - primeiro
+
+# Cubo mensal ativo x mês, montado uma vez por versão da planilha a partir do índice de crescimento
+# e do calendário: por mês com dados, o retorno composto (e seu log1p) e o número de retornos diários
+# de cada ativo. "Retorno do mês", "no ano até o mês" e "N meses até o mês" somam poucas linhas
+CuboMensal = namedtuple('CuboMensal', ['meses', 'ativos', 'retorno', 'log', 'contagem'])
+
+def cubo_mensal(indice, calendario, ativos):
+    log = np.diff(indice.log[calendario.inicios], axis=0)
+    contagem = np.diff(indice.contagem[calendario.inicios], axis=0)
+    return CuboMensal(calendario.meses, list(ativos), np.expm1(log), log, contagem)
+
+# Linhas [k0, k1) do cubo dos `n_meses` meses que terminam em ano/mês (inclusive)
+def linhas_meses(cubo, ano, mes, n_meses=1):
+    fim = codigo_mes(ano, mes)
+    return np.searchsorted(cubo.meses, [fim - n_meses + 1, fim + 1])
+
+# Retorno composto e número de observações de cada ativo nos `n_meses` meses até ano/mês, como
+# composto_no_intervalo: ativo sem observações -> 0; nenhum mês com dados -> NaN
+def retorno_nos_meses(cubo, ano, mes, n_meses=1, colunas=None):
+    colunas = slice(None) if colunas is None else colunas
+    k0, k1 = linhas_meses(cubo, ano, mes, n_meses)
+    retorno = np.expm1(cubo.log[k0:k1, colunas].sum(axis=0))
+    contagem = cubo.contagem[k0:k1, colunas].sum(axis=0)
+    return (retorno if k1 > k0 else np.full_like(retorno, np.nan)), contagem
+
+# Retorno composto de janeiro até ano/mês
+def retorno_no_ano(cubo, ano, mes, colunas=None):
+    return retorno_nos_meses(cubo, ano, mes, mes, colunas)
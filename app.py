@@ -1,25 +1,30 @@
 # ADICIONAR TAXAS DE LTN - VER VENCIMENTOS DISPONIVEIS
 
 import dash
-from dash import dcc, html, Input, Output, no_update
+from dash import dcc, html, Input, Output, no_update, ctx
 import plotly.express as px
-import plotly.express as go
+import plotly.graph_objects as go
 import pandas as pd
 import calendar
 from dash import dash_table
 from dash.dependencies import Input, Output, State
 import os
-from dateutil.relativedelta import relativedelta
 from datetime import datetime
 import numpy as np
 
-# Importar layouts e dados
-from retorno_layout import layout as layout_retorno, df_retorno_melt, df_retorno, meses_por_ano as meses_retorno
-from volatilidade_layout import layout as layout_risco, df_risco_melt as df_risco_melt_vol, meses_por_ano as meses_risco
-from taxas_layout import layout as layout_taxas, fechamentos_df, df_taxas_melted, df_duration_melted, meses_por_ano as meses_taxas
-from inflacao_layout import layout as layout_inflacao, df_inflacao, meses_por_ano as meses_inflacao, gerar_grafico_e_tabela
-from geral import layout as layout_geral, evolucao_taxas_3_meses_excel
-from geral import layout, carregar_dados_retorno, calcular_retorno_acumulado_6m, criar_grafico_retorno_acumulado, calcular_retorno_acumulado_por_periodo, df_ret, criar_componente_retorno_ativo, carregar_dados_inflacao, obter_retorno_mensal_completo
+# Importar layouts e dados (os dados de cada aba ficam em dados.derivado(<aba>) e são
+# trocados de uma vez quando a planilha é recarregada)
+from dados import inicializar, atual, derivado, monitorar_planilha, aquecer_em_segundo_plano
+from figuras import cache_de_figuras, figura_linhas, anotacao_clique, faixa_do_zoom, PONTOS_POR_TRACE
+from analitico import janela, selecionar, vazio, composto_no_intervalo, soma_no_intervalo, volatilidade_nas_janelas, \
+    maiores_k, menores_k, variacao_nas_janelas, valores_ate, alinhar_ids
+from calendario import posicoes_meses, posicoes_no_ano, posicao_do_mes, codigo_mes, ano_da_posicao
+from retorno_layout import meses_por_ano as meses_retorno, janela_retorno, movimentos_do_mes
+from volatilidade_layout import meses_por_ano as meses_risco, tabela_risco
+from taxas_layout import meses_por_ano as meses_taxas
+from inflacao_layout import meses_por_ano as meses_inflacao, gerar_grafico_e_tabela
+from geral import evolucao_taxas_3_meses_excel
+from geral import retornos_do_indicador, criar_componente_retorno_ativo
 from geral import indicadores
 
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
@@ -44,20 +49,27 @@ app.layout = html.Div([
     html.Div(id='tabs-content')
 ])
 
-# Dicionário com layouts para as abas
-layouts = {
-    'geral': layout_geral, 
-    'retorno': layout_retorno,
-    'risco': layout_risco,
-    'inflacao': layout_inflacao,
-    'taxas': layout_taxas
-}
+# Abas disponíveis (o layout de cada uma é montado junto com os seus dados)
+abas_dashboard = ['geral', 'retorno', 'risco', 'inflacao', 'taxas']
+
+# Snapshot do boot (artefato de gerar_snapshot.py ou a planilha), carregado antes de atender
+inicializar()
+
+# Recarrega a planilha em segundo plano quando ela for alterada
+monitorar_planilha()
+
+# Os dados e o layout de cada aba são montados na primeira vez que ela é pedida;
+# uma thread já vai montando todas, começando pela Geral (aba inicial)
+aquecer_em_segundo_plano(abas_dashboard)
+
 @app.callback(
     Output('tabs-content', 'children'),
     Input('tabs', 'value')
 )
 def render_content(tab):
-    return layouts.get(tab, html.Div("Aba não encontrada"))
+    if tab not in abas_dashboard:
+        return html.Div("Aba não encontrada")
+    return derivado(tab)['layout']
 # =================== ABA RETORNO ===================
 from pandas.tseries.offsets import MonthEnd
 
@@ -75,71 +87,61 @@ def update_meses_retorno(ano):
     opcoes = [{'label': calendar.month_name[m], 'value': m} for m in meses]
     return opcoes, meses[-1]
 
+# Os gráficos de linhas longos vão reduzidos (ver figuras.figura_linhas) e voltam com todos os
+# pontos na faixa do zoom: o relayoutData do gráfico também é entrada do callback. Faixa de detalhe
+# quando o callback veio do zoom do próprio gráfico, None quando veio dos filtros e no_update
+# quando não há o que trazer: o relayout não mexeu no eixo x (autosize, zoom só no eixo y) ou a
+# janela (`contar_datas()` datas) não foi reduzida e o navegador já tem todos os pontos
+def faixa_do_callback(id_grafico, relayout, contar_datas):
+    if relayout is None or ctx.triggered_id != id_grafico:
+        return None
+    if not any(chave.startswith('xaxis.') for chave in relayout) or contar_datas() <= PONTOS_POR_TRACE:
+        return no_update
+    return faixa_do_zoom(relayout)
+
 @app.callback(
     Output('grafico-retorno', 'figure'),
     Input('retorno-ano-dropdown', 'value'),
     Input('retorno-mes-dropdown', 'value'),
     Input('retorno-categoria-dropdown', 'value'),
-    Input('retorno-intervalo-dropdown', 'value')
+    Input('retorno-intervalo-dropdown', 'value'),
+    Input('grafico-retorno', 'relayoutData')
 )
-def atualizar_grafico_precos(ano, mes, categoria, intervalo):
+def atualizar_grafico_precos(ano, mes, categoria, intervalo, relayout):
     if None in [ano, mes, categoria, intervalo]:
         return {}
-
-    dia_fim = calendar.monthrange(ano, mes)[1]
-    data_fim = pd.Timestamp(year=ano, month=mes, day=dia_fim)
-    data_inicio = (data_fim - relativedelta(months=intervalo - 1)).replace(day=1)
-
-    df_filtrado = df_retorno_melt[
-        (df_retorno_melt['Data'] >= data_inicio) & (df_retorno_melt['Data'] <= data_fim)
-    ].copy()
-
-    if categoria != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Categoria'] == categoria]
-
-    if df_filtrado.empty:
+    faixa = faixa_do_callback('grafico-retorno', relayout,
+                              lambda: len(janela_retorno(ano, mes, categoria, intervalo).painel.datas))
+    if faixa is no_update:
+        return no_update
+    if faixa is None:
+        return figura_precos(ano, mes, categoria, intervalo)
+    # A figura do zoom não vai para o cache: a faixa exata quase nunca se repete
+    return figura_precos.__wrapped__(ano, mes, categoria, intervalo, faixa)
+
+# uirevision fixo para os mesmos filtros: a figura com o detalhe do zoom não desfaz o zoom
+@cache_de_figuras
+def figura_precos(ano, mes, categoria, intervalo, faixa=None):
+    if None in [ano, mes, categoria, intervalo]:
         return {}
 
-    df_filtrado.sort_values(by=['Ativo', 'Data'], inplace=True)
-    df_filtrado['RetornoAcumulado'] = df_filtrado.groupby('Ativo')['Retorno'].transform(
-        lambda x: (1 + x).cumprod() - 1
-    )
+    # Janela dos filtros (compartilhada com a tabela e o gráfico de risco x retorno)
+    janela_ret = janela_retorno(ano, mes, categoria, intervalo, snapshot=atual())
+    if janela_ret.acumulado is None:
+        return {}
 
-    fig = px.line(
-        df_filtrado,
-        x='Data',
-        y='RetornoAcumulado',
-        color='Ativo',
-        markers=True,
-        template='plotly_dark'
-    )
+    fig = figura_linhas(janela_ret.acumulado, titulo_y='RetornoAcumulado', ordem=janela_ret.ordem,
+                        alvo=PONTOS_POR_TRACE, detalhe=faixa, uirevision=f"{ano}/{mes}/{categoria}/{intervalo}")
 
     fig.update_layout(
         title=f"Retorno Acumulado - {intervalo} Meses",
         title_x=0.05,
         title_y=0.98,
         title_font=dict(size=16, color='white'),
-        paper_bgcolor='#34495e',
-        plot_bgcolor='#34495e',
-        legend=dict(
-            orientation='h',
-            yanchor='bottom',
-            y=0.85,
-            xanchor='center',
-            x=0.5,
-            font=dict(color='white')
-        ),
+        legend=dict(y=0.85),
         hovermode=False,
         yaxis=dict(tickformat=".1f", color='white', automargin=True),
-        annotations=[
-            dict(
-                text='*Clique 2x no ativo para visualização única',
-                xref='paper', yref='paper',
-                x=0.98, y=1.048,     
-                showarrow=False,
-                font=dict(size=12, color='white')
-            )
-        ],
+        annotations=[anotacao_clique(x=0.98, y=1.048, align='center')],
         margin=dict(l=10, r=10, t=20, b=30),  # margens reduzidas para usar mais espaço
         autosize=True,
 )
@@ -164,62 +166,34 @@ def atualizar_tabela_retorno(ano, mes, categoria, intervalo):
     if None in [ano, mes, categoria, intervalo]:
         return []
 
-    # Define a data final com base no ano e mês selecionados
-    data_fim = pd.Timestamp(year=ano, month=mes, day=1) + pd.offsets.MonthEnd(0)
-
-    # Filtra por categoria
-    df_base = df_retorno_melt.copy()
-    if categoria != 'Todos':
-        df_base = df_base[df_base['Categoria'] == categoria]
-
-    if df_base.empty:
+    # Filtra por categoria (janela compartilhada com os gráficos da aba); tudo lido do mesmo snapshot
+    snap = atual()
+    dados_retorno = derivado('retorno', snap)
+    indice = dados_retorno['indice_retorno']
+    janela_ret = janela_retorno(ano, mes, categoria, intervalo, snapshot=snap)
+    colunas, ativos = janela_ret.colunas, janela_ret.painel.ativos
+
+    # Posições de cada período no calendário da aba; todos terminam no mês selecionado
+    calendario_retorno = dados_retorno['calendario_retorno']
+    periodo = lambda meses: posicoes_meses(calendario_retorno, ano, mes, meses)
+    posicoes_ytd = posicoes_no_ano(calendario_retorno, ano, mes)
+
+    # Sem nenhuma data em nenhum dos períodos, não há linhas
+    i0, i1 = periodo(max(36, intervalo, mes))
+    if not len(ativos) or i1 == i0:
         return []
 
-    # Retorno do mês selecionado (não acumulado)
-    df_retorno_mes = df_base[
-        (df_base['Data'].dt.year == ano) & (df_base['Data'].dt.month == mes)
-    ].groupby('Ativo')['Retorno'].sum().reset_index()
-    df_retorno_mes.rename(columns={'Retorno': 'Retorno_mes'}, inplace=True)
-    df_retorno_mes['Retorno_mes'] *= 100
-
-    # Define função de cálculo do retorno acumulado por período (em meses), exceto 3 meses
-    def retorno_acumulado_por_periodo(meses):
-        data_inicio = (data_fim - pd.DateOffset(months=meses - 1)).replace(day=1)
-        df_periodo = df_base[(df_base['Data'] >= data_inicio) & (df_base['Data'] <= data_fim)].copy()
-        retorno = df_periodo.groupby('Ativo')['Retorno'].apply(lambda x: (1 + x).prod() - 1)
-        retorno = retorno.reset_index(name=f'Retorno_{meses}')
-        retorno[f'Retorno_{meses}'] *= 100
-        return retorno
-
-    # Retornos acumulados para 6, 12, 24, 36 meses (sem o de 3 meses)
-    retornos = [retorno_acumulado_por_periodo(m) for m in [6, 12, 24, 36]]
-
-    # Retorno YTD
-    def retorno_ytd():
-        data_inicio_ano = pd.Timestamp(year=ano, month=1, day=1)
-        df_ytd = df_base[(df_base['Data'] >= data_inicio_ano) & (df_base['Data'] <= data_fim)].copy()
-        retorno = df_ytd.groupby('Ativo')['Retorno'].apply(lambda x: (1 + x).prod() - 1)
-        retorno = retorno.reset_index(name='Retorno_YTD')
-        retorno['Retorno_YTD'] *= 100
-        return retorno
-
-    retorno_ytd_df = retorno_ytd()
-
-    # Cálculo do risco (volatilidade) anualizada com base no intervalo selecionado
-    data_inicio_risco = (data_fim - pd.DateOffset(months=intervalo - 1)).replace(day=1)
-    df_risco_periodo = df_base[(df_base['Data'] >= data_inicio_risco) & (df_base['Data'] <= data_fim)].copy()
-    risco = df_risco_periodo.groupby('Ativo')['Retorno'].std().reset_index()
-    risco['Risco'] = risco['Retorno'] * (252 ** 0.5) * 100
-    risco.drop(columns='Retorno', inplace=True)
-
-    # Junta todos os DataFrames - começa com Retorno_mes
-    df_final = df_retorno_mes
-
-    for df_r in retornos:
-        df_final = df_final.merge(df_r, on='Ativo', how='outer')
-
-    df_final = df_final.merge(retorno_ytd_df, on='Ativo', how='outer')
-    df_final = df_final.merge(risco, on='Ativo', how='outer')
+    # Retorno do mês selecionado (não acumulado), retornos compostos de 6, 12, 24 e 36 meses e YTD
+    # e risco anualizado no intervalo selecionado, em %, lidos dos índices da aba (janela sem datas -> NaN)
+    momentos = dados_retorno['momentos_retorno']
+    df_final = pd.DataFrame({
+        'Ativo': ativos,
+        'Retorno_mes': soma_no_intervalo(momentos, colunas=colunas, posicoes=periodo(1)) * 100,
+        **{f'Retorno_{meses}': composto_no_intervalo(indice, colunas=colunas, posicoes=periodo(meses)) * 100
+           for meses in [6, 12, 24, 36]},
+        'Retorno_YTD': composto_no_intervalo(indice, colunas=colunas, posicoes=posicoes_ytd) * 100,
+        'Risco': volatilidade_nas_janelas(momentos, colunas=colunas, posicoes=[janela_ret.posicoes])[0] * 100,
+    }).take(janela_ret.ordem).reset_index(drop=True)
 
     df_final = df_final.round(2)
 
@@ -232,46 +206,32 @@ def atualizar_tabela_retorno(ano, mes, categoria, intervalo):
     Input('retorno-categoria-dropdown', 'value'),
     Input('retorno-intervalo-dropdown', 'value')
 )
+@cache_de_figuras
 def atualizar_grafico(ano, mes, categoria, intervalo):
     if None in [ano, mes, categoria, intervalo]:
         return {}
 
-    dia_fim = calendar.monthrange(ano, mes)[1]
-    data_fim = pd.Timestamp(year=ano, month=mes, day=dia_fim)
-    mes_inicio = mes - intervalo + 1
-    ano_inicio = ano
-    if mes_inicio <= 0:
-        ano_inicio -= 1
-        mes_inicio += 12
-    data_inicio = pd.Timestamp(year=ano_inicio, month=mes_inicio, day=1)
-
-    df_filtrado = df_retorno_melt[
-        (df_retorno_melt['Data'] >= data_inicio) & (df_retorno_melt['Data'] <= data_fim)
-    ].copy()
-    if categoria != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Categoria'] == categoria]
-    if df_filtrado.empty:
+    snap = atual()
+    dados_retorno = derivado('retorno', snap)
+    calendario_retorno = dados_retorno['calendario_retorno']
+    indice, momentos = dados_retorno['indice_retorno'], dados_retorno['momentos_retorno']
+    # Janela dos filtros (compartilhada com a tabela e o gráfico de retorno acumulado)
+    janela_ret = janela_retorno(ano, mes, categoria, intervalo, snapshot=snap)
+    posicoes, colunas = janela_ret.posicoes, janela_ret.colunas
+    if janela_ret.acumulado is None:
         return {}
 
-    df_filtrado.sort_values(by=['Ativo', 'Data'], inplace=True)
-    data_fim_real = df_filtrado['Data'].max()
-
-    def retorno_ytd(df, data_fim):
-        data_inicio_ano = pd.Timestamp(year=data_fim.year, month=1, day=1)
-        df_ytd = df[(df['Data'] >= data_inicio_ano) & (df['Data'] <= data_fim)]
-        retorno = df_ytd.groupby('Ativo')['Retorno'].apply(
-            lambda x: (1 + x).prod() - 1
-        ).reset_index(name='Retorno_YTD')
-        retorno['Retorno_YTD'] = retorno['Retorno_YTD'] * 100
-        return retorno
-
-    retorno_ytd_df = retorno_ytd(df_filtrado, data_fim_real)
-
-    risco = df_filtrado.groupby('Ativo')['Retorno'].std().reset_index()
-    risco['Risco'] = risco['Retorno'] * (252 ** 0.5) * 100
-    risco.drop(columns=['Retorno'], inplace=True)
-
-    df_final = pd.merge(retorno_ytd_df, risco, on='Ativo', how='inner')
+    # YTD dentro do período: do início do ano da última data (ou do período, se for depois)
+    i0, i1 = posicoes
+    inicio_ano = posicao_do_mes(calendario_retorno, codigo_mes(ano_da_posicao(calendario_retorno, i1 - 1), 1))
+    posicoes_ytd = (max(i0, inicio_ano), i1)
+
+    # Retorno YTD e risco do período para todos os ativos de uma vez, em ordem alfabética
+    df_final = pd.DataFrame({
+        'Ativo': janela_ret.painel.ativos,
+        'Retorno_YTD': composto_no_intervalo(indice, colunas=colunas, posicoes=posicoes_ytd) * 100,
+        'Risco': volatilidade_nas_janelas(momentos, colunas=colunas, posicoes=[posicoes])[0] * 100,
+    }).take(janela_ret.ordem).reset_index(drop=True)
     df_final = df_final.round(2)
 
     fig = px.scatter(
@@ -336,50 +296,30 @@ def update_meses_risco(ano):
     Input('risco-mes-dropdown', 'value'),
     Input('risco-categoria-dropdown', 'value')   # novo input
 )
+@cache_de_figuras
 def atualizar_grafico_risco(ano, mes, categoria):
     if ano is None or mes is None or categoria is None:
         return {}
-    data_inicio = pd.Timestamp(year=ano, month=1, day=1)
-    data_fim = df_risco_melt_vol[(df_risco_melt_vol['Data'].dt.year == ano) & (df_risco_melt_vol['Data'].dt.month == mes)]['Data'].max()
-    if pd.isna(data_fim):
+    dados_risco = derivado('risco')
+    painel, calendario_risco = dados_risco['painel_risco'], dados_risco['calendario_risco']
+    # De janeiro até o mês selecionado, que precisa ter dados
+    inicio_mes, fim_mes = posicoes_meses(calendario_risco, ano, mes)
+    if fim_mes == inicio_mes:
         return {}
-    df_filtrado = df_risco_melt_vol[(df_risco_melt_vol['Data'] >= data_inicio) & (df_risco_melt_vol['Data'] <= data_fim)].copy()
     # Filtra pela categoria, se não for 'Todos'
-    if categoria != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Categoria'] == categoria]
-    if df_filtrado.empty:
+    colunas = None if categoria == 'Todos' else selecionar(painel, CategoriaRisco=categoria)
+    janela_vol = janela(painel, colunas=colunas, posicoes=posicoes_no_ano(calendario_risco, ano, mes))
+    if vazio(janela_vol):
         return {}
-    fig = px.line(df_filtrado, x='Data', y='Volatilidade', color='Ativo',
-                  title='Volatilidade (Risco)', markers=True, template='plotly_dark')
+    fig = figura_linhas(janela_vol, titulo_y='Volatilidade', title='Volatilidade (Risco)')
     fig.update_traces(hoverinfo='skip')
     # fig.update_traces(hovertemplate='%{x}<br>%{y:.2%}<extra>%{fullData.name}</extra>')
 
 
     fig.update_layout(
-    paper_bgcolor='#34495e',
-    plot_bgcolor='#34495e',
     yaxis_tickformat='.0%',
     yaxis=dict(tickformat='.2%'),
-    legend=dict(
-        orientation='h',
-        yanchor='bottom',
-        y=1.05,
-        xanchor='center',
-        x=0.5,
-        font=dict(color='white')
-    ),
-    annotations=[
-        dict(
-            text="*Clique 2x no ativo para visualização única",
-            xref="paper",
-            yref="paper",
-            x=0.99,
-            y=1.25,
-            showarrow=False,
-            font=dict(color="white", size=13),
-            align="right"
-        )
-    ]
+    annotations=[anotacao_clique(font=dict(size=13))]
 )
 
     return fig
@@ -395,58 +335,7 @@ def atualizar_tabela_risco(ano, mes, categoria):
         return []
 
     try:
-        df_retorno = df_retorno_melt.copy()
-        df_volatilidade = df_risco_melt_vol.copy()
-
-        # Data final do período: último dia do mês selecionado
-        dia_final = calendar.monthrange(ano, mes)[1]
-        data_fim = pd.Timestamp(year=ano, month=mes, day=dia_final)
-
-        # Função para calcular volatilidade anualizada para N meses anteriores a data_fim
-        def vol_periodo_por_data(df, meses):
-            data_inicio_periodo = (data_fim - pd.DateOffset(months=meses - 1)).replace(day=1)
-            df_periodo = df[(df['Data'] >= data_inicio_periodo) & (df['Data'] <= data_fim)]
-            rets = df_periodo['Retorno'].dropna().values
-            if len(rets) < 2:
-                return np.nan
-            return np.std(rets, ddof=1) * np.sqrt(252)
-
-        # Filtra categoria, se aplicável
-        if categoria != 'Todos':
-            df_retorno = df_retorno[df_retorno['Categoria'] == categoria]
-            df_volatilidade = df_volatilidade[df_volatilidade['Categoria'] == categoria]
-
-        resultados = []
-
-        for ativo in df_retorno['Ativo'].unique():
-            df_ret = df_retorno[df_retorno['Ativo'] == ativo].copy()
-            df_vol = df_volatilidade[df_volatilidade['Ativo'] == ativo].copy()
-
-            # Volatilidade mensal do mês selecionado
-            df_vol_mes = df_vol[df_vol['Data'].dt.to_period('M') == data_fim.to_period('M')]
-            vol_mensal = df_vol_mes['Volatilidade'].dropna().values[-1] if not df_vol_mes.empty else np.nan
-
-            vol_6m = vol_periodo_por_data(df_ret, 6)
-            vol_12m = vol_periodo_por_data(df_ret, 12)
-            vol_24m = vol_periodo_por_data(df_ret, 24)
-            vol_36m = vol_periodo_por_data(df_ret, 36)
-
-            # Volatilidade anualizada no ano corrente até data_fim
-            df_ano = df_ret[(df_ret['Data'] >= pd.Timestamp(year=ano, month=1, day=1)) & (df_ret['Data'] <= data_fim)]
-            retornos_ano = df_ano['Retorno'].dropna().values
-            vol_ano = np.std(retornos_ano, ddof=1) * np.sqrt(252) if len(retornos_ano) >= 2 else np.nan
-
-            resultados.append({
-                'Ativo': ativo,
-                'Volatilidade Mensal (%)': round(vol_mensal * 100, 2) if pd.notnull(vol_mensal) else 0.0,
-                'Volatilidade 6 Meses (%)': round(vol_6m * 100, 2) if pd.notnull(vol_6m) else 0.0,
-                'Volatilidade 12 Meses (%)': round(vol_12m * 100, 2) if pd.notnull(vol_12m) else 0.0,
-                'Volatilidade 24 Meses (%)': round(vol_24m * 100, 2) if pd.notnull(vol_24m) else 0.0,
-                'Volatilidade 36 Meses (%)': round(vol_36m * 100, 2) if pd.notnull(vol_36m) else 0.0,
-                'Volatilidade Anualizada no Ano (%)': round(vol_ano * 100, 2) if pd.notnull(vol_ano) else 0.0,
-            })
-
-        return resultados
+        return tabela_risco(pd.Timestamp(year=ano, month=mes, day=1), categoria, atual())
 
     except Exception as e:
         print(f"[Erro atualizar tabela risco]: {e}")
@@ -473,15 +362,13 @@ def atualizar_meses_inflacao(ano):
     [Input('inflacao-ano-dropdown', 'value'),
      Input('inflacao-mes-dropdown', 'value')]
 )
+@cache_de_figuras
 def atualizar_grafico_tabela_inflacao(ano, mes):
     if ano is None or mes is None:
         return no_update, no_update, no_update
     fig, colunas, dados = gerar_grafico_e_tabela(ano, mes)
     return fig, colunas, dados
 # =================== ABA TAXAS ===================
-def meses_taxas(ano):
-    return sorted(fechamentos_df[fechamentos_df['Data'].dt.year == ano]['Data'].dt.month.unique())
-
 @app.callback(
     [Output('taxas-mes-dropdown', 'options'),
      Output('taxas-mes-dropdown', 'value')],
@@ -503,10 +390,23 @@ def update_meses_taxas(ano):
         Input('taxas-mes-dropdown', 'value'),
         Input('taxas-tipo-radio', 'value'),
         Input('taxas-venc-dropdown', 'value'),
-        Input('taxas-periodo-dropdown', 'value')
+        Input('taxas-periodo-dropdown', 'value'),
+        Input('grafico-taxas', 'relayoutData')
     ]
 )
-def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
+def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses, relayout):
+    if None in [ano, mes, periodo_meses]:
+        return figura_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses)
+    faixa = faixa_do_callback('grafico-taxas', relayout, lambda: np.diff(
+        posicoes_meses(derivado('taxas')['calendario_taxas'], ano, mes, periodo_meses))[0])
+    if faixa is no_update:
+        return no_update
+    if faixa is None:
+        return figura_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses)
+    return figura_taxas.__wrapped__(ano, mes, tipo_indexacao, anos_venc, periodo_meses, faixa)
+
+@cache_de_figuras
+def figura_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses, faixa=None):
     if None in [ano, mes, periodo_meses]:
         return go.Figure(layout=dict(
             title='Sem dados disponíveis',
@@ -515,34 +415,19 @@ def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
             plot_bgcolor='#34495e'
         ))
 
-    try:
-        dia_final = calendar.monthrange(ano, mes)[1]
-        data_fim = pd.Timestamp(year=ano, month=mes, day=dia_final)
-        data_fim = pd.Timestamp(year=ano, month=mes, day=calendar.monthrange(ano, mes)[1])
-        data_inicio = data_fim - pd.DateOffset(months=periodo_meses - 1)
-        data_inicio = data_inicio.replace(day=1)  # Garante início do mês
-
-    except Exception as e:
-        print(f"[Erro datas]: {e}")
-        return go.Figure()
-
-    df_filtrado = df_taxas_melted[
-        (df_taxas_melted['Data'] >= data_inicio) & 
-        (df_taxas_melted['Data'] <= data_fim)
-    ].copy()
-
+    dados_taxas = derivado('taxas')
+    painel = dados_taxas['painel_taxas']
+    # Datas dos `periodo_meses` meses até o mês selecionado, pelo calendário da aba
+    posicoes = posicoes_meses(dados_taxas['calendario_taxas'], ano, mes, periodo_meses)
+    filtros = {}
     if tipo_indexacao and tipo_indexacao != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Tipo'] == tipo_indexacao]
-
+        filtros['Tipo'] = tipo_indexacao
     if anos_venc:
-        if isinstance(anos_venc, list):
-            df_filtrado = df_filtrado[df_filtrado['AnoVencimento'].isin(anos_venc)]
-        else:
-            df_filtrado = df_filtrado[df_filtrado['AnoVencimento'] == anos_venc]
+        filtros['AnoVencimento'] = anos_venc
 
-    df_filtrado = df_filtrado[df_filtrado['Taxas'].notnull()]
+    janela_taxas = janela(painel, colunas=selecionar(painel, **filtros), posicoes=posicoes)
 
-    if df_filtrado.empty:
+    if np.isnan(np.asarray(janela_taxas.valores, dtype=float)).all():
         return go.Figure(layout=dict(
             title='Sem dados disponíveis para os filtros selecionados',
             template='plotly_dark',
@@ -550,15 +435,10 @@ def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
             plot_bgcolor='#34495e'
         ))
 
-    fig = px.line(
-        df_filtrado,
-        x='Data',
-        y='Taxas',
-        color='Titulo',
-        title='Evolução das Taxas dos Títulos',
-        markers=True,
-        template='plotly_dark'
-    )
+    # Títulos sem nenhuma taxa na janela ficam fora; as lacunas dos demais são ligadas
+    fig = figura_linhas(janela_taxas, titulo_y='Taxas', titulo_legenda='Titulo', omitir_vazios=True,
+                        alvo=PONTOS_POR_TRACE, detalhe=faixa, title='Evolução das Taxas dos Títulos',
+                        uirevision=f"{ano}/{mes}/{tipo_indexacao}/{anos_venc}/{periodo_meses}")
     fig.update_traces(hoverinfo='skip')
 
     fig.update_layout(
@@ -567,30 +447,7 @@ def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
         title='Taxa',
         color='white'  # para o texto ficar visível no tema dark
     ),
-    paper_bgcolor='#34495e',
-    plot_bgcolor='#34495e',
-    legend=dict(
-        orientation='h',
-        yanchor='bottom',
-        y=1.05,
-        xanchor='center',
-        x=0.5,
-        font=dict(color='white')
-    ),
-    annotations=[
-        dict(
-            x=1,
-            y=1.3,
-            xref='paper',
-            yref='paper',
-            text='*Clique 2x no ativo para visualização única',
-            showarrow=False,
-            font=dict(color='white', size=12),
-            align='right',
-            xanchor='right',
-            yanchor='top'
-        )
-    ]
+    annotations=[anotacao_clique(x=1, y=1.3, xanchor='right', yanchor='top')]
 )
 
     return fig
@@ -598,28 +455,38 @@ def atualizar_grafico_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
 @app.callback(
     Output('grafico-duration', 'figure'),
     Input('taxas-ano-dropdown', 'value'),
-    Input('taxas-mes-dropdown', 'value')
+    Input('taxas-mes-dropdown', 'value'),
+    Input('grafico-duration', 'relayoutData')
 )
-def atualizar_grafico_duration(ano, mes):
-    if ano is None or mes is None or df_duration_melted.empty:
+def atualizar_grafico_duration(ano, mes, relayout):
+    if ano is None or mes is None:
+        return figura_duration(ano, mes)
+    faixa = faixa_do_callback('grafico-duration', relayout, lambda: np.diff(
+        posicoes_no_ano(derivado('taxas')['calendario_duration'], ano, mes))[0])
+    if faixa is no_update:
+        return no_update
+    if faixa is None:
+        return figura_duration(ano, mes)
+    return figura_duration.__wrapped__(ano, mes, faixa)
+
+@cache_de_figuras
+def figura_duration(ano, mes, faixa=None):
+    dados_taxas = derivado('taxas')
+    painel_duration = dados_taxas['painel_duration']
+    if ano is None or mes is None or vazio(painel_duration):
         return go.Figure()
 
-    data_inicio = pd.Timestamp(year=ano, month=1, day=1)
-    dia_final = calendar.monthrange(ano, mes)[1]
-    data_fim = pd.Timestamp(year=ano, month=mes, day=dia_final)
-
-    df_filtrado = df_duration_melted[
-        (df_duration_melted['Data'] >= data_inicio) &
-        (df_duration_melted['Data'] <= data_fim)
-    ].copy()
-
-    fig = px.line(
-        df_filtrado, x='Data', y='Duration', color='Titulo',
-        title='Duration', markers=True, template='plotly_dark'
-    )
-    fig.update_layout(paper_bgcolor='#34495e', plot_bgcolor='#34495e')
+    # De janeiro até o mês selecionado
+    posicoes = posicoes_no_ano(dados_taxas['calendario_duration'], ano, mes)
+    fig = figura_linhas(janela(painel_duration, posicoes=posicoes), titulo_y='Duration', titulo_legenda='Titulo',
+                        alvo=PONTOS_POR_TRACE, detalhe=faixa, title='Duration', uirevision=f"{ano}/{mes}")
     return fig
 
+# Números com 2 casas decimais para as tabelas, '-' onde não há valor
+def formatar_numeros(valores):
+    valores = np.asarray(valores, dtype=float)
+    return np.where(np.isnan(valores), '-', np.char.mod('%.2f', valores))
+
 @app.callback(
     Output('tabela-taxas', 'data'),
     [
@@ -634,98 +501,46 @@ def atualizar_tabela_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
     if None in [ano, mes, periodo_meses]:
         return []
 
-    try:
-        dia_final = calendar.monthrange(ano, mes)[1]
-        data_fim = pd.Timestamp(year=ano, month=mes, day=dia_final)
-        data_inicio = data_fim - pd.DateOffset(months=periodo_meses - 1)
-        data_inicio = data_inicio.replace(day=1)
-
-    except Exception as e:
-        print(f"[Erro datas]: {e}")
-        return []
-
-    df_filtrado = df_taxas_melted[
-        (df_taxas_melted['Data'] >= data_inicio) & 
-        (df_taxas_melted['Data'] <= data_fim)
-    ].copy()
-
+    dados_taxas = derivado('taxas')
+    painel, calendario_taxas = dados_taxas['painel_taxas'], dados_taxas['calendario_taxas']
+    painel_duration = dados_taxas['painel_duration']
+    filtros = {}
     if tipo_indexacao:
-        df_filtrado = df_filtrado[df_filtrado['Tipo'] == tipo_indexacao]
-
+        filtros['Tipo'] = tipo_indexacao
     if anos_venc:
-        if isinstance(anos_venc, list):
-            df_filtrado = df_filtrado[df_filtrado['AnoVencimento'].isin(anos_venc)]
-        else:
-            df_filtrado = df_filtrado[df_filtrado['AnoVencimento'] == anos_venc]
-
-    df_filtrado = df_filtrado[df_filtrado['Taxas'].notnull()]
-    if df_filtrado.empty:
+        filtros['AnoVencimento'] = anos_venc
+
+    # Posições do período, do mês e do ano (dentro do período) no calendário da aba
+    colunas_taxas = selecionar(painel, **filtros)
+    i0, i1 = posicoes_meses(calendario_taxas, ano, mes, periodo_meses)
+    posicoes_mes = posicoes_meses(calendario_taxas, ano, mes)
+    posicoes_ano = (max(i0, posicoes_no_ano(calendario_taxas, ano, mes)[0]), i1)
+
+    # Variação em pontos-base entre a primeira e a última taxa válida de cada título no mês e no ano,
+    # numa chamada; ficam os títulos com taxa no ano (o mês está dentro dele), em ordem alfabética
+    bp_mes, bp_ano = variacao_nas_janelas(dados_taxas['validos_taxas'], [posicoes_mes, posicoes_ano], colunas_taxas) * 10000
+    com_taxa = ~np.isnan(bp_ano)
+    if not com_taxa.any():
         return []
+    colunas_taxas = colunas_taxas[com_taxa]
+
+    # Última duration válida de cada título no período e taxa de fechamento (última taxa válida do mês),
+    # por junção as-of no fim do mês; a duration é ligada ao título pelo ID do cadastro
+    data_fechamento = pd.Timestamp(year=ano, month=mes, day=1) + pd.offsets.MonthEnd(0)
+    inicio_periodo = (data_fechamento - pd.DateOffset(months=periodo_meses - 1)).replace(day=1)
+    ultima_duration = valores_ate(dados_taxas['validos_duration'], data_fechamento, desde=inicio_periodo)
+    na_duration = alinhar_ids(painel.ids[colunas_taxas], painel_duration.ids)
+    duration = np.where(na_duration >= 0, ultima_duration[na_duration], np.nan) / 252
+    fechamento = valores_ate(dados_taxas['validos_taxas'], data_fechamento, colunas_taxas, desde=data_fechamento.replace(day=1))
+
+    df_result = pd.DataFrame({
+        'Ativo': pd.Index(painel.ativos[colunas_taxas]).str.strip().str.upper(),
+        'BP_Mes': formatar_numeros(bp_mes[com_taxa]),
+        'BP_Ano': formatar_numeros(bp_ano[com_taxa]),
+        'Duration': formatar_numeros(duration),
+        'Fechamento (%)': formatar_numeros(fechamento * 100),
+    }).sort_values('Ativo', kind='stable')
 
-    data_inicio_mes = pd.Timestamp(year=ano, month=mes, day=1)
-    dia_final_mes = calendar.monthrange(ano, mes)[1]
-    data_fim_mes = pd.Timestamp(year=ano, month=mes, day=dia_final_mes)
-    data_inicio_ano = pd.Timestamp(year=ano, month=1, day=1)
-
-    df_mensal = df_filtrado[(df_filtrado['Data'] >= data_inicio_mes) & (df_filtrado['Data'] <= data_fim_mes)]
-    df_inicio_mes = df_mensal.groupby('Titulo')['Data'].min().reset_index().merge(df_mensal, on=['Titulo', 'Data'])
-    df_fim_mes = df_mensal.groupby('Titulo')['Data'].max().reset_index().merge(df_mensal, on=['Titulo', 'Data'])
-    df_bp_mensal = df_inicio_mes[['Titulo', 'Taxas']].rename(columns={'Taxas': 'Taxa_Inicial'}) \
-        .merge(df_fim_mes[['Titulo', 'Taxas']].rename(columns={'Taxas': 'Taxa_Final'}), on='Titulo')
-    df_bp_mensal['BP_Mes'] = (df_bp_mensal['Taxa_Final'] - df_bp_mensal['Taxa_Inicial']) * 10000
-    df_bp_mensal = df_bp_mensal[['Titulo', 'BP_Mes']]
-
-    df_anual = df_filtrado[(df_filtrado['Data'] >= data_inicio_ano) & (df_filtrado['Data'] <= data_fim)]
-    df_inicio_ano = df_anual.groupby('Titulo')['Data'].min().reset_index().merge(df_anual, on=['Titulo', 'Data'])
-    df_fim_ano = df_anual.groupby('Titulo')['Data'].max().reset_index().merge(df_anual, on=['Titulo', 'Data'])
-    df_bp_anual = df_inicio_ano[['Titulo', 'Taxas']].rename(columns={'Taxas': 'Taxa_Inicial'}) \
-        .merge(df_fim_ano[['Titulo', 'Taxas']].rename(columns={'Taxas': 'Taxa_Final'}), on='Titulo')
-    df_bp_anual['BP_Ano'] = (df_bp_anual['Taxa_Final'] - df_bp_anual['Taxa_Inicial']) * 10000
-    df_bp_anual = df_bp_anual[['Titulo', 'BP_Ano']]
-
-    df_duration_filtrado = df_duration_melted[
-        (df_duration_melted['Data'] >= data_inicio) & 
-        (df_duration_melted['Data'] <= data_fim)
-    ]
-    df_duration_last = (
-        df_duration_filtrado.sort_values(['Titulo', 'Data'])
-        .groupby('Titulo')
-        .last()
-        .reset_index()
-    )
-    df_duration_last['Duration'] = df_duration_last['Duration'] / 252
-
-    df_bp_mensal['Titulo'] = df_bp_mensal['Titulo'].str.strip().str.upper()
-    df_bp_anual['Titulo'] = df_bp_anual['Titulo'].str.strip().str.upper()
-    df_duration_last['Titulo'] = df_duration_last['Titulo'].str.strip().str.upper()
-
-    df_result = (
-        df_bp_mensal
-        .merge(df_bp_anual, on='Titulo', how='outer')
-        .merge(df_duration_last[['Titulo', 'Duration']], on='Titulo', how='left')
-    )
-
-    # --- Início da parte nova para Fechamento ---
-    data_fechamento = pd.Timestamp(year=ano, month=mes, day=dia_final)
-    df_fechamento = df_taxas_melted[
-        (df_taxas_melted['Data'] == data_fechamento) & 
-        (df_taxas_melted['Taxas'].notnull())
-    ].copy()
-    df_fechamento = df_fechamento[['Titulo', 'Taxas']].rename(columns={'Taxas': 'Fechamento'})
-    df_fechamento['Titulo'] = df_fechamento['Titulo'].str.strip().str.upper()
-
-    df_result = df_result.merge(df_fechamento, left_on='Titulo', right_on='Titulo', how='left')
-    # --- Fim da parte nova ---
-
-    df_result.rename(columns={'Titulo': 'Ativo'}, inplace=True)
-
-    df_result['BP_Mes'] = df_result['BP_Mes'].apply(lambda x: f"{x:.2f}" if pd.notna(x) else '-')
-    df_result['BP_Ano'] = df_result['BP_Ano'].apply(lambda x: f"{x:.2f}" if pd.notna(x) else '-')
-    df_result['Duration'] = df_result['Duration'].apply(lambda x: f"{x:.2f}" if pd.notna(x) else '-')
-    df_result['Fechamento'] = df_result['Fechamento'].apply(lambda x: f"{x*100:.2f}" if pd.notna(x) else '-')
-
-    df_result.rename(columns={'Fechamento': 'Fechamento (%)'}, inplace=True)
-    
     return df_result.to_dict('records')
 
 # =================== ABA GERAL ===================
@@ -735,24 +550,8 @@ def atualizar_tabela_taxas(ano, mes, tipo_indexacao, anos_venc, periodo_meses):
     Input('interval-component', 'n_intervals')
 )
 def atualizar_grafico_retorno(n):
-    df_preco = carregar_dados_retorno()
-    df_retorno_acumulado = calcular_retorno_acumulado_6m(df_preco)
-    fig = criar_grafico_retorno_acumulado(df_retorno_acumulado)
-    return fig
-
-# Função para obter retorno mensal do CDI e Ibovespa
-def obter_retorno_mensal(df, ativos=['CDI', 'Ibovespa']):
-    ultimo_mes = df['Data'].max().to_period('M')
-    df_mes = df[df['Data'].dt.to_period('M') == ultimo_mes].copy()
-
-    retornos = {}
-    for ativo in ativos:
-        if ativo in df_mes.columns:
-            serie = df_mes[ativo].dropna() / 100  # convertendo % para decimal
-            if not serie.empty:
-                retorno = (1 + serie).prod() - 1
-                retornos[ativo] = retorno
-    return retornos
+    # Figura já calculada para a versão atual da planilha
+    return derivado('geral')['fig_retorno_6m']
 
 # Callback para atualizar o texto minimalista dos retornos mensais
 @app.callback(
@@ -760,7 +559,7 @@ def obter_retorno_mensal(df, ativos=['CDI', 'Ibovespa']):
     Input('interval-component', 'n_intervals')
 )
 def atualizar_retorno_mensal(n_intervals):
-    retornos_mensais, _ = obter_retorno_mensal_completo()
+    retornos_mensais = derivado('geral')['retornos_mensais']
 
     itens = []
     for ativo, retorno in retornos_mensais.items():
@@ -770,6 +569,12 @@ def atualizar_retorno_mensal(n_intervals):
 
     return itens
 
+# Lista "Ativo: retorno%" dos ativos nas posições dadas, na ordem dada
+def lista_movimentos(movimentos, posicoes):
+    linhas = [f"{ativo}: {retorno * 100:.2f}%"
+              for ativo, retorno in zip(movimentos.ativos[posicoes], movimentos.retornos[posicoes].tolist())]
+    return html.Ul([html.Li(linha) for linha in linhas])
+
 # Callback para mostrar os piores retornos
 @app.callback(
     Output('ativos-pior-retorno', 'children'),
@@ -781,56 +586,16 @@ def atualizar_retorno_mensal(n_intervals):
 def mostrar_ativos_pior_retorno(ano, mes, n):
     if None in [ano, mes]:
         return "Selecione ano e mês"
-    
+
     if n is None:
         n = 5
 
-    df_ret = carregar_dados_retorno()
-    df_inflacao = carregar_dados_inflacao()
-    ativos_inflacao = ['IPCA', 'INPC', 'IGP-M']
-    df_retorno_melt = df_ret.melt(id_vars='Data', var_name='Ativo', value_name='Retorno')
-    df_retorno_melt['Data'] = pd.to_datetime(df_retorno_melt['Data'])
-
-    dia_fim = calendar.monthrange(ano, mes)[1]
-    data_inicio = pd.Timestamp(year=ano, month=mes, day=1)
-    data_fim = pd.Timestamp(year=ano, month=mes, day=dia_fim)
-
-    df_mes = df_retorno_melt[
-        (df_retorno_melt['Data'] >= data_inicio) & (df_retorno_melt['Data'] <= data_fim)
-    ].copy()
-
-    if df_mes.empty:
+    # Retornos do mês calculados uma vez por versão dos dados e mês (comuns às duas listas)
+    movimentos = movimentos_do_mes(ano, mes)
+    if not len(movimentos.retornos):
         return "Nenhum dado para o período"
 
-    df_mes = df_mes[~df_mes['Ativo'].isin(ativos_inflacao)]  # Exclui IPCA, INPC, IGP-M
-
-    df_mes['Retorno'] = pd.to_numeric(df_mes['Retorno'], errors='coerce')
-    df_mes['RetornoDecimal'] = df_mes['Retorno'] / 100
-
-    df_retorno_acumulado = df_mes.groupby('Ativo').agg(
-        retorno_acumulado=('RetornoDecimal', lambda x: (1 + x).prod() - 1)
-    ).reset_index()
-
-    # 🔧 Adiciona inflação
-    df_inf_mes = df_inflacao[
-        (df_inflacao['Data'] >= data_inicio) & (df_inflacao['Data'] <= data_fim)
-    ]
-
-    for ativo in ativos_inflacao:
-        if ativo in df_inf_mes.columns:
-            serie = df_inf_mes[ativo].dropna()
-            if len(serie) >= 2:
-                preco_inicio = serie.iloc[0]
-                preco_fim = serie.iloc[-1]
-                retorno = (preco_fim / preco_inicio) - 1
-                df_retorno_acumulado = pd.concat([
-                    df_retorno_acumulado,
-                    pd.DataFrame([{'Ativo': ativo, 'retorno_acumulado': retorno}])
-                ], ignore_index=True)
-
-    df_piores = df_retorno_acumulado.sort_values('retorno_acumulado').head(n)
-    linhas = [f"{row['Ativo']}: {row['retorno_acumulado'] * 100:.2f}%" for _, row in df_piores.iterrows()]
-    return html.Ul([html.Li(linha) for linha in linhas])
+    return lista_movimentos(movimentos, menores_k(movimentos.retornos, n))
 
 # ✅ Callback para mostrar os MELHORES retornos
 @app.callback(
@@ -842,56 +607,15 @@ def mostrar_ativos_pior_retorno(ano, mes, n):
 def mostrar_ativos_melhor_retorno(ano, mes, n):
     if None in [ano, mes]:
         return "Selecione ano e mês"
-    
+
     if n is None:
         n = 5
 
-    df_ret = carregar_dados_retorno()
-    df_inflacao = carregar_dados_inflacao()
-    ativos_inflacao = ['IPCA', 'INPC', 'IGP-M']
-    df_retorno_melt = df_ret.melt(id_vars='Data', var_name='Ativo', value_name='Retorno')
-    df_retorno_melt['Data'] = pd.to_datetime(df_retorno_melt['Data'])
-
-    dia_fim = calendar.monthrange(ano, mes)[1]
-    data_inicio = pd.Timestamp(year=ano, month=mes, day=1)
-    data_fim = pd.Timestamp(year=ano, month=mes, day=dia_fim)
-
-    df_mes = df_retorno_melt[
-        (df_retorno_melt['Data'] >= data_inicio) & (df_retorno_melt['Data'] <= data_fim)
-    ].copy()
-
-    if df_mes.empty:
+    movimentos = movimentos_do_mes(ano, mes)
+    if not len(movimentos.retornos):
         return "Nenhum dado para o período"
 
-    df_mes = df_mes[~df_mes['Ativo'].isin(ativos_inflacao)]
-
-    df_mes['Retorno'] = pd.to_numeric(df_mes['Retorno'], errors='coerce')
-    df_mes['RetornoDecimal'] = df_mes['Retorno'] / 100
-
-    df_retorno_acumulado = df_mes.groupby('Ativo').agg(
-        retorno_acumulado=('RetornoDecimal', lambda x: (1 + x).prod() - 1)
-    ).reset_index()
-
-    # 🔧 Adiciona inflação
-    df_inf_mes = df_inflacao[
-        (df_inflacao['Data'] >= data_inicio) & (df_inflacao['Data'] <= data_fim)
-    ]
-
-    for ativo in ativos_inflacao:
-        if ativo in df_inf_mes.columns:
-            serie = df_inf_mes[ativo].dropna()
-            if len(serie) >= 2:
-                preco_inicio = serie.iloc[0]
-                preco_fim = serie.iloc[-1]
-                retorno = (preco_fim / preco_inicio) - 1
-                df_retorno_acumulado = pd.concat([
-                    df_retorno_acumulado,
-                    pd.DataFrame([{'Ativo': ativo, 'retorno_acumulado': retorno}])
-                ], ignore_index=True)
-
-    df_melhores = df_retorno_acumulado.sort_values('retorno_acumulado', ascending=False).head(n)
-    linhas = [f"{row['Ativo']}: {row['retorno_acumulado'] * 100:.2f}%" for _, row in df_melhores.iterrows()]
-    return html.Ul([html.Li(linha) for linha in linhas])
+    return lista_movimentos(movimentos, maiores_k(movimentos.retornos, n))
 
 # Callback para carregar e mostrar a evolução das taxas dos ativos
 @app.callback(
@@ -953,15 +677,17 @@ from dash import Input, Output, callback
 def atualizar_descricao_e_retorno(ativo_selecionado):
     conceito = indicadores.get(ativo_selecionado, "Sem descrição disponível.")
 
-    # Correção: usa a última data do DataFrame para obter o mês correto
+    # Correção: usa o último mês com dados (cubo mensal) para obter o mês correto
     meses_abrev_pt = {
         1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
         7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'
     }
-    ultima_data = df_ret['Data'].max()
-    mes_abreviado = meses_abrev_pt[ultima_data.month]
+    snap = atual()
+    cubo = derivado('retorno', snap)['cubo_retorno']
+    mes_abreviado = meses_abrev_pt[int(cubo.meses[-1]) % 12 + 1]
 
-    retornos = calcular_retorno_acumulado_por_periodo(df_ret, ativo_selecionado, mes_abreviado)
+    # Retornos por horizonte já calculados para a versão atual da planilha
+    retornos = retornos_do_indicador(derivado('geral', snap)['retornos_por_periodo'], ativo_selecionado)
 
     return [
         html.H5(f"📘 Conceito - {ativo_selecionado}", style={
@@ -0,0 +1,263 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from dados import ABAS, registrar_derivacao
+
+# Cadastro único dos ativos da planilha. Cada ativo recebe um ID inteiro e um nome canônico (a grafia
+# da aba Retorno, quando aparece nela); as outras grafias (Risco: 'Ibrx', 'Ima S'...; Duration:
+# 'Ima-B Tot'...) viram apelidos do mesmo ID. Os metadados (categorias, indexação, vencimento,
+# descrição) ficam numa tabela indexada pelo ID, montada uma vez por versão da planilha, e os
+# filtros por categoria são buscas nos arrays de IDs de cada valor (ver analitico.selecionar)
+Cadastro = namedtuple('Cadastro', ['tabela', 'ids', 'membros'])
+
+# Atributos com arrays de IDs pré-calculados por valor
+ATRIBUTOS = ['Categoria', 'CategoriaRisco', 'Tipo', 'AnoVencimento']
+
+# Grafias que não se resolvem só pela chave normalizada (nome canônico -> apelidos)
+apelidos = {
+    'IMA-G': ['Ima Geral'],
+    'Ima-B': ['Ima-B Tot'],
+    'IRF-M': ['Ind RF-M Tot'],
+    'IRF-M 1': ['Ind RF-M 1'],
+    'IRF-M 1+': ['Ind RF-M 1+'],
+}
+
+# Categoria de cada ativo nas abas Geral e Retorno
+categorias = {
+    # Pós-fixado
+    'NTN-B 2026': 'Pós-fixado (IPCA+)',
+    'NTN-B 2027': 'Pós-fixado (IPCA+)',
+    'NTN-B 2028': 'Pós-fixado (IPCA+)',
+    'NTN-B 2029': 'Pós-fixado (IPCA+)',
+    'NTN-B 2030': 'Pós-fixado (IPCA+)',
+    'NTN-B 2032': 'Pós-fixado (IPCA+)',
+    'NTN-B 2033': 'Pós-fixado (IPCA+)',
+    'NTN-B 2035': 'Pós-fixado (IPCA+)',
+    'NTN-B 2040': 'Pós-fixado (IPCA+)',
+    'NTN-B 2045': 'Pós-fixado (IPCA+)',
+    'NTN-B 2050': 'Pós-fixado (IPCA+)',
+    'NTN-B 2055': 'Pós-fixado (IPCA+)',
+    'NTN-B 2060': 'Pós-fixado (IPCA+)',
+
+    # Tesouro Selic (LFT)
+    'LFT 1 3 2026': 'Tesouro Selic',
+    'LFT 1 9 2026': 'Tesouro Selic',
+    'LFT 1 3 2027': 'Tesouro Selic',
+    'LFT 1 9 2027': 'Tesouro Selic',
+    'LFT 1 3 2028': 'Tesouro Selic',
+    'LFT 1 9 2028': 'Tesouro Selic',
+
+    # Renda Fixa - Pré-fixado
+    'NTN-F 2027': 'Renda Fixa - Pré-fixado',
+    'NTN-F 2029': 'Renda Fixa - Pré-fixado',
+    'NTN-F 2031': 'Renda Fixa - Pré-fixado',
+    'NTN-F 2033': 'Renda Fixa - Pré-fixado',
+    'NTN-C 2031': 'Renda Fixa - Pré-fixado',
+
+    # Renda Fixa (Índices)
+    'IMA-G': 'Renda Fixa',
+    'Ima-B': 'Renda Fixa',
+    'Ima-B 5': 'Renda Fixa',
+    'Ima-B 5+': 'Renda Fixa',
+    'IRF-M': 'Renda Fixa',
+    'IRF-M 1': 'Renda Fixa',
+    'IRF-M 1+': 'Renda Fixa',
+
+    # Selic
+    'CDI': 'Selic',
+    'IMA-S': 'Selic',
+
+    # Crédito
+    'IDA DI': 'Crédito',
+    'IDA Geral': 'Crédito',
+    'IDA IPCA': 'Crédito',
+    'Jgp - CDI': 'Crédito',
+
+    # Renda Variável
+    'Ibovespa': 'Renda Variável',
+    'IBRX': 'Renda Variável',
+    'IDIV': 'Renda Variável',
+    'Small Caps': 'Renda Variável',
+    'Midlarge Cap': 'Renda Variável',
+    'IFIX': 'Renda Variável',
+    'IVBX-2': 'Renda Variável',
+    'IGC-NM': 'Renda Variável',
+    'ISEE': 'Renda Variável',
+    'ICO-2': 'Renda Variável',
+
+    # Internacional
+    'S&P 500': 'Internacional',
+    'Nasdaq': 'Internacional',
+    'Dólar Ptax': 'Internacional',
+    'Euro': 'Internacional',
+
+    # Multimercado
+    'IHFA': 'Multimercado',
+}
+
+# Categoria de cada ativo na aba Risco
+categorias_risco = {
+    'Ibovespa': 'Renda Variável',
+    'CDI': 'Renda Fixa',
+    'IDA Geral': 'Crédito',
+    'IHFA': 'Multimercado',
+    'Ima-B 5': 'Renda Fixa',
+    'Ima-B 5+': 'Renda Fixa',
+    'Ima-B': 'Renda Fixa',
+    'IRF-M': 'Renda Fixa',
+    'S&P 500': 'Internacional',
+    'Nasdaq': 'Internacional',
+    'IDA DI': 'Crédito',
+    'IDA IPCA': 'Renda Fixa',
+    'IFIX': 'Renda Variável',
+    'Small Caps': 'Renda Variável',
+    'Jgp - CDI': 'Crédito',
+    'IBRX': 'Renda Variável',
+    'IVBX-2': 'Renda Variável',
+    'IGC-NM': 'Renda Variável',
+    'ISEE': 'Renda Variável',
+    'ICO-2': 'Renda Variável',
+    'IDIV': 'Renda Variável',
+    'Midlarge Cap': 'Renda Variável',
+    'IMA-S': 'Renda Fixa',
+    'IMA-G': 'Renda Fixa',
+    'Dólar Ptax': 'Internacional',
+}
+
+# Dicionário com indicadores e seus significados (as famílias LFT/NTN-F/NTN-B valem para os títulos)
+indicadores = {
+    # Renda Fixa - Pós-Fixado
+    "CDI": "Taxa usada como referência para empréstimos entre bancos.",
+    "Jgp - CDI": "Índice de crédito privado atrelado ao CDI.",
+    "LFT": "Título público que acompanha a taxa Selic.",
+    "IMA-S": "Índice de títulos públicos atrelados à taxa Selic.",
+    # Renda Fixa - Pré-Fixado
+    "IRF-M": "Índice que mede o desempenho de títulos públicos prefixados.",
+    "IRF-M 1": "Índice que mede o desempenho de títulos públicos prefixados com vencimento em até 1 ano.",
+    "IRF-M 1+": "Índice que mede o desempenho de títulos públicos prefixados com vencimento acima de 1 ano.",
+    "NTN-F": "Título público prefixado.",
+    # Debêntures
+    "IDA IPCA": "Índices que acompanham carteiras de debêntures incentivadas atreladas à inflação.",
+    "IDA Geral": "Índices que acompanham carteiras de debêntures incentivadas atreladas à inflação.",
+    "IDA DI": "Índices que acompanham carteiras de debêntures incentivadas atreladas ao DI.",
+    # Renda Variável
+    "Ibovespa": "Índice das ações mais negociadas da bolsa.",
+    "IBRX": "Índice das 50 ou 100 ações mais representativas.",
+    "IDIV": "Índice de ações que mais pagam dividendos.",
+    "Small Caps": "Índice de empresas pequenas da bolsa.",
+    "Midlarge Cap": "Índice de empresas médias e grandes.",
+    "IFIX": "Índice que mede o desempenho dos principais fundos imobiliários (FIIs).",
+    "IVBX-2": "Índice com ações de empresas bem avaliadas, mas fora do top 10 em valor de mercado e liquidez.",
+    "IGC-NM": "Índice de ações de empresas listadas no Novo Mercado, com alto padrão de governança.",
+    "ISEE": "Índice de Sustentabilidade Empresarial, com empresas comprometidas com práticas ESG.",
+    "ICO-2": "Índice com empresas que adotam boas práticas de gestão de carbono.",
+    "IHFA": "Índice de fundos multimercado.",
+    # Inflação
+    "IPCA": "Índice oficial da inflação no Brasil.",
+    "IGP-M": "Índice usado em contratos de aluguel.",
+    "INPC": "Índice que mede a inflação para famílias de menor renda.",
+    "Ima-B": "Índice de títulos públicos indexados à inflação (IPCA), como as NTN-Bs.",
+    "Ima-B 5": "Índice de títulos públicos indexados à inflação (IPCA) com vencimento até 5 anos.",
+    "Ima-B 5+": "Índice de títulos públicos indexados à inflação (IPCA) com vencimento acima de 5 anos.",
+    "NTN-B": "Título público que paga IPCA + juros até o seu vencimento.",
+    "NTN-C 2031": "Título antigo atrelado ao IGP-M com vencimento em 2031.",
+    # Moedas
+    "Dólar Ptax": "Taxa média do dólar usada em contratos financeiros.",
+    "Euro": "Moeda oficial da zona do euro.",
+    # Renda Variável Internacional
+    "S&P 500": "Índice das 500 maiores empresas dos EUA.",
+    "Nasdaq": "Índice das principais empresas de tecnologia dos EUA."
+}
+
+# Chave de comparação entre grafias: maiúsculas, sem espaços e hífens ('Ima S' == 'IMA-S')
+def chave(nome):
+    return re.sub(r'[\s-]+', '', str(nome)).upper()
+
+# Títulos públicos: família (NTN-B, LFT...) seguida do vencimento
+def eh_titulo_publico(nome):
+    return re.match(r'(NTN-[BCF]|LFT|LTN)\b', str(nome)) is not None
+
+# Tipo de indexação: Prefixado, Pós-fixado ou Tesouro Selic
+def classificar_tipo(titulo):
+    titulo_lower = titulo.lower()
+    if 'lft' in titulo_lower:
+        return 'Pós Fixado (Selic)'
+    elif 'ntn-b' in titulo_lower:
+        return 'Pós Fixado (IPCA)'
+    elif 'ntn-c' in titulo_lower:
+        return 'Pós Fixado (IGP-M)'
+    else:
+        return 'Pré-fixados'
+
+# Função para extrair ano de vencimento do título
+def extrair_ano_venc(titulo):
+    anos = re.findall(r'20\d{2}', titulo)
+    if anos:
+        return int(anos[-1])
+    return None
+
+# Grupo do título nos gráficos de taxas da aba Geral (Pré x Pós IPCA+), uma vez por título
+@lru_cache(maxsize=None)
+def grupo_taxa(titulo):
+    tipo = classificar_tipo(titulo) if eh_titulo_publico(titulo) else None
+    return {'Pré-fixados': 'Pré-fixado', 'Pós Fixado (IPCA)': 'Pós-fixado (IPCA+)'}.get(tipo, 'Outro')
+
+def descricao(nome):
+    if nome in indicadores:
+        return indicadores[nome]
+    familia = re.match(r'(NTN-[BCF]|LFT)\b', nome)
+    return indicadores.get(familia.group(1)) if familia else None
+
+# Monta o cadastro com os ativos de todas as abas (Retorno primeiro, para dar o nome canônico)
+def montar_cadastro(snapshot):
+    canonica = {chave(apelido): chave(nome) for nome, lista in apelidos.items() for apelido in lista}
+    por_chave, nomes, grafias = {}, [], []
+    for nome_aba in ABAS:
+        for nome in snapshot.abas[nome_aba].columns:
+            if nome == 'Data':
+                continue
+            k = canonica.get(chave(nome), chave(nome))
+            if k not in por_chave:
+                por_chave[k] = len(nomes)
+                nomes.append(nome)
+                grafias.append([])
+            elif nome != nomes[por_chave[k]] and nome not in grafias[por_chave[k]]:
+                grafias[por_chave[k]].append(nome)
+
+    # Metadados pela chave, para valerem em qualquer grafia
+    categoria = {chave(nome): valor for nome, valor in categorias.items()}
+    categoria_risco = {chave(nome): valor for nome, valor in categorias_risco.items()}
+    titulos = [eh_titulo_publico(nome) for nome in nomes]
+    tabela = pd.DataFrame({
+        'Nome': nomes,
+        'Apelidos': [tuple(lista) for lista in grafias],
+        'Categoria': pd.Categorical([categoria.get(chave(nome)) for nome in nomes]),
+        'CategoriaRisco': pd.Categorical([categoria_risco.get(chave(nome)) for nome in nomes]),
+        'Tipo': pd.Categorical([classificar_tipo(nome) if titulo else None for nome, titulo in zip(nomes, titulos)]),
+        'AnoVencimento': [extrair_ano_venc(nome) if titulo else np.nan for nome, titulo in zip(nomes, titulos)],
+        'Descricao': [descricao(nome) for nome in nomes],
+    })
+    tabela.index.name = 'ID'
+
+    ids = {}
+    for id_ativo, (nome, lista) in enumerate(zip(nomes, grafias)):
+        for grafia in [nome, *lista]:
+            ids[grafia] = id_ativo
+    return Cadastro(tabela, ids, membros_da_tabela(tabela))
+
+# IDs de cada valor dos atributos filtráveis (a posição na tabela é o ID)
+def membros_da_tabela(tabela):
+    return {
+        atributo: {valor: np.sort(posicoes) for valor, posicoes in tabela.groupby(atributo, observed=True).indices.items()}
+        for atributo in ATRIBUTOS
+    }
+
+registrar_derivacao('ativos', montar_cadastro)
+
+# ID de cada nome (em qualquer grafia conhecida); -1 para nomes fora do cadastro
+def ids_dos_nomes(cadastro, nomes):
+    return np.array([cadastro.ids.get(nome, -1) for nome in nomes], dtype=int)
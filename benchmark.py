@@ -0,0 +1,503 @@
+# Benchmarks dos caminhos de dados do dashboard, medidos sobre a planilha real.
+# Uso: python benchmark.py [nome ...]   (sem nomes, roda todos)
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("INTERVALO_RECARGA", "0")
+
+import dados
+import ativos
+from ativos import Cadastro, membros_da_tabela
+from analitico import para_longo, posicoes_janela, janela, indice_crescimento, composto_no_intervalo, \
+    acumulado_no_intervalo, indice_momentos, volatilidade_nas_janelas, cubo_mensal, retorno_nos_meses, retorno_no_ano, \
+    maiores_k, menores_k, indice_validos, variacao_nas_janelas, valores_ate
+# Os módulos das abas registram as derivações usadas aqui
+import retorno_layout
+import volatilidade_layout
+from volatilidade_layout import tabela_risco
+from retorno_layout import janela_retorno, movimentos_do_mes
+import geral
+from geral import tabela_retornos_por_periodo, retornos_do_indicador, HORIZONTES
+from calendario import montar_calendario, meses_do_ano, posicoes_meses, posicoes_no_ano
+import taxas_layout
+from inflacao_layout import analisar_inflacao, dados_do_ano, INDICES
+import plotly.express as px
+from figuras import estatisticas_figuras, limpar_cache_figuras, figura_linhas, PONTOS_POR_TRACE
+
+# Tempo médio (ms) de `funcao` em `repeticoes` execuções, depois de uma execução de aquecimento
+def cronometrar(funcao, repeticoes=20):
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+def memoria_mb(df):
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+def imprimir(titulo, linhas):
+    print(f"\n== {titulo}")
+    for linha in linhas:
+        print("  " + linha)
+
+# Identificadores em texto repetido (como saía do melt) x Categorical (código inteiro + nomes)
+def bench_identificadores():
+    painel = dados.derivado('retorno')['painel_retorno']
+    painel_taxas = dados.derivado('taxas')['painel_taxas']
+
+    # Antes: melt com os nomes como texto repetido em cada linha
+    antes = dados.aba('Retorno').melt(id_vars='Data', var_name='Ativo', value_name='Retorno')
+    antes['Ativo'] = antes['Ativo'].astype(object)
+    antes['Categoria'] = antes['Ativo'].map(ativos.categorias)
+    taxas_antes = dados.aba('Taxas').melt(id_vars='Data', var_name='Titulo', value_name='Taxas')
+    taxas_antes['Titulo'] = taxas_antes['Titulo'].astype(object)
+    taxas_antes['Tipo'] = taxas_antes['Titulo'].map(ativos.classificar_tipo)
+
+    # Depois: formato longo do painel, com os atributos levados pelos códigos do ativo
+    depois = para_longo(painel, 'Retorno')
+    depois['Categoria'] = painel.atributos['Categoria'].take(depois['Ativo'].cat.codes)
+    taxas_depois = para_longo(painel_taxas, 'Taxas', nome_ativo='Titulo')
+    taxas_depois['Tipo'] = painel_taxas.atributos['Tipo'].take(taxas_depois['Titulo'].cat.codes)
+
+    casos = [
+        ("groupby('Ativo').sum()", lambda df: df.groupby('Ativo', observed=True)['Retorno'].sum(), antes, depois),
+        ("Categoria == 'Renda Fixa'", lambda df: df[df['Categoria'] == 'Renda Fixa'], antes, depois),
+        ("Ativo.isin([...])", lambda df: df[df['Ativo'].isin(['CDI', 'Ibovespa', 'IFIX'])], antes, depois),
+        ("Tipo == 'Pré-fixados'", lambda df: df[df['Tipo'] == 'Pré-fixados'], taxas_antes, taxas_depois),
+    ]
+    linhas = [f"{'':32s}{'texto':>10s}{'categorical':>14s}",
+              f"{'memória Retorno (MB)':32s}{memoria_mb(antes):10.2f}{memoria_mb(depois):14.2f}",
+              f"{'memória Taxas (MB)':32s}{memoria_mb(taxas_antes):10.2f}{memoria_mb(taxas_depois):14.2f}"]
+    for nome, operacao, df_antes, df_depois in casos:
+        linhas.append(f"{nome + ' (ms)':32s}{cronometrar(lambda: operacao(df_antes)):10.2f}"
+                      f"{cronometrar(lambda: operacao(df_depois)):14.2f}")
+    imprimir(f"Identificadores ({len(antes)} linhas Retorno, {len(taxas_antes)} linhas Taxas)", linhas)
+
+# Estatísticas por coluna (ativo) calculadas na fatia da janela, ignorando NaN como o pandas:
+# a base de comparação dos índices de crescimento e de momentos de analitico
+
+# Retorno composto: prod(1 + r) - 1 (coluna sem dados -> 0)
+def retorno_composto(valores):
+    return np.nanprod(1 + valores, axis=0) - 1
+
+# Retorno acumulado dia a dia; onde o retorno é NaN o acumulado também fica NaN
+def retorno_acumulado(valores):
+    acumulado = np.nancumprod(1 + valores, axis=0) - 1
+    acumulado[np.isnan(valores)] = np.nan
+    return acumulado
+
+# Desvio padrão amostral (ddof=1); NaN com menos de 2 observações
+def desvio_padrao(valores):
+    validos = ~np.isnan(valores)
+    n = validos.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(validos, valores, 0).sum(axis=0) / n
+        desvios = np.where(validos, valores - media, 0)
+        variancia = (desvios ** 2).sum(axis=0) / (n - 1)
+    return np.where(n >= 2, np.sqrt(variancia), np.nan)
+
+# Volatilidade anualizada (252 dias úteis)
+def volatilidade(valores):
+    return desvio_padrao(valores) * np.sqrt(252)
+
+# Retornos compostos da tabela da aba Retorno (6/12/24/36 meses e YTD de todos os ativos):
+# produto na fatia da janela x leitura de duas linhas do índice de crescimento, no histórico real
+# e num histórico sintético `fator` vezes mais longo; e o acumulado dia a dia do gráfico (12 meses)
+def bench_retornos(fator=20):
+    painel = dados.derivado('retorno')['painel_retorno']
+    fim = pd.Timestamp(painel.datas[-1])
+    inicios = [(fim - pd.DateOffset(months=m - 1)).replace(day=1) for m in [6, 12, 24, 36]]
+    inicios.append(pd.Timestamp(year=fim.year, month=1, day=1))
+
+    longo = painel._replace(
+        datas=painel.datas[-1] - np.arange(len(painel.datas) * fator)[::-1] * np.timedelta64(1, 'D'),
+        valores=np.asfortranarray(np.tile(np.asarray(painel.valores), (fator, 1))),
+    )
+    linhas = [f"{'':32s}{'produto':>10s}{'índice':>14s}"]
+    for nome, p in [(f"{len(painel.datas)} datas", painel), (f"{len(longo.datas)} datas", longo)]:
+        indice = indice_crescimento(p)
+        produto = lambda: [retorno_composto(janela(p, inicio, fim).valores) for inicio in inicios]
+        leitura = lambda: [composto_no_intervalo(indice, inicio, fim) for inicio in inicios]
+        linhas.append(f"{nome + ' (ms)':32s}{cronometrar(produto):10.3f}{cronometrar(leitura):14.3f}")
+    linhas.append(f"{'montar o índice (ms)':32s}{'':10s}{cronometrar(lambda: indice_crescimento(painel)):14.3f}")
+    indice = indice_crescimento(painel)
+    produto = lambda: retorno_acumulado(janela(painel, inicios[1], fim).valores)
+    leitura = lambda: acumulado_no_intervalo(indice, inicios[1], fim)
+    linhas.append(f"{'acumulado 12 meses (ms)':32s}{cronometrar(produto):10.3f}{cronometrar(leitura):14.3f}")
+    imprimir(f"Retornos compostos (5 janelas x {len(painel.ativos)} ativos)", linhas)
+
+# Volatilidades da tabela da aba Risco (6/12/24/36 meses e ano corrente de todos os ativos):
+# desvio em duas passadas na fatia de cada janela x índice de momentos, e a maior diferença relativa
+def bench_volatilidade():
+    painel = dados.derivado('retorno')['painel_retorno']
+    fim = pd.Timestamp(painel.datas[-1])
+    inicios = [(fim - pd.DateOffset(months=m - 1)).replace(day=1) for m in [6, 12, 24, 36]]
+    inicios.append(pd.Timestamp(year=fim.year, month=1, day=1))
+    momentos = indice_momentos(painel)
+
+    fatias = lambda: np.array([volatilidade(janela(painel, inicio, fim).valores) for inicio in inicios])
+    indice = lambda: volatilidade_nas_janelas(momentos, inicios, fim)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        erro = np.nanmax(np.abs(indice() - fatias()) / np.abs(fatias()))
+    imprimir(f"Volatilidade (5 janelas x {len(painel.ativos)} ativos)", [
+        f"{'fatias, duas passadas (ms)':32s}{cronometrar(fatias):10.3f}",
+        f"{'índice de momentos (ms)':32s}{cronometrar(indice):10.3f}",
+        f"{'montar o índice (ms)':32s}{cronometrar(lambda: indice_momentos(painel), 5):10.3f}",
+        f"{'maior diferença relativa':32s}{erro:10.1e}",
+    ])
+
+# Painel com `n_ativos` colunas copiadas das do painel real (cópia k do ativo de ID i vira o ID
+# k * len(cadastro) + i, num cadastro também replicado), para medir o custo em função do nº de ativos
+def painel_sintetico(painel, n_ativos, copias):
+    tamanho = len(painel.cadastro.tabela)
+    cadastro = Cadastro(pd.concat([painel.cadastro.tabela] * copias, ignore_index=True), {}, None)
+    cadastro = cadastro._replace(membros=membros_da_tabela(cadastro.tabela))
+    base = np.arange(n_ativos) % len(painel.ativos)
+    copia = np.arange(n_ativos) // len(painel.ativos)
+    ids = copia * tamanho + painel.ids[base]
+    return painel._replace(
+        ativos=np.array([f"{nome} #{k}" for nome, k in zip(painel.ativos[base], copia)], dtype=object),
+        valores=np.asfortranarray(np.asarray(painel.valores)[:, base]),
+        atributos={nome: valores[base] for nome, valores in painel.atributos.items()},
+        ids=ids,
+        cadastro=cadastro,
+    )
+
+# Tabela da aba Risco (mensal, 6/12/24/36 meses e ano) em função do nº de ativos: laço por ativo e
+# janela (como era, np.std na fatia de cada ativo) x tabela_risco (matriz janelas x ativos de uma vez)
+def bench_tabela_risco(tamanhos=(30, 300, 3000)):
+    painel_ret = dados.derivado('retorno')['painel_retorno']
+    painel_vol = dados.derivado('risco')['painel_risco']
+    data_fim = pd.Timestamp(painel_ret.datas[-1]) + pd.offsets.MonthEnd(0)
+    inicios = [(data_fim - pd.DateOffset(months=m - 1)).replace(day=1) for m in [6, 12, 24, 36]]
+    inicios.append(pd.Timestamp(year=data_fim.year, month=1, day=1))
+
+    linhas = [f"{'ativos':>8s}{'laço (ms)':>14s}{'tabela_risco (ms)':>20s}"]
+    for n in tamanhos:
+        copias = -(-n // len(painel_ret.ativos))
+        ret = painel_sintetico(painel_ret, n, copias)
+        vol = painel_sintetico(painel_vol, len(painel_vol.ativos) * copias, copias)
+        # Snapshot com as derivações já montadas sobre os painéis sintéticos
+        sintetico = dados.atual()._replace(versao=f"sintetico-{n}", derivados={
+            'retorno': {'painel_retorno': ret, 'momentos_retorno': indice_momentos(ret),
+                        'calendario_retorno': montar_calendario(ret.datas)},
+            'risco': {'painel_risco': vol, 'calendario_risco': montar_calendario(vol.datas)},
+        })
+
+        def laco():
+            coluna_vol = {nome: j for j, nome in enumerate(vol.ativos)}
+            mes = janela(vol, data_fim.replace(day=1), data_fim)
+            registros = []
+            for j, ativo in enumerate(ret.ativos):
+                linha = {'Ativo': ativo}
+                serie_vol = np.asarray(mes.valores[:, coluna_vol[ativo]]) if ativo in coluna_vol else np.empty(0)
+                serie_vol = serie_vol[~np.isnan(serie_vol)]
+                linha['Volatilidade Mensal (%)'] = round(serie_vol[-1] * 100, 2) if len(serie_vol) else 0.0
+                for k, inicio in enumerate(inicios):
+                    serie = np.asarray(janela(ret, inicio, data_fim).valores[:, j])
+                    serie = serie[~np.isnan(serie)]
+                    linha[k] = round(np.std(serie, ddof=1) * np.sqrt(252) * 100, 2) if len(serie) > 1 else 0.0
+                registros.append(linha)
+            return registros
+
+        lote = lambda: tabela_risco(data_fim, 'Todos', sintetico)
+        linhas.append(f"{n:8d}{cronometrar(laco, 3):14.2f}{cronometrar(lote, 10):20.2f}")
+    imprimir("Tabela da aba Risco por nº de ativos", linhas)
+
+# Meses do dropdown e limites de janela: máscara nas datas / aritmética de datas + busca binária x
+# mapa ano -> meses e posições do calendário da aba
+def bench_calendario():
+    dados_retorno = dados.derivado('retorno')
+    painel, calendario = dados_retorno['painel_retorno'], dados_retorno['calendario_retorno']
+    df_retorno = dados_retorno['df_retorno']
+    ano = int(str(painel.datas[-1])[:4])
+
+    def limites_por_data():
+        data_fim = pd.Timestamp(year=ano, month=6, day=1) + pd.offsets.MonthEnd(0)
+        return [posicoes_janela(painel.datas, (data_fim - pd.DateOffset(months=m - 1)).replace(day=1), data_fim)
+                for m in [1, 6, 12, 24, 36]]
+
+    imprimir("Calendário da aba Retorno", [
+        f"{'':32s}{'antes (µs)':>12s}{'calendário (µs)':>18s}",
+        f"{'meses do ano':32s}"
+        f"{cronometrar(lambda: sorted(df_retorno[df_retorno['Data'].dt.year == ano]['Data'].dt.month.unique())) * 1000:12.1f}"
+        f"{cronometrar(lambda: meses_do_ano(calendario, ano)) * 1000:18.1f}",
+        f"{'limites de 5 janelas':32s}{cronometrar(limites_por_data) * 1000:12.1f}"
+        f"{cronometrar(lambda: [posicoes_meses(calendario, ano, 6, m) for m in [1, 6, 12, 24, 36]]) * 1000:18.1f}",
+    ])
+
+# Retorno do mês / no ano / em N meses: composição dos retornos diários a cada consulta x cubo mensal
+def bench_cubo_mensal():
+    dados_retorno = dados.derivado('retorno')
+    painel, calendario = dados_retorno['painel_retorno'], dados_retorno['calendario_retorno']
+    indice, cubo = dados_retorno['indice_retorno'], dados_retorno['cubo_retorno']
+    df_retorno = dados_retorno['df_retorno']
+    codigo = int(cubo.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+
+    def por_mes(n_meses):
+        fim = pd.Timestamp(year=ano, month=mes, day=1) + pd.offsets.MonthEnd(0)
+        inicio = (fim - pd.DateOffset(months=n_meses - 1)).replace(day=1)
+        df = df_retorno[(df_retorno['Data'] >= inicio) & (df_retorno['Data'] <= fim)].drop(columns='Data')
+        return (1 + df).prod() - 1
+
+    linhas = [f"montagem do cubo: {cronometrar(lambda: cubo_mensal(indice, calendario, painel.ativos)):.2f} ms "
+              f"({len(cubo.meses)} meses x {len(cubo.ativos)} ativos)",
+              f"{'':24s}{'antes (ms)':>12s}{'cubo (ms)':>12s}"]
+    for rotulo, n_meses, consulta in [("mês", 1, lambda: retorno_nos_meses(cubo, ano, mes)),
+                                      ("no ano", mes, lambda: retorno_no_ano(cubo, ano, mes)),
+                                      ("12 meses", 12, lambda: retorno_nos_meses(cubo, ano, mes, 12)),
+                                      ("60 meses", 60, lambda: retorno_nos_meses(cubo, ano, mes, 60))]:
+        linhas.append(f"{rotulo:24s}{cronometrar(lambda: por_mes(n_meses)):12.3f}{cronometrar(consulta):12.3f}")
+    imprimir("Cubo mensal da aba Retorno", linhas)
+
+# Janela da aba Retorno (posições, colunas, fatia, ordem e acumulado), pedida pelos três
+# callbacks da aba com os mesmos filtros: montada a cada pedido x memoizada por versão e filtros
+def bench_janela_retorno():
+    calendario = dados.derivado('retorno')['calendario_retorno']
+    codigo = int(calendario.meses[-1])
+    linhas = [f"{'':24s}{'montada (ms)':>14s}{'em cache (ms)':>15s}"]
+    for categoria, intervalo in [('Todos', 12), ('Todos', 36), ('Renda Fixa', 12)]:
+        filtros = (codigo // 12 + 1970, codigo % 12 + 1, categoria, intervalo)
+
+        # Sem memoização, cada callback monta a sua; com ela, o primeiro monta e os outros reaproveitam
+        def montada():
+            return [janela_retorno.__wrapped__(dados.atual(), *filtros) for _ in range(3)]
+
+        def em_cache():
+            janela_retorno.cache.clear()
+            return [janela_retorno(*filtros) for _ in range(3)]
+
+        rotulo = f"{categoria}, {intervalo} meses"
+        linhas.append(f"{rotulo:24s}{cronometrar(montada):14.3f}{cronometrar(em_cache):15.3f}")
+    imprimir("Janela da aba Retorno (3 pedidos com os mesmos filtros)", linhas)
+
+# Maiores e menores retornos do mês: melt + groupby + sort por lista x vetor do mês (memoizado)
+# com argpartition; e só a seleção dos k, em vetores sintéticos maiores
+def bench_movimentos(k=5):
+    cubo = dados.derivado('retorno')['cubo_retorno']
+    codigo = int(cubo.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+
+    def antes():
+        df = dados.aba('Retorno').melt(id_vars='Data', var_name='Ativo', value_name='Retorno')
+        df_mes = df[(df['Data'].dt.year == ano) & (df['Data'].dt.month == mes)]
+        acumulado = df_mes.groupby('Ativo')['Retorno'].agg(lambda x: (1 + x).prod() - 1)
+        return acumulado.sort_values().head(k), acumulado.sort_values(ascending=False).head(k)
+
+    def depois():
+        movimentos = movimentos_do_mes(ano, mes)
+        return menores_k(movimentos.retornos, k), maiores_k(movimentos.retornos, k)
+
+    def sem_cache():
+        movimentos_do_mes.cache.clear()
+        return depois()
+
+    linhas = [f"duas listas (melt/groupby/sort):     {cronometrar(antes):8.3f} ms",
+              f"duas listas (vetor novo/em cache):   {cronometrar(sem_cache):8.3f} / {cronometrar(depois):.3f} ms",
+              f"{'só os k de n valores':24s}{'sort (ms)':>12s}{'argpartition (ms)':>20s}"]
+    gerador = np.random.default_rng(0)
+    for n in [1_000, 100_000, 1_000_000]:
+        valores = gerador.normal(size=n)
+        linhas.append(f"{n:<24,d}{cronometrar(lambda: np.argsort(valores)[:k]):12.3f}"
+                      f"{cronometrar(lambda: menores_k(valores, k)):20.3f}")
+    imprimir("Maiores e menores retornos do mês", linhas)
+
+# Painel de descrição: retornos de 1/12/36/60 meses de um indicador por varredura do DataFrame
+# (como calcular_retorno_acumulado_por_periodo fazia a cada troca no dropdown) x consulta à tabela
+def bench_retornos_por_periodo(ativo='Ibovespa'):
+    df_ret = dados.aba('Retorno')
+    cubo = dados.derivado('retorno')['cubo_retorno']
+    tabela = dados.derivado('geral')['retornos_por_periodo']
+
+    def antes():
+        serie = df_ret[['Data', ativo]].dropna()
+        ultima_data = serie['Data'].max()
+        retornos = {}
+        for meses in HORIZONTES.values():
+            referencia = ultima_data - pd.DateOffset(months=meses)
+            no_mes = serie[(serie['Data'].dt.year == referencia.year) & (serie['Data'].dt.month == referencia.month)]
+            inicio = no_mes['Data'].max()
+            retornos[meses] = (1 + serie[(serie['Data'] > inicio) & (serie['Data'] <= ultima_data)][ativo]).prod() - 1
+        return retornos
+
+    imprimir(f"Retornos por horizonte ({ativo})", [
+        f"por chamada (varredura):       {cronometrar(antes):8.3f} ms",
+        f"tabela de todos os ativos:     {cronometrar(lambda: tabela_retornos_por_periodo(cubo)):8.3f} ms (uma vez por versão)",
+        f"consulta à tabela:             {cronometrar(lambda: retornos_do_indicador(tabela, ativo)):8.3f} ms",
+    ])
+
+# Variação em bp do mês e do ano de todos os títulos: groupby min/max + merges no formato longo
+# (como a tabela de Taxas fazia) x índice de primeira/última observação válida, numa chamada
+def bench_variacao_bp():
+    dados_taxas = dados.derivado('taxas')
+    painel, calendario = dados_taxas['painel_taxas'], dados_taxas['calendario_taxas']
+    validos = dados_taxas['validos_taxas']
+    codigo = int(calendario.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+    df_longo = para_longo(painel, 'Taxas', nome_ativo='Titulo').dropna()
+
+    def antes():
+        resultados = []
+        for inicio in [pd.Timestamp(year=ano, month=mes, day=1), pd.Timestamp(year=ano, month=1, day=1)]:
+            df = df_longo[df_longo['Data'] >= inicio]
+            datas = df.groupby('Titulo', observed=True)['Data'].agg(['min', 'max']).reset_index()
+            primeiro = datas.merge(df, left_on=['Titulo', 'min'], right_on=['Titulo', 'Data'])
+            ultimo = datas.merge(df, left_on=['Titulo', 'max'], right_on=['Titulo', 'Data'])
+            resultados.append(primeiro[['Titulo', 'Taxas']].merge(ultimo[['Titulo', 'Taxas']], on='Titulo'))
+        return resultados
+
+    posicoes = [posicoes_meses(calendario, ano, mes), posicoes_no_ano(calendario, ano, mes)]
+    imprimir(f"Variação em bp de {len(painel.ativos)} títulos (mês e ano)", [
+        f"groupby + merges:          {cronometrar(antes):8.3f} ms",
+        f"índice de válidos:         {cronometrar(lambda: variacao_nas_janelas(validos, posicoes)):8.3f} ms",
+        f"montagem do índice:        {cronometrar(lambda: indice_validos(painel)):8.3f} ms (uma vez por versão)",
+    ])
+
+# Dados do gráfico e da tabela de inflação de um ano/mês: recorte + shift + cumprod + melt + apply
+# por chamada x fatia da análise pré-calculada, com históricos mensais sintéticos cada vez maiores
+def bench_inflacao(anos=(10, 100, 1000)):
+    def antes(df_inflacao, ano, mes):
+        df = df_inflacao[(df_inflacao['Data'] >= pd.Timestamp(year=ano - 1, month=12, day=1))
+                         & (df_inflacao['Data'] <= pd.Timestamp(year=ano, month=mes, day=1) + pd.offsets.MonthEnd(0))].copy()
+        df['Mês'] = df['Data'].dt.strftime('%b - %y')
+        for indice in INDICES:
+            df[f'Retorno {indice}'] = df[indice] / df[indice].shift(1) - 1
+            df[f'Acumulado {indice}'] = ((1 + df[f'Retorno {indice}']).cumprod() - 1) * 100
+        df = df[df['Data'] >= pd.Timestamp(year=ano, month=1, day=1)]
+        df_melt = df.melt(id_vars='Mês', value_vars=[f'Acumulado {indice}' for indice in INDICES],
+                          var_name='Índice', value_name='Variação Acumulada (%)')
+        df_melt['Rótulo'] = df_melt['Variação Acumulada (%)'].round(2).astype(str) + '%'
+        df_melt['Rótulo Grafico'] = df_melt.apply(lambda linha: linha['Rótulo'] if linha['Índice'] != 'Acumulado INPC' else '', axis=1)
+        tabela = df[['Mês'] + [f'Retorno {indice}' for indice in INDICES]].set_index('Mês').T
+        return df_melt, tabela
+
+    gerador = np.random.default_rng(0)
+    linhas = [f"{'histórico':16s}{'antes (ms)':>12s}{'fatia (ms)':>12s}{'análise (ms, uma vez)':>24s}"]
+    for n_anos in anos:
+        datas = pd.date_range(end='2025-12-31', periods=12 * n_anos, freq='ME')
+        df_inflacao = pd.DataFrame({'Data': datas, **{indice: 100 * np.cumprod(1 + gerador.normal(0.004, 0.003, len(datas)))
+                                                      for indice in INDICES}})
+        analise, calendario = analisar_inflacao(df_inflacao), montar_calendario(df_inflacao['Data'])
+        linhas.append(f"{f'{n_anos} anos':16s}{cronometrar(lambda: antes(df_inflacao, 2025, 9)):12.3f}"
+                      f"{cronometrar(lambda: dados_do_ano(analise, calendario, 2025, 9)):12.3f}"
+                      f"{cronometrar(lambda: analisar_inflacao(df_inflacao), 3):24.1f}")
+    imprimir("Inflação: dados de um ano/mês", linhas)
+
+# Último valor válido de cada título até uma data (duration do período, fechamento do mês):
+# filtro + sort + groupby().last() no formato longo x junção as-of pelo índice de válidos
+def bench_valores_ate():
+    dados_taxas = dados.derivado('taxas')
+    linhas = []
+    for nome, painel, validos in [('Taxas', dados_taxas['painel_taxas'], dados_taxas['validos_taxas']),
+                                  ('Duration', dados_taxas['painel_duration'], dados_taxas['validos_duration'])]:
+        df_longo = para_longo(painel, 'Valor', nome_ativo='Titulo')
+        data = pd.Timestamp(painel.datas[-1]).replace(day=1) - pd.Timedelta(days=1)
+        inicio = (data - pd.DateOffset(months=11)).replace(day=1)
+
+        def antes():
+            df = df_longo[(df_longo['Data'] >= inicio) & (df_longo['Data'] <= data)].dropna()
+            return df.sort_values('Data').groupby('Titulo', observed=True)['Valor'].last()
+
+        linhas.append(f"{nome:10s} groupby().last(): {cronometrar(antes):8.3f} ms   "
+                      f"as-of: {cronometrar(lambda: valores_ate(validos, data, desde=inicio)):.3f} ms")
+    imprimir("Último valor válido até a data (todos os títulos)", linhas)
+
+# Callbacks de gráficos com os mesmos filtros: figura montada pelo Plotly (cache vazio) x JSON do cache
+def bench_cache_figuras():
+    import app
+    calendario = dados.derivado('retorno')['calendario_retorno']
+    codigo = int(calendario.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+    casos = [(app.atualizar_grafico_precos, (ano, mes, 'Todos', 12, None)),
+             (app.atualizar_grafico, (ano, mes, 'Todos', 12)),
+             (app.atualizar_grafico_risco, (ano, mes, 'Todos')),
+             (app.atualizar_grafico_tabela_inflacao, (ano, mes)),
+             (app.atualizar_grafico_taxas, (ano, mes, None, None, 12, None)),
+             (app.atualizar_grafico_duration, (ano, mes, None))]
+
+    def sem_cache(callback, args):
+        limpar_cache_figuras()
+        return callback(*args)
+
+    linhas = [f"{'':36s}{'montada (ms)':>14s}{'cache (ms)':>12s}"]
+    for callback, args in casos:
+        linhas.append(f"{callback.__name__:36s}{cronometrar(lambda: sem_cache(callback, args), 5):14.1f}"
+                      f"{cronometrar(lambda: callback(*args), 5):12.2f}")
+    estatisticas = estatisticas_figuras()
+    linhas.append(f"cache: {estatisticas['itens']} figuras, {estatisticas['bytes'] / 2 ** 20:.2f} MB "
+                  f"(limite {estatisticas['limite'] / 2 ** 20:.0f} MB), {estatisticas['acertos']} acertos, "
+                  f"{estatisticas['faltas']} faltas")
+    imprimir("Cache de figuras", linhas)
+
+# Gráficos de linhas das abas: formato longo + px.line x traces direto das colunas do painel
+# (figura_linhas), contando a serialização para JSON que o Dash faz na resposta
+def bench_figuras():
+    retorno, taxas = dados.derivado('retorno'), dados.derivado('taxas')
+    calendario = retorno['calendario_retorno']
+    codigo = int(calendario.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+    casos = [("Retorno 12 meses", janela_retorno(ano, mes, 'Todos', 12).acumulado),
+             ("Retorno 36 meses", janela_retorno(ano, mes, 'Todos', 36).acumulado),
+             ("Duration no ano", janela(taxas['painel_duration'],
+                                        posicoes=posicoes_no_ano(taxas['calendario_duration'], ano, mes)))]
+
+    def com_px(painel):
+        df = para_longo(painel, 'Valor', ordenar=True)
+        return px.line(df, x='Data', y='Valor', color='Ativo', markers=True, template='plotly_dark').to_json()
+
+    def direto(painel):
+        return figura_linhas(painel, ordem=np.argsort(painel.ativos, kind='stable')).to_json()
+
+    linhas = [f"{'':20s}{'pontos':>8s}{'px (ms)':>10s}{'direto (ms)':>13s}"]
+    for rotulo, painel in casos:
+        linhas.append(f"{rotulo:20s}{painel.valores.size:8d}{cronometrar(lambda: com_px(painel), 5):10.1f}"
+                      f"{cronometrar(lambda: direto(painel), 5):13.1f}")
+    imprimir("Gráficos de linhas (figura + JSON)", linhas)
+
+# Redução LTTB das séries longas: pontos, tamanho do JSON e tempo da figura com todos os pontos x
+# reduzida a PONTOS_POR_TRACE por trace, e reduzida com o detalhe de um zoom de um mês
+def bench_reducao():
+    calendario = dados.derivado('retorno')['calendario_retorno']
+    codigo = int(calendario.meses[-1])
+    ano, mes = codigo // 12 + 1970, codigo % 12 + 1
+    painel = janela_retorno(ano, mes, 'Todos', 36).acumulado
+    meio = painel.datas[len(painel.datas) // 2]
+    zoom = (str(meio), str(meio + np.timedelta64(31, 'D')))
+
+    linhas = [f"{'':28s}{'pontos':>8s}{'JSON (KB)':>11s}{'ms':>8s}"]
+    for rotulo, argumentos in [("todos os pontos", {}),
+                               (f"reduzida ({PONTOS_POR_TRACE}/trace)", dict(alvo=PONTOS_POR_TRACE)),
+                               ("reduzida + zoom de 1 mês", dict(alvo=PONTOS_POR_TRACE, detalhe=zoom))]:
+        fig = figura_linhas(painel, **argumentos)
+        pontos = sum(len(trace.y) for trace in fig.data)
+        tempo = cronometrar(lambda: figura_linhas(painel, **argumentos).to_json(), 5)
+        linhas.append(f"{rotulo:28s}{pontos:8d}{len(fig.to_json()) / 1024:11.0f}{tempo:8.1f}")
+    imprimir("Redução LTTB do retorno acumulado (36 meses, todos os ativos)", linhas)
+
+BENCHMARKS = {
+    'identificadores': bench_identificadores,
+    'retornos': bench_retornos,
+    'volatilidade': bench_volatilidade,
+    'tabela_risco': bench_tabela_risco,
+    'calendario': bench_calendario,
+    'cubo_mensal': bench_cubo_mensal,
+    'janela_retorno': bench_janela_retorno,
+    'movimentos': bench_movimentos,
+    'retornos_por_periodo': bench_retornos_por_periodo,
+    'variacao_bp': bench_variacao_bp,
+    'inflacao': bench_inflacao,
+    'valores_ate': bench_valores_ate,
+    'cache_figuras': bench_cache_figuras,
+    'figuras': bench_figuras,
+    'reducao': bench_reducao,
+}
+
+if __name__ == '__main__':
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        BENCHMARKS[nome]()
@@ -0,0 +1,42 @@
+import numpy as np
+from collections import namedtuple
+
+# Calendário de pregões de uma aba, montado uma vez por versão da planilha: as datas em ordem
+# crescente, os meses com dados (código = meses desde jan/1970, como em datetime64[M]) com a posição
+# da primeira data de cada um e o mapa ano -> meses. Os limites das janelas "N meses até ano/mês"
+# viram buscas binárias nesses arrays, sem máscara nas datas nem aritmética de datas a cada callback
+Calendario = namedtuple('Calendario', ['datas', 'meses', 'inicios', 'meses_por_ano'])
+
+def codigo_mes(ano, mes):
+    return (int(ano) - 1970) * 12 + int(mes) - 1
+
+def montar_calendario(datas):
+    datas = np.sort(np.asarray(datas, dtype='datetime64[ns]'))
+    datas = datas[~np.isnat(datas)]
+    meses, inicios = np.unique(datas.astype('datetime64[M]').astype(np.int64), return_index=True)
+    meses_por_ano = {}
+    for codigo in meses.tolist():
+        meses_por_ano.setdefault(codigo // 12 + 1970, []).append(codigo % 12 + 1)
+    # inicios[k] = posição da primeira data do k-ésimo mês; o último é o fim das datas
+    return Calendario(datas, meses, np.append(inicios, len(datas)), meses_por_ano)
+
+# Meses (1-12) com dados no ano, em ordem
+def meses_do_ano(calendario, ano):
+    return calendario.meses_por_ano.get(ano, [])
+
+# Posição da primeira data a partir do mês `codigo` (len(datas) se não houver)
+def posicao_do_mes(calendario, codigo):
+    return int(calendario.inicios[np.searchsorted(calendario.meses, codigo)])
+
+# Posições [i0, i1) das datas dos `n_meses` meses que terminam em ano/mês (inclusive)
+def posicoes_meses(calendario, ano, mes, n_meses=1):
+    fim = codigo_mes(ano, mes)
+    return posicao_do_mes(calendario, fim - n_meses + 1), posicao_do_mes(calendario, fim + 1)
+
+# Posições [i0, i1) de janeiro até ano/mês
+def posicoes_no_ano(calendario, ano, mes):
+    return posicoes_meses(calendario, ano, mes, mes)
+
+# Ano da data na posição `i`
+def ano_da_posicao(calendario, i):
+    return int(calendario.datas[i].astype('datetime64[Y]').astype(np.int64)) + 1970
@@ -0,0 +1,601 @@
+import pandas as pd
+import numpy as np
+import openpyxl
+from types import MappingProxyType
+from collections import namedtuple, OrderedDict
+from functools import wraps
+import threading
+import time
+import hashlib
+import io
+import json
+import os
+import pickle
+import warnings
+import zipfile
+from xml.etree import ElementTree
+from importlib import metadata
+
+try:
+    import pyarrow  # necessário para o cache em Feather
+except ImportError:
+    pyarrow = None
+
+# Caminho base para os dados
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+caminho_base = os.path.join(BASE_DIR, "Data", "Base - Indicadores.xlsx")
+
+# Cache colunar (Feather, ou .npy para ABAS_MATRIZ) das abas já tratadas, ao lado da planilha
+pasta_cache = os.path.join(BASE_DIR, "Data", "cache")
+ARQUIVO_MANIFESTO = "manifesto.json"
+# Aumentar sempre que a limpeza das abas mudar, para invalidar caches antigos
+VERSAO_CACHE = 5
+
+# Artefato de inicialização: snapshot completo (abas, matrizes e todos os derivados) gerado
+# offline por gerar_snapshot.py e lido de uma vez no boot, sem passar pelo Excel
+arquivo_artefato = os.environ.get("ARQUIVO_SNAPSHOT", os.path.join(BASE_DIR, "Data", "snapshot.pkl"))
+# Aumentar sempre que o formato do artefato mudar
+VERSAO_ARTEFATO = 2
+# Arrays numéricos do artefato a partir deste tamanho (matrizes Retorno/Risco, índices de
+# crescimento e de momentos...) ficam fora do pickle, em .npy ao lado dele, e são abertos com
+# memmap no boot: os workers compartilham as páginas em vez de ter cada um a sua cópia
+LIMITE_ARRAY_ARTEFATO = 64 * 2 ** 10
+
+# Abas da planilha usadas pelo dashboard
+ABAS = ("Retorno", "Risco", "Inflacao", "Taxas", "Duration")
+
+# Abas guardadas no cache como matriz densa float64 (datas x ativos) em .npy,
+# abertas com memmap para que todos os workers compartilhem as mesmas páginas
+ABAS_MATRIZ = ("Retorno", "Risco")
+
+# Matriz densa de uma aba: datas (datetime64), nomes dos ativos e valores (datas x ativos)
+MatrizDensa = namedtuple('MatrizDensa', ['datas', 'ativos', 'valores'])
+
+# Versão imutável dos dados: abas tratadas, matrizes densas, relatório de falhas de conversão
+# e os dados derivados de cada aba do dashboard (ver registrar_derivacao), que são calculados
+# sob demanda e guardados em 'derivados' na primeira vez que são pedidos.
+# 'versao' é o início do hash da planilha e muda a cada novo conteúdo
+Snapshot = namedtuple('Snapshot', ['versao', 'abas', 'matrizes', 'falhas', 'derivados'])
+
+# Intervalo (segundos) entre verificações da planilha para recarga automática; 0 desliga
+INTERVALO_RECARGA = int(os.environ.get("INTERVALO_RECARGA", 60))
+
+# Colunas do relatório de células que não puderam ser convertidas para número
+COLUNAS_FALHAS = ['Aba', 'Coluna', 'Data', 'Valor']
+
+# Converte uma coluna da planilha para float64 de forma vetorizada:
+# números passam direto, '-' e vazio viram NaN, "0,07%" vira 0.0007 e "7,5" vira 7.5.
+# Retorna a coluna convertida e a máscara das células que não puderam ser lidas (ficam NaN)
+def normalizar_coluna(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64'), pd.Series(False, index=serie.index)
+
+    valores = pd.to_numeric(serie, errors='coerce').astype('float64')
+    pendentes = valores.isna() & serie.notna()
+    falhas = pd.Series(False, index=serie.index)
+    if pendentes.any():
+        texto = serie[pendentes].astype(str).str.strip()
+        vazio = texto.isin(['-', ''])
+        percentual = texto.str.endswith('%')
+        numero = texto.str.rstrip('%').str.strip().str.replace(',', '.', regex=False)
+        convertido = pd.to_numeric(numero, errors='coerce')
+        convertido = convertido.where(~percentual, convertido / 100)
+        valores[pendentes] = convertido
+        falhas[pendentes] = convertido.isna() & ~vazio
+    return valores, falhas
+
+# Limpeza comum a todas as abas: nomes de colunas sem espaços, 'Data' como datetime
+# e todas as colunas de valores em float64. Retorna a aba e o relatório de falhas
+def preparar_aba(df, nome=''):
+    df.columns = df.columns.str.strip()
+    df['Data'] = pd.to_datetime(df['Data'])
+    falhas = []
+    for col in df.columns:
+        if col == 'Data':
+            continue
+        originais = df[col]
+        df[col], mascara = normalizar_coluna(originais)
+        if mascara.any():
+            falhas.append(pd.DataFrame({
+                'Aba': nome,
+                'Coluna': col,
+                'Data': df.loc[mascara, 'Data'].dt.strftime('%Y-%m-%d'),
+                'Valor': originais[mascara].astype(str),
+            }))
+    relatorio = pd.concat(falhas, ignore_index=True) if falhas else pd.DataFrame(columns=COLUNAS_FALHAS)
+    return df, relatorio
+
+# Remove as células vazias do fim da linha (o openpyxl completa as linhas até a última coluna da aba)
+def aparar(linha):
+    fim = len(linha)
+    while fim and linha[fim - 1] is None:
+        fim -= 1
+    return linha[:fim]
+
+# Percorre uma aba em streaming (openpyxl read_only). Retorna o cabeçalho e as linhas com algum valor
+def varrer_aba(planilha, nome):
+    linhas = planilha[nome].iter_rows(values_only=True)
+    cabecalho = aparar(next(linhas, ()))
+    # Linhas vazias são descartadas, como no pd.read_excel
+    return cabecalho, [linha for linha in map(aparar, linhas) if linha]
+
+# Monta a aba tratada a partir das linhas lidas; colunas sem nome viram 'Unnamed: i', como no pandas
+def montar_aba(cabecalho, linhas, nome):
+    largura = max([len(cabecalho)] + [len(linha) for linha in linhas])
+    colunas = [c if c is not None else f"Unnamed: {i}"
+               for i, c in enumerate(cabecalho + (None,) * (largura - len(cabecalho)))]
+    df = pd.DataFrame([linha + (None,) * (largura - len(linha)) for linha in linhas], columns=colunas)
+    return preparar_aba(df, nome)
+
+def abrir_planilha(caminho):
+    return openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+
+# Lê as abas `abas` da planilha Excel: abre o arquivo uma única vez e lê cada aba uma única vez.
+# Retorna as abas tratadas e o relatório de falhas
+def ler_planilha(caminho, abas=ABAS):
+    dados, falhas = {}, []
+    planilha = abrir_planilha(caminho)
+    try:
+        for nome in abas:
+            dados[nome], relatorio = montar_aba(*varrer_aba(planilha, nome), nome)
+            falhas.append(relatorio)
+    finally:
+        planilha.close()
+    return dados, pd.concat(falhas, ignore_index=True)
+
+# O .xlsx é um zip com um XML por aba. CRC32 e tamanho de cada membro estão no diretório central
+# do zip, lido sem descompactar nada: identificam o conteúdo de cada aba e dos membros que mudam
+# o significado de todas (textos compartilhados, estilos que marcam as datas, workbook.xml)
+MEMBROS_COMUNS = ("xl/workbook.xml", "xl/sharedStrings.xml", "xl/styles.xml")
+NS_PLANILHA = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_RELACOES = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+def membros_da_planilha(caminho):
+    with zipfile.ZipFile(caminho) as arquivo:
+        membros = {info.filename: [info.CRC, info.file_size] for info in arquivo.infolist()}
+        livro = ElementTree.fromstring(arquivo.read("xl/workbook.xml"))
+        relacoes = ElementTree.fromstring(arquivo.read("xl/_rels/workbook.xml.rels"))
+    # Aba -> XML dela, pelo id da relação (alvo relativo a xl/ ou absoluto no zip)
+    alvos = {rel.get('Id'): rel.get('Target') for rel in relacoes}
+    abas = {}
+    for aba in livro.iter(f"{NS_PLANILHA}sheet"):
+        alvo = alvos.get(aba.get(f"{NS_RELACOES}id"), '')
+        alvo = alvo[1:] if alvo.startswith('/') else f"xl/{alvo}"
+        abas[aba.get('name')] = membros.get(alvo)
+    return {'comum': [membros.get(nome) for nome in MEMBROS_COMUNS],
+            'abas': {nome: abas.get(nome) for nome in ABAS}}
+
+# Ingestão incremental: parte do cache da versão anterior da planilha e relê do Excel só as abas
+# cujo XML mudou (CRC32/tamanho diferentes no manifesto); as demais vêm do cache como estão.
+# Retorna None (planilha relida por inteiro) se mudou algum membro comum a todas as abas
+def ler_incremental(caminho, pasta, anterior, membros):
+    antigos = anterior.get('membros')
+    if not antigos or antigos['comum'] != membros['comum'] or None in membros['abas'].values():
+        return None
+    alteradas = [nome for nome in ABAS if antigos['abas'].get(nome) != membros['abas'][nome]]
+
+    dados, _, falhas = ler_cache(pasta, anterior)
+    falhas = [falhas[~falhas['Aba'].isin(alteradas)]]
+    if alteradas:
+        novos, relatorio = ler_planilha(caminho, alteradas)
+        dados.update(novos)
+        falhas.append(relatorio)
+    # Relatório na ordem das abas, como na leitura completa
+    falhas = pd.concat(falhas, ignore_index=True)
+    falhas = falhas.iloc[np.argsort(falhas['Aba'].map(ABAS.index).to_numpy(), kind='stable')]
+    return dados, falhas.reset_index(drop=True), alteradas
+
+# Hash do conteúdo da planilha (usado quando tamanho/mtime não batem com o cache)
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Grava arquivo de forma atômica (vários workers podem gerar o cache ao mesmo tempo)
+def gravar_atomico(caminho, escrever):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+def gravar_manifesto(pasta, manifesto):
+    def escrever(destino):
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    gravar_atomico(os.path.join(pasta, ARQUIVO_MANIFESTO), escrever)
+
+def gravar_npy(caminho, array):
+    def escrever(destino):
+        with open(destino, 'wb') as f:
+            np.save(f, array)
+    gravar_atomico(caminho, escrever)
+
+# Só vira matriz densa a aba cujas colunas de valores são todas float64
+def aba_e_densa(df):
+    return all(df[col].dtype == 'float64' for col in df.columns if col != 'Data')
+
+def matriz_da_aba(df):
+    ativos = [col for col in df.columns if col != 'Data']
+    # Ordem de coluna (Fortran): cada ativo fica contíguo em memória
+    valores = np.asfortranarray(df[ativos].to_numpy(dtype='float64'))
+    return MatrizDensa(df['Data'].to_numpy(dtype='datetime64[ns]'), ativos, valores)
+
+# DataFrame largo que usa os valores da matriz sem copiá-los (memmap somente leitura)
+def aba_da_matriz(matriz):
+    df = pd.DataFrame(matriz.valores, columns=matriz.ativos, copy=False)
+    df.insert(0, 'Data', pd.DatetimeIndex(matriz.datas))
+    return df
+
+def abrir_matriz(pasta, nome, ativos):
+    datas = np.load(os.path.join(pasta, f"{nome}_datas.npy"))
+    valores = np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode='r')
+    if valores.shape != (len(datas), len(ativos)):
+        raise ValueError(f"matriz {nome} com formato inesperado {valores.shape}")
+    return MatrizDensa(datas, list(ativos), valores)
+
+def ler_cache(pasta, manifesto):
+    dados, matrizes = {}, {}
+    falhas = pd.DataFrame(manifesto.get('falhas', []), columns=COLUNAS_FALHAS)
+    for nome in ABAS:
+        if nome in manifesto.get('matrizes', {}):
+            matrizes[nome] = abrir_matriz(pasta, nome, manifesto['matrizes'][nome])
+            dados[nome] = aba_da_matriz(matrizes[nome])
+        else:
+            dados[nome] = pd.read_feather(os.path.join(pasta, f"{nome}.feather"))
+    return dados, matrizes, falhas
+
+# Grava no cache as abas em `abas` (as demais já estão no disco) e o manifesto
+def gravar_cache(pasta, dados, falhas, manifesto, abas=ABAS):
+    os.makedirs(pasta, exist_ok=True)
+    manifesto['falhas'] = falhas.to_dict('records')
+    manifesto['matrizes'] = {}
+    for nome, df in dados.items():
+        densa = nome in ABAS_MATRIZ and aba_e_densa(df)
+        if densa:
+            manifesto['matrizes'][nome] = [col for col in df.columns if col != 'Data']
+        if nome not in abas:
+            continue
+        if densa:
+            matriz = matriz_da_aba(df)
+            gravar_npy(os.path.join(pasta, f"{nome}_datas.npy"), matriz.datas)
+            gravar_npy(os.path.join(pasta, f"{nome}.npy"), matriz.valores)
+        else:
+            gravar_atomico(os.path.join(pasta, f"{nome}.feather"), df.to_feather)
+    # O manifesto é gravado por último: só vale quando todas as abas já foram escritas
+    gravar_manifesto(pasta, manifesto)
+
+# Carrega as abas usando o cache colunar quando a planilha não mudou
+# (mesmo tamanho e mtime, ou mesmo hash de conteúdo). Se ela mudou, tenta a ingestão incremental
+# (só as abas alteradas são relidas e regravadas no cache); senão lê o Excel e refaz o cache.
+# Retorna um Snapshot (ainda sem derivados) com as abas, as matrizes densas de ABAS_MATRIZ
+# (em memmap quando vêm do cache) e o relatório das células que não puderam ser convertidas
+def carregar_snapshot(caminho=caminho_base, pasta=pasta_cache):
+    if pyarrow is None:
+        dados, falhas = ler_planilha(caminho)
+        return montar_snapshot(dados, matrizes_em_memoria(dados), falhas, hash_arquivo(caminho))
+
+    info = os.stat(caminho)
+    manifesto = {
+        'versao': VERSAO_CACHE,
+        'arquivo': os.path.abspath(caminho),
+        'tamanho': info.st_size,
+        'mtime': info.st_mtime_ns,
+    }
+    anterior = ler_manifesto(pasta) or {}
+    mesma_origem = all(anterior.get(k) == manifesto[k] for k in ('versao', 'arquivo', 'tamanho'))
+
+    if mesma_origem and anterior.get('mtime') == manifesto['mtime']:
+        manifesto['hash'] = anterior.get('hash')
+    else:
+        manifesto['hash'] = hash_arquivo(caminho)
+
+    if mesma_origem and anterior.get('hash') == manifesto['hash']:
+        try:
+            resultado = ler_cache(pasta, anterior)
+            if anterior.get('mtime') != manifesto['mtime']:
+                for chave in ('falhas', 'matrizes', 'membros'):
+                    manifesto[chave] = anterior.get(chave)
+                gravar_manifesto(pasta, manifesto)
+            return montar_snapshot(*resultado, manifesto['hash'])
+        except Exception as e:
+            warnings.warn(f"Cache da planilha inválido, relendo o Excel: {e}")
+
+    manifesto['membros'] = membros_da_planilha(caminho)
+    incremental = None
+    if all(anterior.get(k) == manifesto[k] for k in ('versao', 'arquivo')):
+        try:
+            incremental = ler_incremental(caminho, pasta, anterior, manifesto['membros'])
+        except Exception as e:
+            warnings.warn(f"Ingestão incremental falhou, relendo o Excel: {e}")
+    if incremental:
+        dados, falhas, alteradas = incremental
+    else:
+        (dados, falhas), alteradas = ler_planilha(caminho), ABAS
+
+    try:
+        gravar_cache(pasta, dados, falhas, manifesto, alteradas)
+        # Relê do cache para que Retorno/Risco passem a usar as matrizes em memmap
+        return montar_snapshot(*ler_cache(pasta, manifesto), manifesto['hash'])
+    except Exception as e:
+        warnings.warn(f"Não foi possível gravar o cache da planilha: {e}")
+    return montar_snapshot(dados, matrizes_em_memoria(dados), falhas, manifesto['hash'])
+
+# Sem cache em disco: matrizes densas montadas em memória a partir das abas
+def matrizes_em_memoria(dados):
+    return {nome: matriz_da_aba(dados[nome]) for nome in ABAS_MATRIZ if aba_e_densa(dados[nome])}
+
+def montar_snapshot(dados, matrizes, falhas, hash_planilha):
+    if not falhas.empty:
+        warnings.warn(f"{len(falhas)} células da planilha não puderam ser convertidas para número "
+                      f"(ver dados.atual().falhas)")
+    return Snapshot(hash_planilha[:12], MappingProxyType(dados), MappingProxyType(matrizes),
+                    falhas, {})
+
+# Funções que montam os dados derivados de cada aba do dashboard (melts, tabelas, layouts).
+# Rodam uma vez por versão da planilha, na primeira vez que a aba é pedida (ver derivado)
+_derivacoes = {}
+# Uma trava por derivação: só uma thread a calcula, as demais esperam o resultado
+_travas_derivacao = {}
+
+# Registra (ou substitui) uma derivação; ela só é calculada quando for pedida.
+# Derivados já presentes no snapshot (vindos do artefato) só são descartados ao substituir
+def registrar_derivacao(nome, funcao):
+    trava = _travas_derivacao.setdefault(nome, threading.Lock())
+    with trava:
+        if nome in _derivacoes and _snapshot is not None:
+            _snapshot.derivados.pop(nome, None)
+        _derivacoes[nome] = funcao
+
+# Identifica o que o artefato depende: formato, limpeza das abas, código do dashboard e bibliotecas
+def identificacao_artefato():
+    codigo = hashlib.sha256()
+    for nome in sorted(os.listdir(BASE_DIR)):
+        if nome.endswith('.py'):
+            with open(os.path.join(BASE_DIR, nome), 'rb') as f:
+                codigo.update(f.read())
+    return {
+        'formato': VERSAO_ARTEFATO,
+        'cache': VERSAO_CACHE,
+        'codigo': codigo.hexdigest(),
+        'bibliotecas': {pacote: metadata.version(pacote) for pacote in ('pandas', 'numpy', 'plotly', 'dash')},
+    }
+
+# Pasta dos arrays grandes do artefato (ver LIMITE_ARRAY_ARTEFATO)
+def pasta_do_artefato(caminho):
+    return os.path.splitext(caminho)[0] + "_arrays"
+
+# Pickler do artefato: cada array grande vai para <hash do conteúdo>.npy na pasta do artefato e
+# no pickle fica só o nome do arquivo. Arquivos já gravados (mesmo conteúdo) não são reescritos
+class PicklerArtefato(pickle.Pickler):
+    def __init__(self, arquivo, pasta):
+        super().__init__(arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        self.pasta = pasta
+        self.arquivos = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject or obj.nbytes < LIMITE_ARRAY_ARTEFATO:
+            return None
+        if id(obj) not in self.arquivos:
+            array = np.asarray(obj)
+            conteudo = hashlib.sha256(f"{array.dtype.str}{array.shape}".encode())
+            conteudo.update(np.ascontiguousarray(array).data)
+            nome = f"{conteudo.hexdigest()[:32]}.npy"
+            if not os.path.exists(os.path.join(self.pasta, nome)):
+                gravar_npy(os.path.join(self.pasta, nome), array)
+            self.arquivos[id(obj)] = nome
+        return self.arquivos[id(obj)]
+
+class UnpicklerArtefato(pickle.Unpickler):
+    def __init__(self, arquivo, pasta):
+        super().__init__(arquivo)
+        self.pasta = pasta
+
+    def persistent_load(self, nome):
+        return np.load(os.path.join(self.pasta, nome), mmap_mode='r')
+
+# Grava o snapshot com todas as derivações já calculadas: os metadados e objetos pequenos num
+# único pickle e os arrays grandes em .npy (ver PicklerArtefato). Retorno/Risco vão só como matriz
+# densa: a aba é remontada sobre ela ao carregar. O pickle é gravado por último; os .npy que ele
+# não usa mais são apagados (workers que já os abriram continuam com as páginas mapeadas)
+def gravar_artefato(snapshot, caminho=arquivo_artefato):
+    aquecer(snapshot)
+    conteudo = {
+        'identificacao': identificacao_artefato(),
+        'versao': snapshot.versao,
+        'abas': {nome: df for nome, df in snapshot.abas.items() if nome not in snapshot.matrizes},
+        'matrizes': dict(snapshot.matrizes),
+        'falhas': snapshot.falhas,
+        'derivados': dict(snapshot.derivados),
+    }
+    pasta = pasta_do_artefato(caminho)
+    os.makedirs(pasta, exist_ok=True)
+    buffer = io.BytesIO()
+    pickler = PicklerArtefato(buffer, pasta)
+    pickler.dump(conteudo)
+
+    def escrever(destino):
+        with open(destino, 'wb') as f:
+            f.write(buffer.getbuffer())
+    gravar_atomico(caminho, escrever)
+
+    usados = set(pickler.arquivos.values())
+    for nome in os.listdir(pasta):
+        if nome.endswith('.npy') and nome not in usados:
+            os.remove(os.path.join(pasta, nome))
+
+# Lê o artefato numa única leitura sequencial. Retorna None se ele não existir ou não servir
+# (gerado com outro código/bibliotecas, ou para outra versão da planilha)
+def carregar_artefato(caminho=arquivo_artefato, planilha=caminho_base):
+    try:
+        with open(caminho, 'rb') as f:
+            bruto = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        conteudo = UnpicklerArtefato(io.BytesIO(bruto), pasta_do_artefato(caminho)).load()
+    except Exception as e:
+        warnings.warn(f"Artefato {caminho} ilegível, ignorado: {e}")
+        return None
+
+    if not isinstance(conteudo, dict) or conteudo.get('identificacao') != identificacao_artefato():
+        warnings.warn(f"Artefato {caminho} gerado com outro código ou bibliotecas, ignorado")
+        return None
+    if os.path.exists(planilha) and hash_arquivo(planilha)[:12] != conteudo['versao']:
+        warnings.warn(f"Artefato {caminho} é de outra versão da planilha, ignorado")
+        return None
+
+    abas = dict(conteudo['abas'])
+    for nome, matriz in conteudo['matrizes'].items():
+        abas[nome] = aba_da_matriz(matriz)
+    print(f"[Dados] Snapshot carregado de {caminho} - versão {conteudo['versao']}")
+    return Snapshot(conteudo['versao'], MappingProxyType(abas), MappingProxyType(conteudo['matrizes']),
+                    conteudo['falhas'], dict(conteudo['derivados']))
+
+# Snapshot publicado: trocado de uma vez (atribuição atômica), nunca alterado no lugar.
+# Só é carregado em inicializar (ou no primeiro atual()), nunca ao importar o módulo
+_trava_recarga = threading.Lock()
+_snapshot = None
+
+# Carrega o snapshot do boot, uma vez: do artefato quando ele existe e está válido, senão da
+# planilha (ou do cache). Ler o artefato importa os módulos das classes guardadas nele
+# (analitico, layouts das abas), que importam nomes daqui
+def inicializar():
+    global _snapshot
+    with _trava_recarga:
+        if _snapshot is None:
+            _snapshot = carregar_artefato() or carregar_snapshot()
+    return _snapshot
+
+def atual():
+    return _snapshot if _snapshot is not None else inicializar()
+
+# Dados derivados de uma aba, calculados na primeira chamada para o snapshot.
+# Chamadas simultâneas esperam o cálculo em andamento em vez de repeti-lo
+def derivado(nome, snapshot=None):
+    snapshot = snapshot or atual()
+    derivados = snapshot.derivados
+    if nome not in derivados:
+        with _travas_derivacao[nome]:
+            if nome not in derivados:
+                derivados[nome] = _derivacoes[nome](snapshot)
+    return derivados[nome]
+
+# Memoiza funcao(snapshot, *args) pela chave (versão dos dados, *args), guardando só as `limite`
+# chaves usadas mais recentemente (LRU). Uma nova versão da planilha muda a chave, então nada precisa
+# ser invalidado. O cálculo roda fora da trava: chamadas simultâneas com a mesma chave esperam o
+# evento do cálculo em andamento em vez de repeti-lo, e chaves diferentes calculam em paralelo
+def memoizar_por_versao(limite=32):
+    def decorador(funcao):
+        cache = OrderedDict()
+        em_andamento = {}
+        trava = threading.Lock()
+
+        @wraps(funcao)
+        def memoizada(*args, snapshot=None):
+            snapshot = snapshot or atual()
+            chave = (snapshot.versao, *args)
+            while True:
+                with trava:
+                    if chave in cache:
+                        cache.move_to_end(chave)
+                        return cache[chave]
+                    evento = em_andamento.get(chave)
+                    if evento is None:
+                        evento = em_andamento[chave] = threading.Event()
+                        break
+                # Outra thread está calculando: espera e confere de novo (se ela falhou, calcula aqui)
+                evento.wait()
+
+            try:
+                valor = funcao(snapshot, *args)
+                with trava:
+                    cache[chave] = valor
+                    while len(cache) > limite:
+                        cache.popitem(last=False)
+            finally:
+                with trava:
+                    del em_andamento[chave]
+                evento.set()
+            return valor
+
+        memoizada.cache = cache
+        return memoizada
+    return decorador
+
+# Calcula as derivações do snapshot na ordem dada (as não listadas vão no fim)
+def aquecer(snapshot, nomes=()):
+    ordem = [nome for nome in nomes if nome in _derivacoes]
+    ordem += [nome for nome in _derivacoes if nome not in ordem]
+    for nome in ordem:
+        derivado(nome, snapshot)
+    return snapshot
+
+# Aquece o snapshot atual numa thread, para que o servidor já atenda as primeiras requisições:
+# uma aba pedida antes de ficar pronta espera (ou faz) só o seu próprio cálculo
+def aquecer_em_segundo_plano(nomes=()):
+    snapshot = atual()
+
+    def executar():
+        try:
+            aquecer(snapshot, nomes)
+        except Exception as e:
+            print(f"[Erro aquecer dados]: {e}")
+
+    aquecedor = threading.Thread(target=executar, name='aquecer-dados', daemon=True)
+    aquecedor.start()
+    return aquecedor
+
+# Retorna uma cópia rasa da aba: os valores não são duplicados (no caso de Retorno/Risco
+# continuam no memmap compartilhado) e alterações na cópia não afetam o snapshot
+def aba(nome, snapshot=None):
+    return (snapshot or atual()).abas[nome].copy(deep=False)
+
+# Lê a planilha de novo, recalcula todas as derivações e só então publica o novo snapshot.
+# As requisições em andamento continuam usando o snapshot anterior até terminarem
+def recarregar(caminho=caminho_base):
+    global _snapshot
+    with _trava_recarga:
+        novo = carregar_snapshot(caminho)
+        if _snapshot is None or novo.versao != _snapshot.versao:
+            _snapshot = aquecer(novo)
+            print(f"[Dados] Planilha recarregada - versão {novo.versao}")
+    return _snapshot
+
+def assinatura(caminho):
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+# Verifica periodicamente a planilha e recarrega em segundo plano quando ela muda.
+# Só recarrega quando tamanho/mtime ficam estáveis entre duas verificações (planilha já salva)
+def monitorar_planilha(caminho=caminho_base, intervalo=INTERVALO_RECARGA):
+    if intervalo <= 0:
+        return None
+
+    def verificar():
+        vista = assinatura(caminho)
+        carregada = vista
+        while True:
+            time.sleep(intervalo)
+            agora = assinatura(caminho)
+            if agora is not None and agora == vista and agora != carregada:
+                try:
+                    recarregar(caminho)
+                    carregada = agora
+                except Exception as e:
+                    print(f"[Erro recarregar planilha]: {e}")
+            vista = agora
+
+    monitor = threading.Thread(target=verificar, name='monitor-planilha', daemon=True)
+    monitor.start()
+    return monitor
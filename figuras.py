@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash import no_update
+from plotly.utils import PlotlyJSONEncoder
+
+import dados
+from analitico import pontos_lttb
+
+# Cache das saídas dos callbacks de gráficos: o JSON da saída (figuras serializadas) por
+# (callback, entradas, versão dos dados), limitado pelo total de bytes com descarte LRU.
+# Uma nova versão da planilha muda a chave; as entradas antigas saem pelo LRU
+LIMITE_CACHE_FIGURAS = int(os.environ.get("LIMITE_CACHE_FIGURAS_MB", 64)) * 2 ** 20
+
+_figuras = OrderedDict()
+_trava_figuras = threading.Lock()
+# Contadores para dimensionar o limite (ver estatisticas_figuras)
+_contadores = {'acertos': 0, 'faltas': 0, 'descartes': 0, 'bytes': 0}
+
+# Entradas dos dropdowns como chave: listas (seleção múltipla) viram tuplas
+def _chave(nome, args):
+    return (nome, dados.atual().versao, *(tuple(arg) if isinstance(arg, list) else arg for arg in args))
+
+def _guardar(chave, texto):
+    with _trava_figuras:
+        if chave in _figuras:
+            return
+        _figuras[chave] = texto
+        _contadores['bytes'] += len(texto)
+        while _contadores['bytes'] > LIMITE_CACHE_FIGURAS and _figuras:
+            _, antigo = _figuras.popitem(last=False)
+            _contadores['bytes'] -= len(antigo)
+            _contadores['descartes'] += 1
+
+# Decorador dos callbacks de gráficos (abaixo do @app.callback). Num acerto a saída volta como o
+# JSON já pronto (dicts e listas, que o Dash aceita no lugar da figura), sem passar pelo Plotly.
+# O cálculo fica fora da trava: dois pedidos iguais ao mesmo tempo podem calcular a mesma figura
+def cache_de_figuras(funcao):
+    @wraps(funcao)
+    def com_cache(*args):
+        chave = _chave(funcao.__name__, args)
+        with _trava_figuras:
+            texto = _figuras.get(chave)
+            if texto is not None:
+                _figuras.move_to_end(chave)
+                _contadores['acertos'] += 1
+            else:
+                _contadores['faltas'] += 1
+        if texto is not None:
+            return json.loads(texto)
+
+        saida = funcao(*args)
+        # no_update não é guardado: o Dash só o reconhece como objeto, não pelo JSON
+        if not any(isinstance(valor, type(no_update)) for valor in (saida if isinstance(saida, tuple) else (saida,))):
+            _guardar(chave, json.dumps(saida, cls=PlotlyJSONEncoder))
+        return saida
+
+    return com_cache
+
+# Acertos, faltas, descartes, bytes e itens guardados
+def estatisticas_figuras():
+    with _trava_figuras:
+        return {**_contadores, 'itens': len(_figuras), 'limite': LIMITE_CACHE_FIGURAS}
+
+def limpar_cache_figuras():
+    with _trava_figuras:
+        _figuras.clear()
+        _contadores.update(acertos=0, faltas=0, descartes=0, bytes=0)
+
+# Tema escuro das abas, montado uma vez: plotly_dark com fundos #34495e, legenda horizontal acima do
+# gráfico e a anotação "Clique 2x", que cada gráfico pode reposicionar (ver anotacao_clique)
+TEMA = go.layout.Template(pio.templates['plotly_dark'])
+TEMA.layout.update(
+    paper_bgcolor='#34495e',
+    plot_bgcolor='#34495e',
+    legend=dict(orientation='h', yanchor='bottom', y=1.05, xanchor='center', x=0.5, font=dict(color='white')),
+    annotations=[dict(name='clique', text='*Clique 2x no ativo para visualização única', xref='paper', yref='paper',
+                      x=0.99, y=1.25, showarrow=False, font=dict(color='white', size=12), align='right')],
+)
+CORES = TEMA.layout.colorway
+
+# Anotação "Clique 2x" do tema em outra posição/fonte
+def anotacao_clique(**atributos):
+    return dict(templateitemname='clique', **atributos)
+
+# A partir deste total de pontos as linhas vão por WebGL (Scattergl) em vez de SVG, como o
+# render_mode='auto' do px.line
+LIMITE_PONTOS_SVG = 1000
+
+# Pontos por trace das séries longas (ver analitico.pontos_lttb): um a cada PIXELS_POR_PONTO da
+# largura em que os gráficos de linhas são desenhados (a tela cheia do painel)
+LARGURA_GRAFICOS = int(os.environ.get("LARGURA_GRAFICOS_PX", 1400))
+PIXELS_POR_PONTO = 4
+PONTOS_POR_TRACE = LARGURA_GRAFICOS // PIXELS_POR_PONTO
+
+# Faixa (início, fim) do eixo x no relayoutData de um gráfico, como textos de data; None quando o
+# relayout não traz a faixa (carga inicial, autoscale, duplo clique para voltar ao gráfico inteiro)
+def faixa_do_zoom(relayout):
+    if not relayout or relayout.get('xaxis.autorange'):
+        return None
+    faixa = relayout.get('xaxis.range') or [relayout.get('xaxis.range[0]'), relayout.get('xaxis.range[1]')]
+    if None in faixa:
+        return None
+    return str(faixa[0]), str(faixa[1])
+
+# Gráfico de linhas direto do painel datas x ativos (um trace por coluna, como px.line com
+# color=<ativo>, com as mesmas cores, títulos e hover), sem formato longo nem o pipeline do
+# Plotly Express. Cada trace recebe a coluna da matriz e as datas como arrays NumPy (vão como array
+# tipado e datas ISO no JSON) e é descrito por um dict, validado uma vez só pelo go.Figure como
+# go.Scatter/go.Scattergl. `ordem` = ordem das colunas; `omitir_vazios` tira as colunas sem nenhum
+# valor e liga as lacunas, como um px.line sobre as linhas não nulas. Com `alvo` (pontos por trace)
+# as séries mais longas passam por analitico.pontos_lttb; `detalhe` = faixa do zoom (ver
+# faixa_do_zoom), que vai com todos os pontos
+def figura_linhas(painel, titulo_x='Data', titulo_y='Valor', titulo_legenda='Ativo', ordem=None,
+                  marcadores=True, omitir_vazios=False, alvo=None, detalhe=None, **layout):
+    colunas = np.arange(painel.valores.shape[1]) if ordem is None else np.asarray(ordem)
+    valores = np.asarray(painel.valores, dtype=float)[:, colunas]
+    if omitir_vazios:
+        com_dados = ~np.isnan(valores).all(axis=0)
+        colunas, valores = colunas[com_dados], valores[:, com_dados]
+    datas = np.asarray(painel.datas, dtype='datetime64[ns]')
+
+    manter = ~np.isnan(valores) if omitir_vazios else np.ones(valores.shape, dtype=bool)
+    if alvo is not None and len(datas) > alvo:
+        manter &= pontos_lttb((datas - datas[0]) / np.timedelta64(1, 'D'), valores, alvo)
+        if detalhe is not None:
+            # Um ponto além de cada borda, para a linha chegar até a borda do zoom
+            i0 = np.searchsorted(datas, np.datetime64(detalhe[0], 'ns'))
+            i1 = np.searchsorted(datas, np.datetime64(detalhe[1], 'ns'), side='right')
+            faixa = slice(max(i0 - 1, 0), i1 + 1)
+            manter[faixa] = ~np.isnan(valores[faixa]) if omitir_vazios else True
+
+    tipo = 'scattergl' if manter.sum() >= LIMITE_PONTOS_SVG else 'scatter'
+    traces = []
+    for i, coluna in enumerate(colunas):
+        nome = str(painel.ativos[coluna])
+        x, y = datas[manter[:, i]], valores[manter[:, i], i]
+        traces.append(dict(
+            type=tipo, x=x, y=y, name=nome, legendgroup=nome, showlegend=True,
+            mode='lines+markers' if marcadores else 'lines',
+            line=dict(color=CORES[i % len(CORES)], dash='solid'), marker=dict(symbol='circle'),
+            hovertemplate=f"{titulo_legenda}={nome}<br>{titulo_x}=%{{x}}<br>{titulo_y}=%{{y}}<extra></extra>",
+        ))
+
+    return go.Figure(data=traces, layout=dict(
+        template=TEMA,
+        xaxis=dict(title=dict(text=titulo_x)),
+        yaxis=dict(title=dict(text=titulo_y)),
+        legend=dict(title=dict(text=titulo_legenda), tracegroupgap=0),
+    )).update_layout(**layout)
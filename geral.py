@@ -1,22 +1,14 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
 from dash import dcc, html
-import re
-import os
 import warnings
+from dados import aba, caminho_base, derivado, registrar_derivacao
+from ativos import indicadores, grupo_taxa
 warnings.simplefilter('always')
 
-# Caminho base para os dados
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-caminho_base = os.path.join(BASE_DIR, "Data", "Base - Indicadores.xlsx")
-
 # Dicionário de meses abreviados em português
 meses_abrev_pt = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
-data_abrev = pd.read_excel(caminho_base, sheet_name="Retorno")
-data_abrev.columns = data_abrev.columns.str.strip()
-data_abrev['Data'] = pd.to_datetime(data_abrev['Data'])
-data_tabela = data_abrev['Data'].max()
-mes_abreviado = meses_abrev_pt[data_tabela.month].capitalize()
 
 meses_pt = {
     'January': 'Janeiro', 'February': 'Fevereiro', 'March': 'Março',
@@ -25,14 +17,9 @@ meses_pt = {
     'October': 'Outubro', 'November': 'Novembro', 'December': 'Dezembro'
 }
 
-# Carregar dados de retornos diários (em %)
-def carregar_dados_retorno():
-    df_ret = pd.read_excel(caminho_base, sheet_name="Retorno")
-    df_ret.columns = df_ret.columns.str.strip()
-    df_ret['Data'] = pd.to_datetime(df_ret['Data'])
-    return df_ret
 # Calcular retorno acumulado dos últimos 6 meses (já em %)
-def calcular_retorno_acumulado_6m(df_ret):
+# (snapshot=None usa a versão publicada dos dados; ver dados.atual)
+def calcular_retorno_acumulado_6m(df_ret, snapshot=None):
     ultima_data = df_ret['Data'].max()
     data_inicio = ultima_data - pd.DateOffset(months=6)
     df_6m = df_ret[df_ret['Data'] >= data_inicio].copy()
@@ -49,7 +36,7 @@ def calcular_retorno_acumulado_6m(df_ret):
         retorno_acumulado[ativo] = (1 + serie).prod() - 1 if not serie.empty else None
 
     # Agora cálculo dos índices de inflação usando a aba Inflacao
-    df_inflacao = carregar_dados_inflacao()
+    df_inflacao = carregar_dados_inflacao(snapshot)
     df_inflacao = df_inflacao[df_inflacao['Data'] >= data_inicio]
 
     for indice in ['IPCA', 'INPC', 'IGP-M']:
@@ -106,33 +93,16 @@ def criar_grafico_retorno_acumulado(df_retorno_acumulado):
     return fig
 
 # Obter retorno mensal (ultimo mês)
-def obter_retorno_mensal_completo():
-    # Parte 1: ativos financeiros (aba Retorno)
-    df_ret = carregar_dados_retorno()
-    ultimo_mes = df_ret['Data'].max().to_period('M')
-    df_mes = df_ret[df_ret['Data'].dt.to_period('M') == ultimo_mes].copy()
-    ativos = [col for col in df_mes.columns if col != 'Data']
-
-    def tentar_converter_percentual(valor):
-        try:
-            if isinstance(valor, str) and '%' in valor:
-                return float(valor.replace('%', '').replace(',', '.')) / 100
-            return float(valor)
-        except:
-            return None
-
-    for ativo in ativos:
-        df_mes[ativo] = df_mes[ativo].apply(tentar_converter_percentual)
+def obter_retorno_mensal_completo(snapshot=None):
+    # Parte 1: ativos financeiros (aba Retorno), lidos do último mês do cubo mensal
+    cubo = derivado('retorno', snapshot)['cubo_retorno']
+    ultimo_mes = pd.Period(ordinal=int(cubo.meses[-1]), freq='M')
 
-    retornos = {}
-    for ativo in ativos:
-        serie = df_mes[ativo].dropna()
-        if not serie.empty:
-            retorno = (1 + serie).prod() - 1
-            retornos[ativo] = retorno
+    retornos = {ativo: retorno for ativo, retorno, n in zip(cubo.ativos, cubo.retorno[-1].tolist(), cubo.contagem[-1].tolist())
+                if n > 0}
 
     # Parte 2: índices de inflação (aba Inflacao)
-    df_inf = carregar_dados_inflacao()
+    df_inf = carregar_dados_inflacao(snapshot)
     df_inf['Periodo'] = df_inf['Data'].dt.to_period('M')
     meses_ordenados = df_inf['Periodo'].drop_duplicates().sort_values()
 
@@ -154,63 +124,36 @@ def obter_retorno_mensal_completo():
 
     return retornos, ultimo_mes
 
-def carregar_dados_inflacao():
-    df_inflacao = pd.read_excel(caminho_base, sheet_name="Inflacao")
-    df_inflacao.columns = df_inflacao.columns.str.strip()
-    df_inflacao['Data'] = pd.to_datetime(df_inflacao['Data'])
-    return df_inflacao
-
-# Função para converter string percentual "0,07%" em float decimal 0.0007
-def converte_str_para_decimal(valor):
-    if isinstance(valor, str):
-        return float(valor.replace('%', '').replace(',', '.')) / 100
-    return float(valor)
-def carregar_dados_retorno():
-    df_ret = pd.read_excel(caminho_base, sheet_name="Retorno")
-    df_ret.columns = df_ret.columns.str.strip()
-    df_ret['Data'] = pd.to_datetime(df_ret['Data'])
-    # Convertendo as colunas (exceto 'Data') de percentual string para decimal float
-    colunas = [col for col in df_ret.columns if col != 'Data']
-    for col in colunas:
-        df_ret[col] = df_ret[col].apply(lambda x: converte_str_para_decimal(x) if pd.notnull(x) else x)
-    return df_ret
+def carregar_dados_inflacao(snapshot=None):
+    return aba("Inflacao", snapshot)
+
+# Carregar dados de retornos diários (percentuais como "0,07%" já convertidos para decimal em dados.py)
+def carregar_dados_retorno(snapshot=None):
+    return aba("Retorno", snapshot)
 
 # Funções auxiliares para exibição visual
 def criar_componente_retorno_mensal_minimalista(retornos):
     # Aqui o retorno já deve estar em float decimal (0.0007), exibe formatado
     return html.Div([html.P(f"{ativo}: {retorno:.2%}") for ativo, retorno in retornos.items()])
-def criar_componente_piores_ativos_minimalista(n=5):
-    retornos, mes = obter_retorno_mensal_completo()
+def criar_componente_piores_ativos_minimalista(n=5, snapshot=None):
+    retornos, mes = obter_retorno_mensal_completo(snapshot)
     piores = sorted(retornos.items(), key=lambda x: x[1])[:n]
     return html.Div([html.P(f"{a}: {r:.2%}") for a, r in piores]), mes
 
-def criar_componente_melhores_ativos_minimalista(n=5):
-    retornos, mes = obter_retorno_mensal_completo()
+def criar_componente_melhores_ativos_minimalista(n=5, snapshot=None):
+    retornos, mes = obter_retorno_mensal_completo(snapshot)
     melhores = sorted(retornos.items(), key=lambda x: x[1], reverse=True)[:n]
     return html.Div([html.P(f"{a}: {r:.2%}") for a, r in melhores]), mes
 
-    
-# Carregar dados e montar dashboard
-df_ret = carregar_dados_retorno()
-df_ret_acu = calcular_retorno_acumulado_6m(df_ret)
-fig_retorno_6m = criar_grafico_retorno_acumulado(df_ret_acu)
-retornos_mensais, mes_ultimo = obter_retorno_mensal_completo()
-# Aqui, retornos_mensais pode estar no formato string "0,07%", converte antes para exibir
-retornos_mensais_decimal = {ativo: converte_str_para_decimal(ret) for ativo, ret in retornos_mensais.items()}
-componente_retorno_mensal = criar_componente_retorno_mensal_minimalista(retornos_mensais_decimal)
-componente_piores_ativos, _ = criar_componente_piores_ativos_minimalista(n=5)
-componente_melhores_ativos, _ = criar_componente_melhores_ativos_minimalista(n=5)
-
-nome_mes_en = mes_ultimo.strftime('%B')  
-ano = mes_ultimo.strftime('%Y')      
-nome_mes_pt = meses_pt.get(nome_mes_en, nome_mes_en)  # fallback caso falhe
-
-titulo_mes = f"{nome_mes_pt}/{ano}"    
 
 # Função para extrair e filtrar dados de taxas dos últimos 3 meses
-def evolucao_taxas_3_meses_excel(file_path):
-    df_taxas = pd.read_excel(file_path, sheet_name='Taxas')
-    df_taxas['Data'] = pd.to_datetime(df_taxas['Data'])
+def evolucao_taxas_3_meses_excel(file_path, snapshot=None):
+    # A planilha padrão já está carregada em memória; outros arquivos são lidos sob demanda
+    if file_path == caminho_base:
+        df_taxas = aba('Taxas', snapshot)
+    else:
+        df_taxas = pd.read_excel(file_path, sheet_name='Taxas')
+        df_taxas['Data'] = pd.to_datetime(df_taxas['Data'])
 
     # Formatar dados para formato longo
     df_taxas_melted = df_taxas.melt(id_vars=['Data'], var_name='Titulo', value_name='Taxas')
@@ -220,17 +163,9 @@ def evolucao_taxas_3_meses_excel(file_path):
     data_min = data_max - pd.DateOffset(months=3)
     df_filtrado = df_taxas_melted[(df_taxas_melted['Data'] >= data_min) & (df_taxas_melted['Data'] <= data_max)]
 
-    # Classificar os títulos em grupos (Pré e Pós) via nome
-    def classificar_grupo(titulo):
-        if re.search(r'NTN-F|prefixado|prefixado', titulo, re.IGNORECASE):
-            return 'Pré-fixado'
-        elif re.search(r'NTN-B|ipca\+', titulo, re.IGNORECASE):
-            return 'Pós-fixado (IPCA+)'
-        else:
-            return 'Outro'
-
+    # Classificar os títulos em grupos (Pré e Pós), uma vez por título (ver ativos.grupo_taxa)
     df_filtrado = df_filtrado.copy()
-    df_filtrado.loc[:, 'Grupo'] = df_filtrado['Titulo'].apply(classificar_grupo)
+    df_filtrado.loc[:, 'Grupo'] = df_filtrado['Titulo'].map({titulo: grupo_taxa(titulo) for titulo in df_filtrado['Titulo'].unique()})
 
     # Data do último dia para cálculo de fechamento
     ultima_data = df_filtrado['Data'].max()
@@ -262,8 +197,8 @@ def criar_grafico_taxas(df_taxas):
     df_ultimos_3_meses = df_taxas[df_taxas['Data'] >= data_limite].copy()
 
     # Agrupar os títulos por tipo
-    df_ultimos_3_meses['Grupo'] = df_ultimos_3_meses['Titulo'].apply(
-        lambda x: 'Pré-fixado' if 'NTN-F' in x else 'Pós-fixado (IPCA+)' if 'NTN-B' in x else 'Outro'
+    df_ultimos_3_meses['Grupo'] = df_ultimos_3_meses['Titulo'].map(
+        {titulo: grupo_taxa(titulo) for titulo in df_ultimos_3_meses['Titulo'].unique()}
     )
 
     # Pegar a última data do mês (atual)
@@ -360,56 +295,42 @@ def criar_grafico_taxas(df_taxas):
 
     return fig
 
-def calcular_retorno_acumulado_por_periodo(df_ret, ativo, mes_abreviado, meses_lista=[1, 12, 36, 60]):
-    ativos_sem_retorno = ["IPCA", "NTN-B", "NTN-F", "LFT", "INPC", "IGP-M"]
+# Horizontes da tabela de retornos acumulados (rótulo -> meses; None = desde o início da série)
+HORIZONTES = {"1 M": 1, "12 M": 12, "36 M": 36, "60 M": 60}
+
+# Índices sem retorno acumulado no painel de descrição
+ativos_sem_retorno = ["IPCA", "NTN-B", "NTN-F", "LFT", "INPC", "IGP-M"]
+
+# Retornos acumulados de todos os ativos do cubo mensal em cada horizonte, montados uma vez por versão
+# da planilha: do fim do mês de referência (N meses antes do último mês com dados do ativo) até a
+# última data, pelas somas prefixadas do log do cubo. Sem dado do ativo no mês de referência -> NaN
+def tabela_retornos_por_periodo(cubo, horizontes=HORIZONTES):
+    colunas = np.arange(len(cubo.ativos))
+    com_dados = cubo.contagem > 0
+    prefixo = np.vstack([np.zeros(len(colunas)), np.cumsum(cubo.log, axis=0)])
+    # Linha (no cubo) do último mês com dados de cada ativo; -1 se o ativo não tem nenhum
+    ultima = len(cubo.meses) - 1 - com_dados[::-1].argmax(axis=0)
+    ultima = np.where(com_dados.any(axis=0), ultima, -1)
+
+    tabela = {}
+    for rotulo, meses in horizontes.items():
+        if meses is None:
+            retorno = np.expm1(prefixo[ultima + 1, colunas])
+        else:
+            referencia = cubo.meses[ultima] - meses
+            linha = np.minimum(np.searchsorted(cubo.meses, referencia), len(cubo.meses) - 1)
+            valido = (cubo.meses[linha] == referencia) & com_dados[linha, colunas]
+            retorno = np.where(valido, np.expm1(prefixo[ultima + 1, colunas] - prefixo[linha + 1, colunas]), np.nan)
+        tabela[rotulo] = np.where(ultima >= 0, retorno, np.nan)
+    return pd.DataFrame(tabela, index=pd.Index(cubo.ativos, name='Ativo'))
+
+# Retornos acumulados de um indicador para o painel de descrição, lidos da tabela já montada
+def retornos_do_indicador(tabela, ativo):
     if ativo in ativos_sem_retorno:
         return {"Mensagem": "Retorno acumulado não aplicável para este índice."}
-
-    retornos = {}
-    df_serie = df_ret[['Data', ativo]].dropna().copy()
-    if df_serie.empty:
+    if ativo not in tabela.index or tabela.loc[ativo].isna().all():
         return None
-
-    df_serie.sort_values('Data', inplace=True)
-    df_serie['Data'] = pd.to_datetime(df_serie['Data'])
-
-    ultima_data = df_serie['Data'].max()
-    preco_fim = df_serie[df_serie['Data'] == ultima_data][ativo].values[0]
-
-    # Função para encontrar o último dia útil do mês específico
-    def ultimo_dia_util_mes(df, ano, mes):
-        dados_mes = df[(df['Data'].dt.year == ano) & (df['Data'].dt.month == mes)]
-        if dados_mes.empty:
-            return None
-        return dados_mes['Data'].max()
-
-    # Função para calcular retorno entre dois pontos
-    def calcular_retorno(df, data_inicio, data_fim, coluna):
-        dados = df[(df['Data'] > data_inicio) & (df['Data'] <= data_fim)][coluna]
-        if dados.empty:
-            return None
-        return (1 + dados).prod() - 1
-
-    # Loop para cada período solicitado
-    for meses in meses_lista:
-        ano_referencia = ultima_data.year
-        mes_referencia = ultima_data.month - meses
-
-        # Ajusta ano/mês para datas retroativas
-        while mes_referencia <= 0:
-            mes_referencia += 12
-            ano_referencia -= 1
-
-        data_inicio = ultimo_dia_util_mes(df_serie, ano_referencia, mes_referencia)
-        if data_inicio is None:
-            retornos[f"{meses} M"] = None
-            continue
-
-        retorno = calcular_retorno(df_serie, data_inicio, ultima_data, ativo)
-        if retorno is not None:
-            retornos[f"{meses} M"] = retorno
-
-    return retornos
+    return {rotulo: None if pd.isna(retorno) else float(retorno) for rotulo, retorno in tabela.loc[ativo].items()}
 
 
 
@@ -478,67 +399,6 @@ def criar_componente_retorno_ativo(retornos_dict, mes_abreviado):
 
 
 
-# --- Execução principal ---
-# Carregar dados
-df_preco = carregar_dados_retorno()
-# Calcular gráfico de retorno acumulado 6 meses
-df_retorno_acumulado = calcular_retorno_acumulado_6m(df_preco)
-fig_retorno_6m = criar_grafico_retorno_acumulado(df_retorno_acumulado)
-# Criar componente minimalista CDI e Ibovespa
-componente_retorno_mensal = criar_componente_retorno_mensal_minimalista(retornos_mensais)
-# Criar componente minimalista piores ativos + mês
-componente_piores_ativos, mes_piores = criar_componente_piores_ativos_minimalista(n=5)
-# Criar componente minimalista melhores ativos + mês
-componente_melhores_ativos, mes_melhores = criar_componente_melhores_ativos_minimalista(n=5)
-# Formatar título do mês para exibição
-titulo_mes = mes_ultimo.strftime('%B/%Y').capitalize()
-# Carregar dados de taxas e criar gráfico fixo
-df_taxas_filtrado = evolucao_taxas_3_meses_excel(caminho_base)
-fig_taxas = criar_grafico_taxas(df_taxas_filtrado)
-# Dicionário com indicadores e seus significados
-indicadores = {
-    # Renda Fixa - Pós-Fixado
-    "CDI": "Taxa usada como referência para empréstimos entre bancos.",
-    "Jgp - CDI": "Índice de crédito privado atrelado ao CDI.",
-    "LFT": "Título público que acompanha a taxa Selic.",
-    "IMA-S": "Índice de títulos públicos atrelados à taxa Selic.",
-    # Renda Fixa - Pré-Fixado
-    "IRF-M": "Índice que mede o desempenho de títulos públicos prefixados.",
-    "IRF-M 1": "Índice que mede o desempenho de títulos públicos prefixados com vencimento em até 1 ano.",
-    "IRF-M 1+": "Índice que mede o desempenho de títulos públicos prefixados com vencimento acima de 1 ano.",
-    "NTN-F": "Título público prefixado.",
-    # Debêntures
-    "IDA IPCA": "Índices que acompanham carteiras de debêntures incentivadas atreladas à inflação.",
-    "IDA Geral": "Índices que acompanham carteiras de debêntures incentivadas atreladas à inflação.",
-    "IDA DI": "Índices que acompanham carteiras de debêntures incentivadas atreladas ao DI.",
-    # Renda Variável
-    "Ibovespa": "Índice das ações mais negociadas da bolsa.",
-    "IBRX": "Índice das 50 ou 100 ações mais representativas.",
-    "IDIV": "Índice de ações que mais pagam dividendos.",
-    "Small Caps": "Índice de empresas pequenas da bolsa.",
-    "Midlarge Cap": "Índice de empresas médias e grandes.",
-    "IFIX": "Índice que mede o desempenho dos principais fundos imobiliários (FIIs).",
-    "IVBX-2": "Índice com ações de empresas bem avaliadas, mas fora do top 10 em valor de mercado e liquidez.",
-    "IGC-NM": "Índice de ações de empresas listadas no Novo Mercado, com alto padrão de governança.",
-    "ISEE": "Índice de Sustentabilidade Empresarial, com empresas comprometidas com práticas ESG.",
-    "ICO-2": "Índice com empresas que adotam boas práticas de gestão de carbono.",
-    "IHFA": "Índice de fundos multimercado.",
-    # Inflação
-    "IPCA": "Índice oficial da inflação no Brasil.",
-    "IGP-M": "Índice usado em contratos de aluguel.",
-    "INPC": "Índice que mede a inflação para famílias de menor renda.",
-    "Ima-B": "Índice de títulos públicos indexados à inflação (IPCA), como as NTN-Bs.",
-    "Ima-B 5": "Índice de títulos públicos indexados à inflação (IPCA) com vencimento até 5 anos.",
-    "Ima-B 5+": "Índice de títulos públicos indexados à inflação (IPCA) com vencimento acima de 5 anos.",
-    "NTN-B": "Título público que paga IPCA + juros até o seu vencimento.",
-    "NTN-C 2031": "Título antigo atrelado ao IGP-M com vencimento em 2031.",
-    # Moedas
-    "Dólar Ptax": "Taxa média do dólar usada em contratos financeiros.",
-    "Euro": "Moeda oficial da zona do euro.",
-    # Renda Variável Internacional
-    "S&P 500": "Índice das 500 maiores empresas dos EUA.",
-    "Nasdaq": "Índice das principais empresas de tecnologia dos EUA."
-}
 dropdown_indicadores = dcc.Dropdown(
     id='dropdown-indicadores',
     options=[{'label': k, 'value': k} for k in indicadores.keys()],
@@ -567,262 +427,285 @@ descricao_indicador = html.Div(
 # Função auxiliar para filtrar retornos numéricos
 def filtrar_retorno_numerico(retornos):
     return {k: v for k, v in retornos.items() if isinstance(v, (int, float))}
-retornos_mensais, mes_ultimo = obter_retorno_mensal_completo()
-retornos_filtrados = filtrar_retorno_numerico(retornos_mensais)
-# Maiores altas - ordenando pelo retorno, do maior para o menor
-melhores = sorted(retornos_filtrados.items(), key=lambda x: x[1], reverse=True)[:5]
-# Maiores baixas - ordenando do menor para o maior
-piores = sorted(retornos_filtrados.items(), key=lambda x: x[1])[:5]
-
-
-frase_data_base = f"📅 Data-base: {titulo_mes}"
-print(frase_data_base)
-
-layout = html.Div([
-    # Cabeçalho
-    html.Div([
-        html.Div([
-            html.P(frase_data_base, style={
-                'color': 'white',
-                'fontSize': '20px',
-                'margin': '0',
-                'textAlign': 'left'
-            })
-        ], style={'flex': 1, 'display': 'flex', 'alignItems': 'center'}),
 
+# --- Execução principal ---
+# Dados e figuras da aba Geral, refeitos a cada nova versão da planilha (ver dados.registrar_derivacao)
+def preparar_dados(snapshot):
+    # Carregar dados e calcular gráfico de retorno acumulado 6 meses
+    df_ret = carregar_dados_retorno(snapshot)
+    df_ret_acu = calcular_retorno_acumulado_6m(df_ret, snapshot)
+    fig_retorno_6m = criar_grafico_retorno_acumulado(df_ret_acu)
+    retornos_mensais, mes_ultimo = obter_retorno_mensal_completo(snapshot)
+    # Retornos de 1, 12, 36 e 60 meses dos indicadores, para o painel de descrição
+    cubo = derivado('retorno', snapshot)['cubo_retorno']
+    tabela = tabela_retornos_por_periodo(cubo)
+    retornos_por_periodo = tabela[tabela.index.isin(list(indicadores))]
+    # Formatar título do mês para exibição
+    titulo_mes = mes_ultimo.strftime('%B/%Y').capitalize()
+    # Carregar dados de taxas e criar gráfico fixo
+    df_taxas_filtrado = evolucao_taxas_3_meses_excel(caminho_base, snapshot)
+    fig_taxas = criar_grafico_taxas(df_taxas_filtrado)
+
+    retornos_filtrados = filtrar_retorno_numerico(retornos_mensais)
+    # Maiores altas - ordenando pelo retorno, do maior para o menor
+    melhores = sorted(retornos_filtrados.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Maiores baixas - ordenando do menor para o maior
+    piores = sorted(retornos_filtrados.items(), key=lambda x: x[1])[:5]
+
+    frase_data_base = f"📅 Data-base: {titulo_mes}"
+    print(frase_data_base)
+
+    return {
+        'df_ret': df_ret,
+        'fig_retorno_6m': fig_retorno_6m,
+        'retornos_mensais': retornos_mensais,
+        'mes_ultimo': mes_ultimo,
+        'retornos_por_periodo': retornos_por_periodo,
+        'fig_taxas': fig_taxas,
+        'layout': montar_layout(frase_data_base, titulo_mes, fig_retorno_6m, fig_taxas, melhores, piores),
+    }
+
+def montar_layout(frase_data_base, titulo_mes, fig_retorno_6m, fig_taxas, melhores, piores):
+    return html.Div([
+        # Cabeçalho
         html.Div([
-            html.H2("Indicadores Financeiros - Dashboard", style={
-                'color': 'white',
-                'textAlign': 'center',
-                'margin': '0',
-                'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
-                'fontWeight': '700',
-                'fontSize': '32px',
-                'textShadow': '1px 1px 3px rgba(0,0,0,0.7)'
-            })
-        ], style={'flex': 2, 'textAlign': 'center'}),
+            html.Div([
+                html.P(frase_data_base, style={
+                    'color': 'white',
+                    'fontSize': '20px',
+                    'margin': '0',
+                    'textAlign': 'left'
+                })
+            ], style={'flex': 1, 'display': 'flex', 'alignItems': 'center'}),
 
-        html.Div([
-            html.Img(src='/assets/logo_itau.png', style={
-                'height': '105px',
-                'transform': 'scaleX(1.2)',
-                'marginLeft': '10px'
-            }),
-            html.Img(src='/assets/funbep.png', style={
-                'height': '60px',
-                'marginLeft': '10px'
-            }),
-        ], style={
-            'flex': 1,
-            'display': 'flex',
-            'justifyContent': 'flex-end',
-            'alignItems': 'center',
-            'gap': '10px'
-        })
-    ], style={
-        'display': 'flex',
-        'alignItems': 'center',
-        'justifyContent': 'space-between',
-        'marginBottom': '10px'
-    }),
-
-    # Gráfico de barras no topo
-    html.Div([
-        dcc.Graph(
-            id='grafico-retorno-6m',
-            figure=fig_retorno_6m,
-            config={
-                'displaylogo': False,
-                'modeBarButtonsToAdd': ['toImage'],
-                'toImageButtonOptions': {
-                    'format': 'png',
-                    'filename': 'retorno_acumulado_6m',
-                    'height': 600,
-                    'width': 1000,
-                    'scale': 2
-                }
-            },
-            style={
-                'height': '35vh',
-                'borderRadius': '12px',
-                'border': '2px solid #1f2c3d',
-                'boxShadow': '0 4px 12px rgba(0,0,0,0.5)',
-                'marginBottom': '20px'
-            }
-        )
-    ]),
-
-    # Área com as 3 colunas abaixo do gráfico
-    html.Div([
-        # Coluna 1: Tabela melhores/piores ativos
-        html.Div([
-            html.H4(f"Destaque - {titulo_mes}", style={
-                'color': 'white',
-                'marginBottom': '0px',
-                'marginTop': '0px',
-                'fontWeight': '700',
-                'fontSize': '18px',
-                'textAlign': 'center'
-            }),
+            html.Div([
+                html.H2("Indicadores Financeiros - Dashboard", style={
+                    'color': 'white',
+                    'textAlign': 'center',
+                    'margin': '0',
+                    'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
+                    'fontWeight': '700',
+                    'fontSize': '32px',
+                    'textShadow': '1px 1px 3px rgba(0,0,0,0.7)'
+                })
+            ], style={'flex': 2, 'textAlign': 'center'}),
 
             html.Div([
-                html.Div("📈 Maiores altas", style={
-                    'color': '#39ff14',
-                    'fontWeight': '600',
-                    'marginBottom': '1px',
-                    'marginTop': '1px',
-                    'fontSize': '16px'
+                html.Img(src='/assets/logo_itau.png', style={
+                    'height': '105px',
+                    'transform': 'scaleX(1.2)',
+                    'marginLeft': '10px'
                 }),
-                html.Div([
-                    html.Div(f"{ativo}: {retorno:.2%}",
-                             style={
-                                 'fontSize': '14px',
-                                 'margin': '2px 0',
-                                 'color': 'white',
-                                 'width': '100%',
-                                 #'minWidth': '180px',
-                                 #'maxWidth': '300px',
-                                 # 'maxWidth': '100%',
-                                 'boxSizing': 'border-box',
-                                 #'overflow': 'hidden',
-                                 #'textOverflow': 'ellipsis',
-                                 # 'whiteSpace': 'nowrap',
-                                 'wordBreak': 'break-word'
-                             })
-                    for ativo, retorno in sorted(
-                        filtrar_retorno_numerico(obter_retorno_mensal_completo()[0]).items(),
-                        key=lambda x: x[1],
-                        reverse=True
-                    )[:5]
-                ]),
-                html.Div("📉 Piores retornos", style={
-                    'color': 'tomato',
-                    'marginTop': '1px',
-                    'marginBottom': '1px',
-                    'fontWeight': '600',
-                    'fontSize': '16px'
+                html.Img(src='/assets/funbep.png', style={
+                    'height': '60px',
+                    'marginLeft': '10px'
                 }),
-                html.Div([
-                    html.Div(f"{ativo}: {retorno:.2%}",
-                             style={
-                                 'fontSize': '14px',
-                                 'margin': '2px 0',
-                                 'color': 'white',
-                                 'width': '100%',
-                                 #'minWidth': '180px',
-                                 #'maxWidth': '300px',
-                                 # 'maxWidth': '100%',
-                                 'boxSizing': 'border-box',
-                                 #'overflow': 'hidden',
-                                 #'textOverflow': 'ellipsis',
-                                 #'whiteSpace': 'nowrap',
-                                 'wordBreak': 'break-word'
-                             })
-                    for ativo, retorno in sorted(
-                        filtrar_retorno_numerico(obter_retorno_mensal_completo()[0]).items(),
-                        key=lambda x: x[1]
-                    )[:5]
-                ]),
-            ])
+            ], style={
+                'flex': 1,
+                'display': 'flex',
+                'justifyContent': 'flex-end',
+                'alignItems': 'center',
+                'gap': '10px'
+            })
         ], style={
-            'width': '100%', # permite que ele se ajuste ao espaço disponível
-            'minWidth': '180px',
-            'maxWidth': '300px',
-            'backgroundColor': '#34495e',
-            'borderRadius': '12px',
-            'border': '2px solid #1f2c3d',
-            'boxShadow': '0 4px 10px rgba(0,0,0,0.5)',
-            'padding': '3px 8px',
-            'textAlign': 'center',
-            'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
-            'color': '#000',
-            'minHeight': '35vh',
-            'maxHeight': '305px',
-            'boxSizing': 'border-box',
             'display': 'flex',
-            'flexDirection': 'column',
-            'gap': '2px',
-            'flexGrow': 1
-  # importante para conter padding e borda
+            'alignItems': 'center',
+            'justifyContent': 'space-between',
+            'marginBottom': '10px'
         }),
 
-        # Coluna 2: Gráfico de taxas
+        # Gráfico de barras no topo
         html.Div([
             dcc.Graph(
-                id='grafico-taxas-titulos',
-                figure=fig_taxas,
+                id='grafico-retorno-6m',
+                figure=fig_retorno_6m,
+                config={
+                    'displaylogo': False,
+                    'modeBarButtonsToAdd': ['toImage'],
+                    'toImageButtonOptions': {
+                        'format': 'png',
+                        'filename': 'retorno_acumulado_6m',
+                        'height': 600,
+                        'width': 1000,
+                        'scale': 2
+                    }
+                },
                 style={
-                    'height': '45vh',
-                    'width': '100%',
+                    'height': '35vh',
                     'borderRadius': '12px',
+                    'border': '2px solid #1f2c3d',
                     'boxShadow': '0 4px 12px rgba(0,0,0,0.5)',
+                    'marginBottom': '20px'
                 }
             )
-        ], style={
-            'width': '58%',
-            'minWidth': '320px',
-            'padding': '0',
-            'boxSizing': 'border-box',
-            'border': '2px solid #1f2c3d',
-            'borderRadius': '12px',
-            'display': 'flex',
-            'flexDirection': 'column',
-            'justifyContent': 'stretch',
-            'overflow': 'hidden',
-        }),
+        ]),
 
-        # Coluna 3: Tabela conceitos dos indicadores
+        # Área com as 3 colunas abaixo do gráfico
         html.Div([
-            html.H4("Selecione o índice:", style={
+            # Coluna 1: Tabela melhores/piores ativos
+            html.Div([
+                html.H4(f"Destaque - {titulo_mes}", style={
+                    'color': 'white',
+                    'marginBottom': '0px',
+                    'marginTop': '0px',
+                    'fontWeight': '700',
+                    'fontSize': '18px',
+                    'textAlign': 'center'
+                }),
+
+                html.Div([
+                    html.Div("📈 Maiores altas", style={
+                        'color': '#39ff14',
+                        'fontWeight': '600',
+                        'marginBottom': '1px',
+                        'marginTop': '1px',
+                        'fontSize': '16px'
+                    }),
+                    html.Div([
+                        html.Div(f"{ativo}: {retorno:.2%}",
+                                 style={
+                                     'fontSize': '14px',
+                                     'margin': '2px 0',
+                                     'color': 'white',
+                                     'width': '100%',
+                                     #'minWidth': '180px',
+                                     #'maxWidth': '300px',
+                                     # 'maxWidth': '100%',
+                                     'boxSizing': 'border-box',
+                                     #'overflow': 'hidden',
+                                     #'textOverflow': 'ellipsis',
+                                     # 'whiteSpace': 'nowrap',
+                                     'wordBreak': 'break-word'
+                                 })
+                        for ativo, retorno in melhores
+                    ]),
+                    html.Div("📉 Piores retornos", style={
+                        'color': 'tomato',
+                        'marginTop': '1px',
+                        'marginBottom': '1px',
+                        'fontWeight': '600',
+                        'fontSize': '16px'
+                    }),
+                    html.Div([
+                        html.Div(f"{ativo}: {retorno:.2%}",
+                                 style={
+                                     'fontSize': '14px',
+                                     'margin': '2px 0',
+                                     'color': 'white',
+                                     'width': '100%',
+                                     #'minWidth': '180px',
+                                     #'maxWidth': '300px',
+                                     # 'maxWidth': '100%',
+                                     'boxSizing': 'border-box',
+                                     #'overflow': 'hidden',
+                                     #'textOverflow': 'ellipsis',
+                                     #'whiteSpace': 'nowrap',
+                                     'wordBreak': 'break-word'
+                                 })
+                        for ativo, retorno in piores
+                    ]),
+                ])
+            ], style={
+                'width': '100%', # permite que ele se ajuste ao espaço disponível
+                'minWidth': '180px',
+                'maxWidth': '300px',
+                'backgroundColor': '#34495e',
+                'borderRadius': '12px',
+                'border': '2px solid #1f2c3d',
+                'boxShadow': '0 4px 10px rgba(0,0,0,0.5)',
+                'padding': '3px 8px',
+                'textAlign': 'center',
+                'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
+                'color': '#000',
+                'minHeight': '35vh',
+                'maxHeight': '305px',
+                'boxSizing': 'border-box',
+                'display': 'flex',
+                'flexDirection': 'column',
+                'gap': '2px',
+                'flexGrow': 1
+      # importante para conter padding e borda
+            }),
+
+            # Coluna 2: Gráfico de taxas
+            html.Div([
+                dcc.Graph(
+                    id='grafico-taxas-titulos',
+                    figure=fig_taxas,
+                    style={
+                        'height': '45vh',
+                        'width': '100%',
+                        'borderRadius': '12px',
+                        'boxShadow': '0 4px 12px rgba(0,0,0,0.5)',
+                    }
+                )
+            ], style={
+                'width': '58%',
+                'minWidth': '320px',
+                'padding': '0',
+                'boxSizing': 'border-box',
+                'border': '2px solid #1f2c3d',
+                'borderRadius': '12px',
+                'display': 'flex',
+                'flexDirection': 'column',
+                'justifyContent': 'stretch',
+                'overflow': 'hidden',
+            }),
+
+            # Coluna 3: Tabela conceitos dos indicadores
+            html.Div([
+                html.H4("Selecione o índice:", style={
+                    'color': 'white',
+                    'fontSize': '16px',
+                    'fontWeight': '600',
+                    'marginTop': '0px',
+                    'marginBottom': '2px',
+                    'textAlign': 'center'
+                }),
+                dropdown_indicadores,
+                descricao_indicador,
+            ], style={
+                'backgroundColor': '#34495e',
                 'color': 'white',
-                'fontSize': '16px',
-                'fontWeight': '600',
-                'marginTop': '0px',
-                'marginBottom': '2px',
-                'textAlign': 'center'
+                'padding': '8px 12px',
+                'border': '2px solid #1f2c3d',
+                'borderRadius': '12px',
+                'width': '28%',
+                'minWidth': '240px',
+                'maxWidth': '300px',
+                'maxHeight': '35vh',
+                'minHeight': '245px',
+                'overflowY': 'hidden',
+                'boxShadow': '0 4px 15px rgba(255, 255, 255, 0.15)',
+                'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
+                'display': 'flex',
+                'flexDirection': 'column',
+                'gap': '2px',
+                'boxSizing': 'border-box',
+                'flexGrow': 1
             }),
-            dropdown_indicadores,
-            descricao_indicador,
         ], style={
-            'backgroundColor': '#34495e',
-            'color': 'white',
-            'padding': '8px 12px',
-            'border': '2px solid #1f2c3d',
-            'borderRadius': '12px',
-            'width': '28%',
-            'minWidth': '240px',
-            'maxWidth': '300px',
-            'maxHeight': '35vh',
-            'minHeight': '245px',
-            'overflowY': 'hidden',
-            'boxShadow': '0 4px 15px rgba(255, 255, 255, 0.15)',
-            'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif",
             'display': 'flex',
-            'flexDirection': 'column',
-            'gap': '2px',
-            'boxSizing': 'border-box',
-            'flexGrow': 1
+            'justifyContent': 'space-between',
+            'alignItems': 'flex-start',
+            'gap': '20px',
+            'flexWrap': 'nowrap'
         }),
+
+        # Dummy output invisível para manter conexão ativa
+        html.Div(id='dummy-output', style={'display': 'none'}),
+
+        # Intervalo para callback de manter conexão
+        dcc.Interval(id='interval-component', interval=300000, n_intervals=0)
     ], style={
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'alignItems': 'flex-start',
-        'gap': '20px',
-        'flexWrap': 'nowrap'
-    }),
-
-    # Dummy output invisível para manter conexão ativa
-    html.Div(id='dummy-output', style={'display': 'none'}),
-
-    # Intervalo para callback de manter conexão
-    dcc.Interval(id='interval-component', interval=300000, n_intervals=0)
-], style={
-    'padding': '10px 30px',          # 20px 30px
-    'backgroundColor': '#2c3e50',
-    'minHeight': '100vh',
-    'boxSizing': 'border-box',
-    'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
-})
+        'padding': '10px 30px',          # 20px 30px
+        'backgroundColor': '#2c3e50',
+        'minHeight': '100vh',
+        'boxSizing': 'border-box',
+        'fontFamily': "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+    })
+
+registrar_derivacao('geral', preparar_dados)
 
 # print(df_taxas_filtrado.head())
 # print(df_taxas_filtrado['Data'].min(), df_taxas_filtrado['Data'].max())
@@ -0,0 +1,26 @@
+# Gera o artefato de inicialização do dashboard (ver dados.gravar_artefato): faz a ingestão
+# da planilha, calcula os dados e layouts de todas as abas e grava tudo num único arquivo,
+# que o app lê de uma vez no boot. Pensado para rodar uma vez no deploy, antes de subir as instâncias.
+#
+# Uso: python gerar_snapshot.py [--planilha CAMINHO] [--saida CAMINHO]
+import argparse
+import time
+
+import dados
+# Os módulos das abas registram as suas derivações ao serem importados
+import geral
+import retorno_layout
+import volatilidade_layout
+import taxas_layout
+import inflacao_layout
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera o snapshot de inicialização do dashboard")
+    parser.add_argument('--planilha', default=dados.caminho_base, help="planilha de origem")
+    parser.add_argument('--saida', default=dados.arquivo_artefato, help="arquivo do snapshot")
+    args = parser.parse_args()
+
+    inicio = time.time()
+    snapshot = dados.carregar_snapshot(args.planilha)
+    dados.gravar_artefato(snapshot, args.saida)
+    print(f"Snapshot versão {snapshot.versao} gravado em {args.saida} ({time.time() - inicio:.1f}s)")
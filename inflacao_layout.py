@@ -1,144 +1,175 @@
+import numpy as np
 import pandas as pd
+from collections import namedtuple
 from dash import html, dcc, dash_table
 import plotly.express as px
 from datetime import datetime
-import os
-
-# Leitura dos dados
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-caminho_base = os.path.join(BASE_DIR, "Data", "Base - Indicadores.xlsx")
-
-# os.path.join(os.path.dirname(__file__), 'Base - Indicadores.xlsx')
-
-df_inflacao = pd.read_excel(caminho_base, sheet_name="Inflacao")
-df_inflacao['Data'] = pd.to_datetime(df_inflacao['Data'], dayfirst=True)
-
-anos_disponiveis = sorted(df_inflacao['Data'].dt.year.unique())
+from dados import derivado, registrar_derivacao
+from calendario import montar_calendario, meses_do_ano, posicoes_meses, posicoes_no_ano
+
+INDICES = ['IPCA', 'INPC', 'IGP-M']
+
+# Análise de toda a série, montada uma vez por versão da planilha: uma linha por data em ordem (alinhada
+# ao calendário da aba) e uma coluna por índice (INDICES)
+# - retorno: variação sobre a linha anterior, se ela for de dezembro do ano anterior em diante (como no
+#   recorte "dezembro anterior até o mês" que o gráfico usava)
+# - acumulado: acumulado no ano até a linha, em % (NaN onde não há variação, como o cumprod)
+# - acumulado_ano: o mesmo ignorando as variações ausentes, para a coluna Acumulado da tabela
+# - rotulos e textos: rótulos do gráfico e células da tabela já formatados
+AnaliseInflacao = namedtuple('AnaliseInflacao', ['datas', 'meses', 'retorno', 'acumulado', 'acumulado_ano',
+                                                 'rotulos', 'textos'])
+
+def analisar_inflacao(df_inflacao):
+    df = df_inflacao.dropna(subset=['Data']).sort_values('Data', kind='stable', ignore_index=True)
+    ano = df['Data'].dt.year
+    dezembro_anterior = pd.to_datetime(pd.DataFrame({'year': ano - 1, 'month': 12, 'day': 1}))
+    anterior_no_ano = df['Data'].shift(1) >= dezembro_anterior
+
+    colunas = {nome: [] for nome in AnaliseInflacao._fields[2:]}
+    for indice in INDICES:
+        valores = df[indice]
+        retorno = (valores / valores.shift(1) - 1).where(anterior_no_ano)
+        fator = (1 + retorno).groupby(ano).cumprod()
+        acumulado = (fator - 1) * 100
+        colunas['retorno'].append(retorno)
+        colunas['acumulado'].append(acumulado)
+        colunas['acumulado_ano'].append((fator.groupby(ano).ffill().fillna(1) - 1) * 100)
+        colunas['rotulos'].append(acumulado.round(2).astype(str) + '%')
+        colunas['textos'].append(formatar_percentual(retorno))
+    return AnaliseInflacao(df['Data'].to_numpy(), df['Data'].dt.strftime('%b - %y').to_numpy(dtype=object),
+                           **{nome: np.column_stack([np.asarray(coluna, dtype=object if nome in ('rotulos', 'textos') else float)
+                                                     for coluna in lista])
+                              for nome, lista in colunas.items()})
+
+# "1.23%" para variações em decimal; NaN continua NaN
+def formatar_percentual(valores):
+    valores = np.asarray(valores, dtype=float)
+    return np.where(np.isnan(valores), np.nan, np.char.mod('%.2f%%', valores * 100).astype(object))
+
+# Dados da aba Inflação, refeitos a cada nova versão da planilha (ver dados.registrar_derivacao)
+def preparar_dados(snapshot):
+    df_inflacao = snapshot.abas['Inflacao']
+    calendario_inflacao = montar_calendario(df_inflacao['Data'])
+    anos_disponiveis = sorted(calendario_inflacao.meses_por_ano)
+    return {
+        'df_inflacao': df_inflacao,
+        'calendario_inflacao': calendario_inflacao,
+        'analise_inflacao': analisar_inflacao(df_inflacao),
+        'layout': montar_layout(anos_disponiveis),
+    }
 
 def meses_por_ano(ano):
-    return sorted(df_inflacao[df_inflacao['Data'].dt.year == ano]['Data'].dt.month.unique())
+    return meses_do_ano(derivado('inflacao')['calendario_inflacao'], ano)
 
 # Layout da aba de inflação
-layout = html.Div(style={'backgroundColor': '#34495e', 'padding': '15px 30px 30px 30px', 'fontFamily': 'Arial', 'minHeight': '100vh', 'fontFamily': 'Arial',}, children=[
-    # html.H2("Dashboard de Inflação", style={'color': '#ecf0f1', 'textAlign': 'center', 'fontSize': '30px', 'marginBottom': '30px'}),  # removido
-    html.Div([
+def montar_layout(anos_disponiveis):
+    return html.Div(style={'backgroundColor': '#34495e', 'padding': '15px 30px 30px 30px', 'fontFamily': 'Arial', 'minHeight': '100vh', 'fontFamily': 'Arial',}, children=[
+        # html.H2("Dashboard de Inflação", style={'color': '#ecf0f1', 'textAlign': 'center', 'fontSize': '30px', 'marginBottom': '30px'}),  # removido
         html.Div([
-            html.Label("Ano:", style={'color': 'white', 'fontWeight': 'bold'}),
-            dcc.Dropdown(
-                id='inflacao-ano-dropdown',
-                options=[{'label': str(ano), 'value': ano} for ano in anos_disponiveis],
-                value=anos_disponiveis[-1],
-                clearable=False,
-                style={'color': '#34495e'}
-            )
-        ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '20px'}),
+            html.Div([
+                html.Label("Ano:", style={'color': 'white', 'fontWeight': 'bold'}),
+                dcc.Dropdown(
+                    id='inflacao-ano-dropdown',
+                    options=[{'label': str(ano), 'value': ano} for ano in anos_disponiveis],
+                    value=anos_disponiveis[-1],
+                    clearable=False,
+                    style={'color': '#34495e'}
+                )
+            ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '20px'}),
+            html.Div([
+                html.Label("Mês:", style={'color': 'white', 'fontWeight': 'bold'}),
+                dcc.Dropdown(id='inflacao-mes-dropdown', clearable=False, style={'color': '#34495e'})
+            ], style={'width': '30%', 'display': 'inline-block'})
+        ], style={'marginBottom': '20px', 'textAlign': 'center'}),  # diminui marginBottom para subir um pouco
+        dcc.Graph(
+            id='grafico-inflacao',
+            style={
+                'height': '50vh',
+                'minHeight': '400px',
+                'width': '100%',
+                'marginBottom': '10px'
+            }
+        ),
         html.Div([
-            html.Label("Mês:", style={'color': 'white', 'fontWeight': 'bold'}),
-            dcc.Dropdown(id='inflacao-mes-dropdown', clearable=False, style={'color': '#34495e'})
-        ], style={'width': '30%', 'display': 'inline-block'})
-    ], style={'marginBottom': '20px', 'textAlign': 'center'}),  # diminui marginBottom para subir um pouco
-    dcc.Graph(
-        id='grafico-inflacao',
-        style={
-            'height': '50vh',
-            'minHeight': '400px',
-            'width': '100%',
-            'marginBottom': '10px'
-        }
-    ),
-    html.Div([
-        dash_table.DataTable(
-            id='tabela-inflacao',
-            style_table={'overflowX': 'auto', 'maxHeight': 'none', 'marginTop': '10px'},
-            style_cell={
-                'backgroundColor': '#2c3e50',
-                'color': 'white',
-                'textAlign': 'center',
-                'fontSize': 14,
-                'padding': '10px',
-                'border': '1px solid #1f2c3d'
-            },
-            style_header={
-                'backgroundColor': '#34495e',
-                'fontWeight': 'bold',
-                'color': '#ecf0f1',
-                'border': '1px solid #1f2c3d'
+            dash_table.DataTable(
+                id='tabela-inflacao',
+                style_table={'overflowX': 'auto', 'maxHeight': 'none', 'marginTop': '10px'},
+                style_cell={
+                    'backgroundColor': '#2c3e50',
+                    'color': 'white',
+                    'textAlign': 'center',
+                    'fontSize': 14,
+                    'padding': '10px',
+                    'border': '1px solid #1f2c3d'
+                },
+                style_header={
+                    'backgroundColor': '#34495e',
+                    'fontWeight': 'bold',
+                    'color': '#ecf0f1',
+                    'border': '1px solid #1f2c3d'
+                },
+                style_data_conditional=[
+        {
+            'if': {
+                'filter_query': '{IPCA} contains "-"',
+                'column_id': 'IPCA'
             },
-            style_data_conditional=[
-    {
-        'if': {
-            'filter_query': '{IPCA} contains "-"',
-            'column_id': 'IPCA'
-        },
-        'color': 'red'
-    },
-    {
-        'if': {
-            'filter_query': '{INPC} contains "-"',
-            'column_id': 'INPC'
+            'color': 'red'
         },
-        'color': 'red'
-    },
-    {
-        'if': {
-            'filter_query': '{IGP-M} contains "-"',
-            'column_id': 'IGP-M'
+        {
+            'if': {
+                'filter_query': '{INPC} contains "-"',
+                'column_id': 'INPC'
+            },
+            'color': 'red'
         },
-        'color': 'red'
-    },
-    {
-        'if': {
-            'filter_query': '{Acumulado} contains "-"',
-            'column_id': 'Acumulado'
+        {
+            'if': {
+                'filter_query': '{IGP-M} contains "-"',
+                'column_id': 'IGP-M'
+            },
+            'color': 'red'
         },
-        'color': 'red'
-    }
-]
-
-        )
-    ], style={'textAlign': 'center'})
-])
+        {
+            'if': {
+                'filter_query': '{Acumulado} contains "-"',
+                'column_id': 'Acumulado'
+            },
+            'color': 'red'
+        }
+    ]
 
-def gerar_grafico_e_tabela(ano, mes):
-    # Data inicial = 1 de dezembro do ano anterior (para cálculo do retorno de janeiro)
-    data_inicio = pd.Timestamp(year=ano-1, month=12, day=1)
-    data_fim = df_inflacao[
-        (df_inflacao['Data'].dt.year == ano) & (df_inflacao['Data'].dt.month == mes)
-    ]['Data'].max()
-
-    df_filtrado = df_inflacao[(df_inflacao['Data'] >= data_inicio) & (df_inflacao['Data'] <= data_fim)].copy()
-    df_filtrado['Mês'] = df_filtrado['Data'].dt.strftime('%b - %y')
-
-    # Calcular retorno mensal
-    for indice in ['IPCA', 'INPC', 'IGP-M']:
-        df_filtrado[f'Retorno {indice}'] = df_filtrado[indice] / df_filtrado[indice].shift(1) - 1
-
-    # Calcular acumulado
-    for indice in ['IPCA', 'INPC', 'IGP-M']:
-        df_filtrado[f'Acumulado {indice}'] = ((1 + df_filtrado[f'Retorno {indice}']).cumprod() - 1) * 100
-
-    # Para o gráfico e tabela, remova a linha de dezembro do ano anterior (usada só para cálculo)
-    df_exibicao = df_filtrado[df_filtrado['Data'] >= pd.Timestamp(year=ano, month=1, day=1)].copy()
-
-    # Preparar dados para gráfico
-    df_melt = df_exibicao.melt(
-        id_vars='Mês',
-        value_vars=[f'Acumulado IPCA', f'Acumulado INPC', f'Acumulado IGP-M'],
-        var_name='Índice',
-        value_name='Variação Acumulada (%)'
-    )
-    df_melt['Índice'] = df_melt['Índice'].replace({
-        'Acumulado IPCA': 'IPCA',
-        'Acumulado INPC': 'INPC',
-        'Acumulado IGP-M': 'IGP-M'
+            )
+        ], style={'textAlign': 'center'})
+    ])
+
+# Linhas de janeiro até ano/mês da análise (nenhuma se o mês não tem dados), no formato do gráfico
+# (uma linha por mês e índice) e da tabela (índices nas linhas, variação de cada mês nas colunas)
+def dados_do_ano(analise, calendario, ano, mes):
+    inicio_mes, fim = posicoes_meses(calendario, ano, mes)
+    inicio = posicoes_no_ano(calendario, ano, mes)[0] if fim > inicio_mes else fim
+    meses = analise.meses[inicio:fim]
+    # Só mostra rótulo para IPCA e IGP-M, INPC fica sem texto
+    rotulos = analise.rotulos[inicio:fim].copy()
+    rotulos[:, INDICES.index('INPC')] = ''
+
+    df_melt = pd.DataFrame({
+        'Mês': np.tile(meses, len(INDICES)),
+        'Índice': np.repeat(np.array(INDICES, dtype=object), len(meses)),
+        'Variação Acumulada (%)': analise.acumulado[inicio:fim].ravel(order='F') / 100,
+        'Rótulo Grafico': rotulos.ravel(order='F'),
     })
-    df_melt['Rótulo'] = df_melt['Variação Acumulada (%)'].round(2).astype(str) + '%'
-    df_melt['Variação Acumulada (%)'] = df_melt['Variação Acumulada (%)'] / 100
 
-    # Novo: só mostra rótulo para IPCA e IGP-M, INPC fica sem texto
-    df_melt['Rótulo Grafico'] = df_melt.apply(
-        lambda row: row['Rótulo'] if row['Índice'] != 'INPC' else '', axis=1
-    )
+    tabela = pd.DataFrame(analise.textos[inicio:fim].T, columns=list(meses))
+    tabela.insert(0, 'Ativo', INDICES)
+    ultima = fim - 1 if fim > inicio else None
+    acumulado = analise.acumulado_ano[ultima] if ultima is not None else np.zeros(len(INDICES))
+    tabela['Acumulado'] = [f"{valor:.2f}%" for valor in acumulado]
+    return df_melt, tabela
+
+def gerar_grafico_e_tabela(ano, mes):
+    dados_inflacao = derivado('inflacao')
+    df_melt, tabela = dados_do_ano(dados_inflacao['analise_inflacao'], dados_inflacao['calendario_inflacao'], ano, mes)
 
     nome_mes = datetime(1900, mes, 1).strftime('%B').capitalize()
     fig = px.line(
@@ -169,22 +200,6 @@ def gerar_grafico_e_tabela(ano, mes):
         title_font=dict(color='#ecf0f1', size=20)
 )
 
-    # Preparar tabela (usando retornos mensais, excluindo dezembro do ano anterior)
-    indices = ['IPCA', 'INPC', 'IGP-M']
-    retorno_cols = [f'Retorno {indice}' for indice in indices]
-    tabela = df_exibicao[['Mês'] + retorno_cols].copy()
-    tabela.columns = ['Mês'] + indices
-    tabela = tabela.set_index('Mês').T
-    tabela.insert(0, 'Ativo', tabela.index)
-
-    acumulado_valores = {
-        indice: ((1 + df_exibicao[f'Retorno {indice}'].dropna()).prod() - 1) * 100 for indice in indices
-    }
-    tabela['Acumulado'] = tabela['Ativo'].map(lambda x: f"{acumulado_valores.get(x, 0):.2f}%")
-
-    for col in tabela.columns[1:-1]:
-        tabela[col] = tabela[col].apply(lambda x: f"{x * 100:.2f}%" if pd.notnull(x) else x)
-
     colunas = [{'name': col, 'id': col} for col in tabela.columns]
     dados = tabela.to_dict('records')
 
@@ -200,4 +215,4 @@ def gerar_grafico_e_tabela(ano, mes):
 
     return fig, colunas, dados
 
-
+registrar_derivacao('inflacao', preparar_dados)
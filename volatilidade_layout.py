@@ -1,162 +1,165 @@
+import numpy as np
 import pandas as pd
 from dash import html, dcc
 from dash import dash_table
-import os
-import numpy as np
+from dados import atual, derivado, registrar_derivacao
+from analitico import montar_painel, janela, selecionar, extremos_validos, alinhar_ids, volatilidade_nas_janelas
+from calendario import montar_calendario, meses_do_ano, posicoes_meses, posicoes_no_ano
 
-# Caminho da base de dados
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-caminho_base = os.path.join(BASE_DIR, "Data", "Base - Indicadores.xlsx")
-
-# Categorias associadas a cada ativo (exemplo)
-categorias = {
-    'Ibovespa': 'Renda Variável',
-    'CDI': 'Renda Fixa',
-    'Ida Geral': 'Crédito',
-    'IHFA': 'Multimercado',
-    'Ima-B 5': 'Renda Fixa',
-    'Ima-B 5+': 'Renda Fixa',
-    'Ima-B': 'Renda Fixa',
-    'IRF-M': 'Renda Fixa',
-    'S&P 500': 'Internacional',
-    'Nasdaq': 'Internacional',
-    'IDA DI': 'Crédito',
-    'IDA IPCA': 'Renda Fixa',
-    'IFIX': 'Renda Variável',
-    'Small Caps': 'Renda Variável',
-    'Jgp - CDI': 'Crédito',
-    'Ibrx': 'Renda Variável',
-    'IVBX-2': 'Renda Variável',
-    'IGC-Nm': 'Renda Variável',
-    'ISEE': 'Renda Variável',
-    'ICO-2': 'Renda Variável',
-    'IDIV': 'Renda Variável',
-    'Midlarge Cap': 'Renda Variável',
-    'Ima S': 'Renda Fixa',
-    'Ima Geral': 'Renda Fixa',
-    'Dólar Ptax': 'Internacional'
-}
-
-# Código para carregar e preparar df_risco_melt, antes dos callbacks
-df_risco = pd.read_excel(caminho_base, sheet_name="Risco")
-df_risco.columns = df_risco.columns.str.strip()
-df_risco['Data'] = pd.to_datetime(df_risco['Data'])
-
-# Substituir '-' por NaN de forma segura
-for col in df_risco.columns:
-    if col != 'Data':
-        df_risco[col] = df_risco[col].where(df_risco[col] != '-', np.nan)
-        df_risco[col] = (
-            df_risco[col].astype(str)
-            .str.replace('%', '', regex=False)
-            .str.replace(',', '.', regex=False)
-            .astype(float) 
-        )
-
-ativos = [col for col in df_risco.columns if col != 'Data']
-
-df_risco_melt = df_risco.melt(
-    id_vars='Data',
-    value_vars=ativos,
-    var_name='Ativo',
-    value_name='Volatilidade'
-)
-
-df_risco_melt['Categoria'] = df_risco_melt['Ativo'].map(categorias)
-
-# Se existir df_risco_melt_vol, faça a mesma coisa para ele
-df_risco_melt_vol = df_risco_melt.copy()
-
-# Lista única de categorias para o dropdown
+# Ordem das categorias no dropdown
 ordem_categorias = ['Renda Fixa', 'Renda Variável', 'Crédito', 'Multimercado', 'Internacional', 'Todos']
-categorias_unicas = [cat for cat in ordem_categorias if cat in df_risco_melt['Categoria'].unique()]
+
+# Painel de volatilidade da aba Risco, refeito a cada nova versão da planilha
+# ('-' e percentuais já convertidos para float em dados.py)
+def preparar_dados(snapshot):
+    df_risco = snapshot.abas['Risco']
+
+    # Painel largo datas x ativos (sobre a matriz em memmap) com a categoria de cada ativo na aba Risco
+    painel_risco = montar_painel(snapshot.matrizes.get('Risco', df_risco), derivado('ativos', snapshot), ['CategoriaRisco'])
+
+    # Lista única de categorias para o dropdown
+    categorias_unicas = [cat for cat in ordem_categorias if cat in painel_risco.atributos['CategoriaRisco']]
+
+    # Meses com dados (anos e meses dos dropdowns, limites das janelas)
+    calendario_risco = montar_calendario(painel_risco.datas)
+    anos_unicos = sorted(calendario_risco.meses_por_ano)
+
+    return {
+        'df_risco': df_risco,
+        'painel_risco': painel_risco,
+        'calendario_risco': calendario_risco,
+        'layout': montar_layout(anos_unicos, categorias_unicas),
+    }
 
 # Função para meses por ano
 def meses_por_ano(ano):
-    return sorted(df_risco[df_risco['Data'].dt.year == ano]['Data'].dt.month.unique())
+    return meses_do_ano(derivado('risco')['calendario_risco'], ano)
+
+# Colunas da tabela de volatilidade (janelas em meses até o mês final; None = ano corrente)
+COLUNAS_TABELA_RISCO = {
+    'Volatilidade 6 Meses (%)': 6,
+    'Volatilidade 12 Meses (%)': 12,
+    'Volatilidade 24 Meses (%)': 24,
+    'Volatilidade 36 Meses (%)': 36,
+    'Volatilidade Anualizada no Ano (%)': None,
+}
 
-# Lista de anos
-anos_unicos = sorted(df_risco['Data'].dt.year.dropna().unique())
-anos_unicos = [int(ano) for ano in anos_unicos if not pd.isna(ano)]
+# Tabela de volatilidade de todos os ativos da categoria até o mês de `data_fim`, de uma vez: a mensal é o
+# último valor do mês na aba Risco (ligada à aba Retorno pelo ID do ativo, já que as grafias mudam:
+# 'Ibrx', 'Ima S'...) e as das janelas saem juntas do índice de momentos da aba Retorno, como uma
+# matriz janelas x ativos, lidas do mesmo snapshot (o atual, por padrão). Devolve os registros da
+# tabela (%, 2 casas, 0.0 onde não há valor)
+def tabela_risco(data_fim, categoria, snapshot=None):
+    snapshot = snapshot or atual()
+    dados_retorno, dados_risco = derivado('retorno', snapshot), derivado('risco', snapshot)
+    painel_ret, momentos = dados_retorno['painel_retorno'], dados_retorno['momentos_retorno']
+    painel_vol = dados_risco['painel_risco']
+    ano, mes = data_fim.year, data_fim.month
+
+    colunas = None
+    if categoria != 'Todos':
+        colunas = selecionar(painel_ret, Categoria=categoria)
+        painel_ret = janela(painel_ret, colunas=colunas)
+        painel_vol = janela(painel_vol, colunas=selecionar(painel_vol, CategoriaRisco=categoria))
+
+    # Volatilidade mensal: último valor com dado no mês de cada coluna da aba Risco
+    janela_vol_mes = janela(painel_vol, posicoes=posicoes_meses(dados_risco['calendario_risco'], ano, mes))
+    valores_mes = np.asarray(janela_vol_mes.valores)
+    ultima_vol = np.full(valores_mes.shape[1] + 1, np.nan)
+    if len(valores_mes):
+        _, ultimo, tem_valor = extremos_validos(valores_mes)
+        ultima_vol[:-1] = np.where(tem_valor, valores_mes[ultimo, np.arange(valores_mes.shape[1])], np.nan)
+    # Posição -1 (ativo sem coluna na aba Risco) cai no NaN do fim
+    vol_mensal = ultima_vol[alinhar_ids(painel_ret.ids, janela_vol_mes.ids)]
+
+    calendario_retorno = dados_retorno['calendario_retorno']
+    posicoes = [posicoes_no_ano(calendario_retorno, ano, mes) if meses is None
+                else posicoes_meses(calendario_retorno, ano, mes, meses)
+                for meses in COLUNAS_TABELA_RISCO.values()]
+    vols = volatilidade_nas_janelas(momentos, colunas=colunas, posicoes=posicoes)
+
+    tabela = pd.DataFrame({'Ativo': painel_ret.ativos, 'Volatilidade Mensal (%)': vol_mensal,
+                           **dict(zip(COLUNAS_TABELA_RISCO, vols))})
+    percentuais = tabela.columns[1:]
+    tabela[percentuais] = (tabela[percentuais] * 100).round(2).fillna(0.0)
+    return tabela.to_dict('records')
 
 # Layout da aba Risco atualizado com a tabela de volatilidade
-layout = html.Div([
-    # 🔽 BLOCO DE FILTROS CENTRALIZADOS
-    html.Div([
+def montar_layout(anos_unicos, categorias_unicas):
+    return html.Div([
+        # 🔽 BLOCO DE FILTROS CENTRALIZADOS
         html.Div([
-            html.Label('Ano:', style={'color': 'white'}),
-            dcc.Dropdown(
-                id='risco-ano-dropdown',
-                options=[{'label': str(ano), 'value': ano} for ano in anos_unicos],
-                value=anos_unicos[-1] if anos_unicos else None
-            )
-        ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'}),      # 'width': '200px', 'margin': '5px'
-
-        html.Div([
-            html.Label('Mês:', style={'color': 'white'}),
-            dcc.Dropdown(id='risco-mes-dropdown')
-        ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'}),          # 'width': '200px', 'margin': '5px'
-
-        html.Div([
-            html.Label('Categoria:', style={'color': 'white'}),
-            dcc.Dropdown(
-                id='risco-categoria-dropdown',
-                options=[{'label': 'Todos', 'value': 'Todos'}] + [{'label': cat, 'value': cat} for cat in categorias_unicas],
-                value='Renda Fixa',
-                clearable=False
-            )
-        ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'})
-    ], style={
-        'display': 'flex',
-        'justifyContent': 'center',
-        'marginBottom': '20px',
-        'padding': '0 20px' 
-    }),
+            html.Div([
+                html.Label('Ano:', style={'color': 'white'}),
+                dcc.Dropdown(
+                    id='risco-ano-dropdown',
+                    options=[{'label': str(ano), 'value': ano} for ano in anos_unicos],
+                    value=anos_unicos[-1] if anos_unicos else None
+                )
+            ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'}),      # 'width': '200px', 'margin': '5px'
+
+            html.Div([
+                html.Label('Mês:', style={'color': 'white'}),
+                dcc.Dropdown(id='risco-mes-dropdown')
+            ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'}),          # 'width': '200px', 'margin': '5px'
+
+            html.Div([
+                html.Label('Categoria:', style={'color': 'white'}),
+                dcc.Dropdown(
+                    id='risco-categoria-dropdown',
+                    options=[{'label': 'Todos', 'value': 'Todos'}] + [{'label': cat, 'value': cat} for cat in categorias_unicas],
+                    value='Renda Fixa',
+                    clearable=False
+                )
+            ], style={'width': '22%', 'minWidth': '250px', 'marginRight': '30px'})
+        ], style={
+            'display': 'flex',
+            'justifyContent': 'center',
+            'marginBottom': '20px',
+            'padding': '0 20px' 
+        }),
 
     
-    dcc.Graph(id='grafico-risco'),
+        dcc.Graph(id='grafico-risco'),
     
-    dash_table.DataTable(
-    id='tabela-risco',
-    columns=[
-        {'name': 'Ativo', 'id': 'Ativo'},
-        {'name': 'Volatilidade Mensal (%)', 'id': 'Volatilidade Mensal (%)'},
-        {'name': 'Volatilidade 6 Meses (%)', 'id': 'Volatilidade 6 Meses (%)'},
-        {'name': 'Volatilidade 12 Meses (%)', 'id': 'Volatilidade 12 Meses (%)'},
-        {'name': 'Volatilidade 24 Meses (%)', 'id': 'Volatilidade 24 Meses (%)'},
-        {'name': 'Volatilidade 36 Meses (%)', 'id': 'Volatilidade 36 Meses (%)'},
-        {'name': 'Volatilidade Anualizada no Ano (%)', 'id': 'Volatilidade Anualizada no Ano (%)'}
-    ],
-    data=[],
-    style_header={
-        'backgroundColor': '#34495e',  
-        'color': 'white',              
-        'fontWeight': 'bold',
-        'fontSize': '12px',
-        'border': '1px solid #1f2c3d'  # só borda na cor do primeiro código
-    },
-    style_cell={
-        'backgroundColor': '#2c3e50',  # mantive seu fundo original
-        'color': 'white',
-        'textAlign': 'center',
-        'fontSize': '12px',
-        'padding': '5px',
-        'minWidth': '100px',
-        'maxWidth': '150px',
-        'whiteSpace': 'normal',
-        'border': '1px solid #1f2c3d'  
-    },
-    style_table={'marginTop': '20px', 'overflowX': 'auto'},
-)
-
-],
-style={
-    'backgroundColor': '#2c3e50',
-    'minHeight': '100vh',
-    'padding': '15px 20px 10px 20px'
-})
-
-
-
+        dash_table.DataTable(
+        id='tabela-risco',
+        columns=[
+            {'name': 'Ativo', 'id': 'Ativo'},
+            {'name': 'Volatilidade Mensal (%)', 'id': 'Volatilidade Mensal (%)'},
+            {'name': 'Volatilidade 6 Meses (%)', 'id': 'Volatilidade 6 Meses (%)'},
+            {'name': 'Volatilidade 12 Meses (%)', 'id': 'Volatilidade 12 Meses (%)'},
+            {'name': 'Volatilidade 24 Meses (%)', 'id': 'Volatilidade 24 Meses (%)'},
+            {'name': 'Volatilidade 36 Meses (%)', 'id': 'Volatilidade 36 Meses (%)'},
+            {'name': 'Volatilidade Anualizada no Ano (%)', 'id': 'Volatilidade Anualizada no Ano (%)'}
+        ],
+        data=[],
+        style_header={
+            'backgroundColor': '#34495e',  
+            'color': 'white',              
+            'fontWeight': 'bold',
+            'fontSize': '12px',
+            'border': '1px solid #1f2c3d'  # só borda na cor do primeiro código
+        },
+        style_cell={
+            'backgroundColor': '#2c3e50',  # mantive seu fundo original
+            'color': 'white',
+            'textAlign': 'center',
+            'fontSize': '12px',
+            'padding': '5px',
+            'minWidth': '100px',
+            'maxWidth': '150px',
+            'whiteSpace': 'normal',
+            'border': '1px solid #1f2c3d'  
+        },
+        style_table={'marginTop': '20px', 'overflowX': 'auto'},
+    )
 
+    ],
+    style={
+        'backgroundColor': '#2c3e50',
+        'minHeight': '100vh',
+        'padding': '15px 20px 10px 20px'
+    })
 
+registrar_derivacao('risco', preparar_dados)